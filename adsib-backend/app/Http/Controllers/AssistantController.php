@@ -2,6 +2,7 @@
 
 namespace App\Http\Controllers;
 
+use App\Services\SemanticClient;
 use Illuminate\Http\Request;
 use Illuminate\Support\Facades\DB;
 use Illuminate\Support\Facades\Log;
@@ -39,7 +40,7 @@ class AssistantController extends Controller
     // stopwords que no aportan para nombre
     private array $STOP = ['el','la','los','las','un','una','unos','unas','de','del','al','con','para','por','mi','mis','su','sus','y','en','a','sobre','del','convenio','acuerdo','convenios'];
 
-    public function __construct()
+    public function __construct(protected SemanticClient $semantic)
     {
         $this->ollamaUrl     = rtrim(env('OLLAMA_URL', 'http://127.0.0.1:11434'), '/');
         $this->ollamaModel   = env('OLLAMA_MODEL', 'llama3.2:3b');
@@ -887,6 +888,25 @@ private function answerVersionesPorTitulo(string $needle): array
 
     /* ----------- Contenido de versión (con /qa) ------------ */
 
+    /**
+     * /qa/ref en el servicio que tiene el índice (SemanticClient / SEMANTIC_URL,
+     * no SEMANTIC_BASE: ese es el /qa de texto completo).
+     * Devuelve '' si no hay respuesta útil o el servicio falla.
+     */
+    private function answerFromIndex(string $msg, int $convenioId, int $versionId): string
+    {
+        try {
+            $json = $this->semantic->qaRef($msg, [['convenio_id'=>$convenioId, 'version_id'=>$versionId]]);
+        } catch (\Throwable $e) {
+            return '';
+        }
+        $ans = $this->cleanTextHard(trim((string)($json['answer'] ?? '')));
+        if (mb_strlen($ans,'UTF-8') < 4 || stripos($ans,'no tengo una respuesta exacta') !== false) {
+            return '';
+        }
+        return $ans;
+    }
+
     private function answerContenidoVersion(string $msg): array
     {
         $hint = $this->parseVersionHint($msg);
@@ -919,10 +939,26 @@ private function answerContenidoVersion(string $msg): array
             return $this->fallback("La versión v{$v->numero_version} de **{$c->titulo}** no tiene texto almacenado. Sube un PDF/DOCX legible para habilitar el análisis.");
         }
 
+        // 1) por referencia: la versión ya indexada (sin enviar el texto)
+        $ans = $this->answerFromIndex($msg, (int)$c->id, (int)$v->id);
+        if ($ans !== '') {
+            return [
+                'reply'=>"**{$c->titulo} — v{$v->numero_version}**\n{$ans}",
+                'grounding'=>[
+                    'type'=>'version',
+                    'convenio_id'=>$c->id,
+                    'version_id'=>$v->id,
+                    'numero'=>$v->numero_version
+                ]
+            ];
+        }
+
         // Microservicio QA
         try {
             if ($this->semanticBase) {
                 $client = new \GuzzleHttp\Client(['base_uri'=>$this->semanticBase,'timeout'=>15]);
+
+                // 2) con el texto completo (versión no indexada)
                 $payload = [
                     'question' => $msg,
                     'items' => [[
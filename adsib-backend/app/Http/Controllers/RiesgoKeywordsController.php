@@ -2,12 +2,26 @@
 
 namespace App\Http\Controllers;
 
+use App\Services\RiskNlp;
 use Illuminate\Http\Request;
 use Illuminate\Support\Facades\DB;
 use Illuminate\Validation\Rule;
 
 class RiesgoKeywordsController extends Controller
 {
+    /**
+     * El servicio NLP cachea riesgo_keywords: tras un cambio le pedimos que
+     * relea la tabla (si no responde, igual la revalida al vencer su TTL).
+     */
+    protected function refreshNlpKeywords(): void
+    {
+        try {
+            app(RiskNlp::class)->invalidateKeywords();
+        } catch (\Throwable $e) {
+            // no bloquea la edición del diccionario
+        }
+    }
+
     protected function isLikelyAcronym(string $token): bool
     {
         return preg_match('/^[A-Z]{2,}$/u', $token) === 1;
@@ -284,6 +298,7 @@ public function store(Request $request)
                 'created_at' => now(),
                 'updated_at' => now(),
             ]);
+            $this->refreshNlpKeywords();
 
             return response()->json(['message' => 'Término creado correctamente'], 201);
 
@@ -337,6 +352,7 @@ public function update(Request $request, $id)
                 'activo' => $request->activo ? 1 : 0,
                 'updated_at' => now(),
             ]);
+            $this->refreshNlpKeywords();
 
             return response()->json(['message' => 'Término actualizado correctamente'], 200);
 
@@ -362,6 +378,7 @@ public function destroy(int $id)
             'activo'     => false,
             'updated_at' => now(),
         ]);
+        $this->refreshNlpKeywords();
 
         return response()->json(['ok' => true], 200);
     }
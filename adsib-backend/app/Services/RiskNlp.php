@@ -46,6 +46,26 @@ public function health(): array
         }
     }
 
+    /**
+     * Avisa al servicio NLP que cambió riesgo_keywords: POST /keywords/invalidate
+     * (relee la tabla sin esperar al TTL). Nunca lanza excepción.
+     */
+    public function invalidateKeywords(): array
+    {
+        try {
+            $res  = $this->http->post('/keywords/invalidate', ['headers' => ['Accept' => 'application/json']]);
+            $json = json_decode((string) $res->getBody(), true) ?: [];
+
+            return [
+                'ok'     => $res->getStatusCode() === 200,
+                'status' => $res->getStatusCode(),
+                'data'   => $json,
+            ];
+        } catch (\Throwable $e) {
+            return ['ok' => false, 'error' => $e->getMessage()];
+        }
+    }
+
     /**
      * Envía el texto al servicio NLP: POST /analyze
      *
@@ -104,4 +124,57 @@ public function analyze(string $text): array
             return ['ok' => false, 'error' => $e->getMessage()];
         }
     }
+
+    /**
+     * Varios textos en una sola llamada: POST /analyze/batch
+     * (un AnalyzeOut por texto, en el mismo orden; máx. ANALYZE_BATCH_MAX del servicio)
+     *
+     * Devuelve:
+     *  - ['ok'=>true, 'data'=>[resultado|null, ...], 'errors'=>[['index'=>i, 'detail'=>'...'], ...]]
+     *    en éxito (null = ese texto falló, p.ej. vacío; el resto se analiza igual)
+     *  - ['ok'=>false, 'error'=>'...', 'detail'=>'...'] en error
+     */
+    public function analyzeBatch(array $texts): array
+    {
+        $texts = array_values(array_map('strval', $texts));
+
+        if (empty($texts)) {
+            return ['ok' => true, 'data' => []];
+        }
+
+        try {
+            $res = $this->http->post('/analyze/batch', [
+                'json'    => ['texts' => $texts],
+                'headers' => ['Accept' => 'application/json'],
+            ]);
+
+            $status = $res->getStatusCode();
+            $body   = (string) $res->getBody();
+
+            if ($status >= 200 && $status < 300) {
+                $json = json_decode($body, true) ?: [];
+                return [
+                    'ok'     => true,
+                    'data'   => $json['results'] ?? [],
+                    'errors' => $json['errors'] ?? [],
+                ];
+            }
+
+            return [
+                'ok'    => false,
+                'error' => "Servicio devolvió $status",
+                'detail'=> $body,
+            ];
+
+        } catch (ConnectException $e) {
+            return [
+                'ok'    => false,
+                'error' => 'No se pudo conectar con el servicio NLP',
+                'detail'=> $e->getMessage(),
+            ];
+
+        } catch (\Throwable $e) {
+            return ['ok' => false, 'error' => $e->getMessage()];
+        }
+    }
 }
\ No newline at end of file
@@ -9,29 +9,44 @@ class SemanticClient
     protected string $baseUrl;
     protected int $timeout;
 
-    public function __construct()
+    public function __construct(?string $baseUrl = null, ?int $timeout = null)
     {
-        $this->baseUrl = rtrim(env('SEMANTIC_URL', 'http://127.0.0.1:8010'), '/');
-        $this->timeout = (int) env('SEMANTIC_TIMEOUT', 25);
+        // servicio del índice (app/api.py): /index, /search, /qa/ref ...
+        $this->baseUrl = rtrim($baseUrl ?? env('SEMANTIC_URL', 'http://127.0.0.1:8010'), '/');
+        $this->timeout = $timeout ?? (int) env('SEMANTIC_TIMEOUT', 25);
     }
 
     /**
-     * Envía un lote de fragmentos para indexar.
+     * Encola un lote de fragmentos para indexar (responde al instante con 'job_id').
      * items: [
-     *   ['convenio_id'=>1,'version_id'=>2,'fragmento'=>'texto', 'meta'=>['fuente'=>'db']]
+     *   ['convenio_id'=>1,'version_id'=>2,'fragmento'=>'texto', 'meta'=>['fuente'=>'db'], 'id'=>10 (opcional)]
      * ]
+     * upsert: reemplaza lo ya indexado de cada convenio/versión (o solo los 'id' enviados)
+     * wait: espera a que termine y devuelve added/replaced/total
      */
-    public function index(array $items): array
+    public function index(array $items, bool $upsert = false, bool $wait = false): array
     {
         $resp = Http::timeout($this->timeout)
-            ->post("{$this->baseUrl}/index", ['items' => $items]);
+            ->post("{$this->baseUrl}/index", ['items' => $items, 'upsert' => $upsert, 'wait' => $wait]);
 
-        if (!$resp->ok()) {
+        if (!$resp->successful()) {
             throw new \RuntimeException("Semantic index error {$resp->status()}: ".$resp->body());
         }
         return (array) $resp->json();
     }
 
+    /**
+     * Estado de un job de indexado: queued | running | done | error (+ result).
+     */
+    public function job(string $jobId): array
+    {
+        $resp = Http::timeout(8)->get("{$this->baseUrl}/jobs/".rawurlencode($jobId));
+        if (!$resp->ok()) {
+            throw new \RuntimeException("Semantic job error {$resp->status()}: ".$resp->body());
+        }
+        return (array) $resp->json();
+    }
+
     /**
      * Búsqueda semántica.
      * @param string $query
@@ -52,6 +67,62 @@ public function search(string $query, int $k = 5, ?int $convenioId = null): arra
         return (array) $resp->json();
     }
 
+    /**
+     * Varias búsquedas en una sola llamada (un encode para todas).
+     * queries: [
+     *   ['query'=>'¿vigencia?', 'k'=>5, 'convenio_id'=>1, 'version_id'=>null]
+     * ]
+     * Devuelve 'results' con el top-k de cada consulta, en el mismo orden.
+     */
+    public function searchBatch(array $queries): array
+    {
+        $resp = Http::timeout($this->timeout)
+            ->post("{$this->baseUrl}/search/batch", ['queries' => array_values($queries)]);
+
+        if (!$resp->ok()) {
+            throw new \RuntimeException("Semantic search batch error {$resp->status()}: ".$resp->body());
+        }
+        return (array) $resp->json();
+    }
+
+    /**
+     * QA sobre lo ya indexado (sin enviar el texto).
+     * refs: [['convenio_id'=>1, 'version_id'=>2]]  (version_id opcional: todas las versiones)
+     * Devuelve ['answer'=>'...', 'used'=>[...]].
+     */
+    public function qaRef(string $question, array $refs, int $topK = 5): array
+    {
+        $resp = Http::timeout($this->timeout)
+            ->post("{$this->baseUrl}/qa/ref", [
+                'question' => $question,
+                'refs'     => array_values($refs),
+                'top_k'    => $topK,
+            ]);
+
+        if (!$resp->ok()) {
+            throw new \RuntimeException("Semantic qa/ref error {$resp->status()}: ".$resp->body());
+        }
+        return (array) $resp->json();
+    }
+
+    /**
+     * Borra del índice los fragmentos de un convenio (o de una versión / un fragmento).
+     */
+    public function delete(int $convenioId, ?int $versionId = null, $fragmentId = null): array
+    {
+        $query = ['convenio_id' => $convenioId];
+        if ($versionId !== null) $query['version_id'] = $versionId;
+        if ($fragmentId !== null) $query['id'] = $fragmentId;
+
+        $resp = Http::timeout($this->timeout)
+            ->delete("{$this->baseUrl}/index?".http_build_query($query));
+
+        if (!$resp->ok()) {
+            throw new \RuntimeException("Semantic delete error {$resp->status()}: ".$resp->body());
+        }
+        return (array) $resp->json();
+    }
+
     /** Salud del servicio */
     public function health(): array
     {
@@ -0,0 +1,81 @@
+<?php
+
+namespace Tests\Feature;
+
+use App\Http\Controllers\AssistantController;
+use Illuminate\Http\Client\Request;
+use Illuminate\Support\Facades\Http;
+use Tests\TestCase;
+
+/**
+ * /qa/ref va al servicio del índice (SEMANTIC_URL), no al /qa de texto
+ * completo (SEMANTIC_BASE).
+ */
+class AssistantQaRefTest extends TestCase
+{
+    private array $envBackup = [];
+
+    protected function setUp(): void
+    {
+        parent::setUp();
+        $this->setEnv('SEMANTIC_URL', 'http://index.test');
+        $this->setEnv('SEMANTIC_BASE', 'http://qa.test');
+    }
+
+    protected function tearDown(): void
+    {
+        foreach ($this->envBackup as $key => $value) {
+            if ($value === null) {
+                unset($_ENV[$key], $_SERVER[$key]);
+                putenv($key);
+            } else {
+                $_ENV[$key] = $_SERVER[$key] = $value;
+                putenv("{$key}={$value}");
+            }
+        }
+        parent::tearDown();
+    }
+
+    private function setEnv(string $key, string $value): void
+    {
+        $this->envBackup[$key] = $_SERVER[$key] ?? $_ENV[$key] ?? (getenv($key) === false ? null : getenv($key));
+        $_ENV[$key] = $_SERVER[$key] = $value;
+        putenv("{$key}={$value}");
+    }
+
+    private function answerFromIndex(string $msg, int $convenioId, int $versionId): string
+    {
+        $controller = $this->app->make(AssistantController::class);
+        $method = new \ReflectionMethod($controller, 'answerFromIndex');
+        $method->setAccessible(true);
+        return $method->invoke($controller, $msg, $convenioId, $versionId);
+    }
+
+    public function test_qa_ref_uses_semantic_url(): void
+    {
+        Http::fake([
+            'index.test/qa/ref' => Http::response([
+                'answer' => 'El convenio tiene una vigencia de dos años.',
+                'used'   => [['convenio_id' => 3, 'version_id' => 7]],
+            ]),
+            '*' => Http::response([], 404),
+        ]);
+
+        $ans = $this->answerFromIndex('¿Cuál es la vigencia?', 3, 7);
+
+        $this->assertSame('El convenio tiene una vigencia de dos años.', $ans);
+        Http::assertSentCount(1);
+        Http::assertSent(fn (Request $r) =>
+            $r->url() === 'http://index.test/qa/ref'
+            && $r['refs'] === [['convenio_id' => 3, 'version_id' => 7]]);
+        Http::assertNotSent(fn (Request $r) => str_starts_with($r->url(), 'http://qa.test'));
+    }
+
+    public function test_qa_ref_failure_returns_empty_for_fallback(): void
+    {
+        Http::fake(['*' => Http::response(['detail' => 'Not Found'], 404)]);
+
+        $this->assertSame('', $this->answerFromIndex('¿Cuál es la vigencia?', 3, 7));
+        Http::assertSent(fn (Request $r) => $r->url() === 'http://index.test/qa/ref');
+    }
+}
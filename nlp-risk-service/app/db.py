@@ -1,10 +1,15 @@
 # app/db.py
 import os
+import threading
+import time
+from collections import deque
 from contextlib import contextmanager
 
 from dotenv import load_dotenv
 import psycopg2  # type: ignore
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE  # type: ignore
 from psycopg2.extras import RealDictCursor  # type: ignore
+from psycopg2.pool import PoolError  # type: ignore
 
 # Carga variables de entorno desde .env (en la carpeta raíz nlp-risk-service)
 load_dotenv()
@@ -25,23 +30,275 @@ def get_db_connection():
     return conn
 
 
+class _Waiter:
+    """Hilo esperando conexión: putconn() le entrega una directamente (FIFO)."""
+
+    __slots__ = ("event", "item")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.item = None  # (conn, último uso) o (None, None) = puede abrir una nueva
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones thread-safe (uno por proceso, ver get_pool()).
+
+    - Abre hasta maxconn conexiones; si están todas en uso, getconn() espera
+      (por orden de llegada) hasta timeout segundos y luego lanza PoolError.
+    - Las primeras minconn se abren juntas al primer uso y nunca se cierran
+      por inactividad; las demás se cierran tras idle_timeout segundos ociosas.
+    - Una conexión ociosa más de check_after segundos se verifica con
+      SELECT 1 antes de entregarla; si falló, se descarta y se abre otra.
+    - connect_fn es inyectable (p.ej. un Postgres local o un doble en pruebas).
+    """
+
+    def __init__(self, connect_fn=None, minconn=1, maxconn=5, timeout=10.0,
+                 check_after=30.0, idle_timeout=300.0):
+        self.connect_fn = connect_fn or get_db_connection
+        self.minconn = max(0, int(minconn))
+        self.maxconn = max(1, int(maxconn), self.minconn)
+        self.timeout = float(timeout)
+        self.check_after = float(check_after)
+        self.idle_timeout = float(idle_timeout)
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._idle = deque()  # (conn, último uso)
+        self._waiters = deque()  # _Waiter en orden de llegada
+        self._size = 0  # abiertas: ociosas + en uso
+        self._warm = False
+        # métricas
+        self.checkouts = 0
+        self.created = 0
+        self.discarded = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+
+    # ---------- préstamo ----------
+    def getconn(self):
+        t0 = time.perf_counter()
+        waiter = None
+        with self._lock:
+            if self._idle and not self._waiters:
+                # la más reciente: más probable que siga viva
+                conn, last = self._idle.pop()
+            elif self._size < self.maxconn and not self._waiters:
+                self._size += 1
+                conn, last = None, None
+            else:
+                waiter = _Waiter()
+                self._waiters.append(waiter)
+            warm = not self._warm
+            self._warm = True
+
+        if waiter is not None:
+            waiter.event.wait(self.timeout)
+            with self._lock:
+                if waiter.item is None:
+                    self._waiters.remove(waiter)
+                    self.timeouts += 1
+                    raise PoolError(f"Pool de BD agotado ({self.maxconn} conexiones en uso).")
+            conn, last = waiter.item
+
+        try:
+            if conn is not None and not self._healthy(conn, last):
+                self._close(conn)
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            self._release_slot()
+            raise
+        if warm:
+            self._prefill()
+
+        ms = (time.perf_counter() - t0) * 1000.0
+        with self._lock:
+            self.checkouts += 1
+            self.waits += int(waiter is not None)
+            self.wait_ms_total += ms
+            self.wait_ms_max = max(self.wait_ms_max, ms)
+        return conn
+
+    def putconn(self, conn, discard=False):
+        """Devuelve la conexión (sin transacción abierta); discard=True la cierra."""
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+        if discard or conn.closed:
+            self._close(conn)
+            self._release_slot()
+            return
+
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            if self._waiters:
+                self._handoff((conn, now))
+                return
+            self._idle.append((conn, now))
+            # ociosas de más (por encima de minconn) que vencieron
+            while len(self._idle) > self.minconn and now - self._idle[0][1] > self.idle_timeout:
+                expired.append(self._idle.popleft()[0])
+                self._size -= 1
+        for c in expired:
+            self._close(c)
+
+    # ---------- internos ----------
+    def _handoff(self, item):
+        """Entrega item al primer hilo en espera (con el lock tomado)."""
+        waiter = self._waiters.popleft()
+        waiter.item = item
+        waiter.event.set()
+
+    def _release_slot(self):
+        """Una conexión menos: el primer hilo en espera puede abrir otra."""
+        with self._lock:
+            if self._waiters:
+                self._handoff((None, None))
+            else:
+                self._size -= 1
+
+    def _connect(self):
+        conn = self.connect_fn()
+        with self._lock:
+            self.created += 1
+        return conn
+
+    def _close(self, conn):
+        with self._lock:
+            self.discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _healthy(self, conn, last) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - last < self.check_after:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchone()
+            cur.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _prefill(self):
+        """Abre las minconn iniciales (además de la que se acaba de prestar)."""
+        while True:
+            with self._lock:
+                if self._size >= self.minconn:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self._size -= 1
+                return
+            with self._lock:
+                if self._waiters:
+                    self._handoff((conn, time.monotonic()))
+                else:
+                    self._idle.appendleft((conn, time.monotonic()))
+
+    def closeall(self):
+        with self._lock:
+            conns = [c for c, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(conns)
+        for c in conns:
+            self._close(c)
+
+    def stats(self):
+        with self._lock:
+            idle = len(self._idle)
+            return {
+                "min": self.minconn,
+                "max": self.maxconn,
+                "open": self._size,
+                "idle": idle,
+                "in_use": self._size - idle,
+                "checkouts": self.checkouts,
+                "created": self.created,
+                "discarded": self.discarded,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "wait_ms_avg": round(self.wait_ms_total / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_ms_max": round(self.wait_ms_max, 3),
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Pool del proceso, creado al primer uso (y de nuevo tras un fork).
+    DB_POOL_MIN / DB_POOL_MAX: tamaño; DB_POOL_TIMEOUT: espera máxima (s);
+    DB_POOL_CHECK_AFTER: segundos ociosa antes de verificar con SELECT 1;
+    DB_POOL_IDLE_TIMEOUT: segundos ociosa antes de cerrar las que sobran.
+    """
+    global _pool
+    pool = _pool
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = ConnectionPool(
+                get_db_connection,
+                minconn=int(os.getenv("DB_POOL_MIN", "1")),
+                maxconn=int(os.getenv("DB_POOL_MAX", "5")),
+                timeout=float(os.getenv("DB_POOL_TIMEOUT", "10")),
+                check_after=float(os.getenv("DB_POOL_CHECK_AFTER", "30")),
+                idle_timeout=float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300")),
+            )
+        return _pool
+
+
+def pool_stats():
+    """Métricas del pool (para /health); None si todavía no se usó."""
+    pool = _pool
+    if pool is None or pool.pid != os.getpid():
+        return None
+    return pool.stats()
+
+
 @contextmanager
 def db_cursor(dict_cursor: bool = True):
     """
-    Context manager para obtener un cursor y cerrar conexión automáticamente.
+    Context manager para obtener un cursor con una conexión del pool.
+    Al salir hace commit (o rollback si hubo error) y devuelve la conexión;
+    si la conexión se cortó, se descarta.
 
     Uso:
         with db_cursor() as cur:
             cur.execute("SELECT ...")
             rows = cur.fetchall()
     """
-    conn = get_db_connection()
+    pool = get_pool()
+    conn = pool.getconn()
+    broken = False
     try:
         cur = conn.cursor(cursor_factory=RealDictCursor if dict_cursor else None)
         yield cur
         conn.commit()
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
     finally:
-        conn.close()
+        pool.putconn(conn, discard=broken or conn.closed)
 
 
 def fetch_riesgo_keywords(active_only: bool = True):
@@ -71,4 +328,24 @@ def fetch_riesgo_keywords(active_only: bool = True):
         cur.execute(sql, params)
         rows = cur.fetchall()
 
-    return rows or []
\ No newline at end of file
+    return rows or []
+
+
+def fetch_riesgo_keywords_signature():
+    """
+    Firma barata de riesgo_keywords para saber si cambió sin leer la tabla:
+
+        {"n": activos, "last": max(updated_at)}
+
+    Alta/baja/edición desde Laravel cambia el conteo o toca updated_at.
+    """
+    sql = """
+        SELECT COUNT(*) FILTER (WHERE activo = TRUE) AS n,
+               MAX(updated_at) AS last
+        FROM riesgo_keywords
+    """
+    with db_cursor(dict_cursor=True) as cur:
+        cur.execute(sql)
+        row = cur.fetchone() or {}
+
+    return {"n": int(row.get("n") or 0), "last": row.get("last")}
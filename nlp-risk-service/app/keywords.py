@@ -0,0 +1,126 @@
+# app/keywords.py
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from .db import fetch_riesgo_keywords, fetch_riesgo_keywords_signature
+from .matcher import KeywordMatcher
+
+
+class KeywordSet(NamedTuple):
+    """Palabras clave activas ya normalizadas + versión del conjunto."""
+    keywords: Dict[str, Dict[str, str]]  # texto -> {"severity", "reason"}
+    version: str
+    loaded_at: float
+    matcher: KeywordMatcher  # compilado una vez por conjunto
+
+
+def build_keywords(rows: List[Dict[str, Any]]) -> Dict[str, Dict[str, str]]:
+    """Filas de riesgo_keywords -> {texto: {severity, reason}} (como antes en _analyze)."""
+    keywords: Dict[str, Dict[str, str]] = {}
+    for r in rows:
+        tok = (r.get("texto") or "").strip()
+        if not tok:
+            continue
+        sev = (r.get("severity") or "").upper().strip() or "MEDIUM"
+        reason = (r.get("reason") or "").strip()
+        keywords[tok] = {"severity": sev, "reason": reason}
+    return keywords
+
+
+def keywords_version(keywords: Dict[str, Dict[str, str]]) -> str:
+    """Hash corto del contenido: igual en todos los workers para el mismo conjunto."""
+    h = hashlib.sha1()
+    for tok in sorted(keywords):
+        meta = keywords[tok]
+        h.update(f"{tok}\x1f{meta['severity']}\x1f{meta['reason']}\x1e".encode("utf-8"))
+    return h.hexdigest()[:12]
+
+
+class KeywordCache:
+    """
+    riesgo_keywords en memoria del proceso.
+    - Dentro del TTL (RISK_RULES_TTL, segundos) no se toca la BD.
+    - Vencido el TTL se revalida con una consulta barata (conteo de activos +
+      max(updated_at)); solo si la firma cambió se relee la tabla completa.
+    - invalidate() fuerza la relectura (lo llama Laravel al editar términos)
+      y falla si no pudo releer.
+    - Si la BD falla y ya hay un conjunto cargado, se sigue usando ese.
+    """
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = float(os.getenv("RISK_RULES_TTL", "30") if ttl is None else ttl)
+        self._lock = threading.Lock()
+        self._set: Optional[KeywordSet] = None
+        self._signature: Optional[Dict[str, Any]] = None
+        self._checked_at = 0.0
+        self._stale = True
+        self.hits = 0
+        self.checks = 0
+        self.reloads = 0
+        self.errors = 0
+
+    def get(self) -> KeywordSet:
+        now = time.monotonic()
+        current = self._set
+        if current is not None and not self._stale and now - self._checked_at < self.ttl:
+            self.hits += 1
+            return current
+        with self._lock:
+            # otro hilo pudo revalidar mientras esperábamos
+            if self._set is not None and not self._stale and time.monotonic() - self._checked_at < self.ttl:
+                self.hits += 1
+                return self._set
+            try:
+                self._refresh()
+            except Exception:
+                self.errors += 1
+                if self._set is None:
+                    raise
+                # se sigue con el conjunto anterior y se reintenta al vencer el TTL
+                self._stale = False
+                self._checked_at = time.monotonic()
+            return self._set
+
+    def _refresh(self) -> None:
+        self.checks += 1
+        sig = fetch_riesgo_keywords_signature()
+        if self._set is None or self._stale or sig != self._signature:
+            keywords = build_keywords(fetch_riesgo_keywords(active_only=True))
+            self._set = KeywordSet(keywords, keywords_version(keywords), time.time(),
+                                   KeywordMatcher(list(keywords)))
+            self.reloads += 1
+        self._signature = sig
+        self._stale = False
+        self._checked_at = time.monotonic()
+
+    def invalidate(self) -> KeywordSet:
+        """
+        Relee la tabla ya (sin esperar al TTL) y devuelve el conjunto nuevo.
+        A diferencia de get(), si la relectura falla propaga el error aunque
+        haya un conjunto cargado: quien invalidó sabe que el cambio no entró.
+        Se sigue usando el anterior y queda vencido (la próxima get() reintenta).
+        """
+        with self._lock:
+            self._stale = True
+            try:
+                self._refresh()
+            except Exception:
+                self.errors += 1
+                raise
+            return self._set
+
+    def stats(self) -> Dict[str, Any]:
+        cur = self._set
+        return {
+            "ttl": self.ttl,
+            "version": cur.version if cur else None,
+            "count": len(cur.keywords) if cur else 0,
+            "loaded_at": cur.loaded_at if cur else None,
+            "matcher": cur.matcher.stats() if cur else None,
+            "hits": self.hits,
+            "checks": self.checks,
+            "reloads": self.reloads,
+            "errors": self.errors,
+        }
@@ -1,10 +1,11 @@
-# app/main.py  — v1.5 (usa tabla riesgo_keywords en cada análisis)
+# app/main.py  — v1.5 (tabla riesgo_keywords cacheada con revalidación)
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 import re
 import unicodedata
+from bisect import bisect_right
 import math
 import os
 from pathlib import Path
@@ -13,15 +14,34 @@ import joblib
 import numpy as np
 import spacy
 
-from app.db import fetch_riesgo_keywords
+from app.db import pool_stats
+from app.keywords import KeywordCache
+from app.sentcache import SentenceCache, sentence_key
+
+# ====== (opcional) cuantización int8 del encoder de fallback ======
+# EMBEDDER_QUANTIZE=int8 -> torch dynamic quantization de las capas Linear (CPU)
+# Sin validar todavía contra fp32 (default fp32); no activar en producción sin medir.
+EMBEDDER_QUANTIZE = (os.getenv("EMBEDDER_QUANTIZE", "fp32") or "fp32").strip().lower()
+
+
+def _maybe_quantize(model):
+    if EMBEDDER_QUANTIZE != "int8":
+        return model
+    import torch
+
+    model.to("cpu")
+    return torch.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+    )
+
 
 # ====== (opcional) embeddings para fallback semántico ======
 try:
     from sentence_transformers import SentenceTransformer, util  # type: ignore
 
     _EMB_OK = True
-    _fallback_embedder = SentenceTransformer(
-        "paraphrase-multilingual-MiniLM-L12-v2"
+    _fallback_embedder = _maybe_quantize(
+        SentenceTransformer("paraphrase-multilingual-MiniLM-L12-v2")
     )
 except Exception:
     _EMB_OK = False
@@ -37,11 +57,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# documentos máximos por /analyze/batch
+ANALYZE_BATCH_MAX = int(os.getenv("ANALYZE_BATCH_MAX", "32"))
+
+
 # ---------- modelos de IO ----------
 class AnalyzeIn(BaseModel):
     text: str
 
 
+class AnalyzeBatchIn(BaseModel):
+    texts: List[str] = Field(..., max_length=ANALYZE_BATCH_MAX)
+
+
 class Match(BaseModel):
     token: str
     severity: str  # HIGH | MEDIUM | LOW
@@ -60,6 +88,17 @@ class AnalyzeOut(BaseModel):
     summary: Dict[str, Any]
 
 
+class BatchError(BaseModel):
+    index: int  # posición del texto en la entrada
+    detail: str
+
+
+class AnalyzeBatchOut(BaseModel):
+    # uno por texto, en el mismo orden; None si ese texto falló (ver errors)
+    results: List[Optional[AnalyzeOut]]
+    errors: List[BatchError] = Field(default_factory=list)
+
+
 # ---------- utilidades ----------
 def _norm(s: str) -> str:
     s = unicodedata.normalize("NFKC", s or "")
@@ -97,33 +136,28 @@ def _index_lines(text: str):
     return out
 
 
-def _find_occurrences(hay: str, needle: str):
-    """Posiciones start/end de coincidencias exactas (case-insensitive)."""
-    out = []
-    if not needle.strip():
-        return out
-    lo_hay, lo_needle = hay.lower(), needle.lower()
-    idx, guard = 0, 0
-    while True:
-        pos = lo_hay.find(lo_needle, idx)
-        if pos == -1 or guard > 10000:
-            break
-        out.append((pos, pos + len(needle)))
-        idx = pos + len(needle)
-        guard += 1
-    return out
+class _LineIndex:
+    """
+    Índice de posiciones de un documento, construido una vez por análisis:
+    inicios de línea ordenados con su página y número de línea.
+    page_line() es un bisect (O(log n)) en vez de recorrer todas las líneas.
+    """
 
+    def __init__(self, text: str):
+        lines = _index_lines(text)
+        self.starts = [it["start"] for it in lines]
+        self.pages = [it["page"] for it in lines]
+        self.lines = [it["line"] for it in lines]
 
-def _char_to_page_line(char_pos: int, index_lines):
-    """De un offset absoluto devuelve (page, line) usando el índice."""
-    if char_pos is None:
-        return None, None
-    for item in index_lines:
-        if item["start"] <= char_pos <= item["end"]:
-            return item["page"], item["line"]
-    if index_lines:
-        return index_lines[-1]["page"], index_lines[-1]["line"]
-    return None, None
+    def page_line(self, char_pos: Optional[int]):
+        """De un offset absoluto devuelve (page, line)."""
+        if char_pos is None or not self.starts:
+            return None, None
+        # las líneas son contiguas (cada una incluye su salto de línea)
+        i = bisect_right(self.starts, char_pos) - 1
+        if i < 0:
+            i = len(self.starts) - 1
+        return self.pages[i], self.lines[i]
 
 
 # ---------- PATRONES regex (siguen en código) ----------
@@ -163,6 +197,23 @@ ARCHETYPES = [
 
 SEV_W = {"HIGH": 1.0, "MEDIUM": 0.6, "LOW": 0.35}
 
+# segmentador de oraciones compartido (antes se armaba en cada análisis)
+_sentencizer = spacy.blank("es")
+_sentencizer.add_pipe("sentencizer")
+
+_archetype_emb = None  # embeddings de ARCHETYPES (se calculan una vez)
+
+
+def _archetype_embeddings():
+    global _archetype_emb
+    if _archetype_emb is None:
+        _archetype_emb = _fallback_embedder.encode(
+            [t for _, t in ARCHETYPES],
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        )
+    return _archetype_emb
+
 
 def _risk_from_score(score: float) -> str:
     if score >= 0.66:
@@ -180,19 +231,22 @@ _head = None  # clasificador sklearn (o pipeline TF-IDF)
 _head_le = None  # label encoder
 _head_embedder = None  # SentenceTransformer si el modelo NO es TF-IDF
 _head_embedder_name = None
+_head_version = None  # identifica el modelo cargado (clave del caché de oraciones)
 
 
 def _load_head() -> bool:
     """Carga el clasificador entrenado si está disponible."""
-    global _head, _head_le, _head_embedder, _head_embedder_name
+    global _head, _head_le, _head_embedder, _head_embedder_name, _head_version
     if _head is not None:
         return True
     if not MODEL_HEAD_PATH.exists():
         return False
+    st = MODEL_HEAD_PATH.stat()
     bundle = joblib.load(MODEL_HEAD_PATH)
     _head = bundle["clf"]
     _head_le = bundle["label_encoder"]
     _head_embedder_name = bundle.get("embedder_name", "")
+    _head_version = f"head:{_head_embedder_name}:{st.st_mtime_ns}:{st.st_size}"
     # Si el embedder es TF-IDF pipeline, no necesitamos SentenceTransformer
     if str(_head_embedder_name).startswith("tfidf"):
         _head_embedder = None
@@ -210,50 +264,71 @@ def _load_head() -> bool:
         return True
 
 
-# ---------- análisis ----------
-def _analyze(text: str) -> AnalyzeOut:
-    text = _norm(text)
-    if not text.strip():
-        raise HTTPException(status_code=400, detail="Texto vacío")
+# ---------- caché de oraciones ----------
+# probabilidades/similitudes por oración: una versión nueva de un convenio
+# solo paga por sus oraciones nuevas o cambiadas
+_sent_cache = SentenceCache()
+_FALLBACK_VERSION = f"fallback:paraphrase-multilingual-MiniLM-L12-v2:{EMBEDDER_QUANTIZE}"
+
+
+def _cached_rows(sentences: List[str], version: str, compute):
+    """
+    Filas del modelo (una por oración) pasando por el caché: compute() recibe
+    solo las oraciones que faltan (sin repetir). Devuelve (filas, cacheadas)
+    o (None, cacheadas) si compute() no pudo calcularlas.
+    """
+    keys = [sentence_key(version, s) for s in sentences]
+    rows = _sent_cache.get_many(keys)
+    cached = [r is not None for r in rows]
+    missing: Dict[Any, int] = {}
+    for i, r in enumerate(rows):
+        if r is None:
+            missing.setdefault(keys[i], i)
+    if missing:
+        computed = compute([sentences[i] for i in missing.values()])
+        if computed is None:
+            return None, cached
+        computed = np.asarray(computed)
+        _sent_cache.put_many(list(missing), computed)
+        by_key = dict(zip(missing, computed))
+        rows = [r if r is not None else by_key[k] for r, k in zip(rows, keys)]
+    return np.vstack(rows), cached
+
+
+# ---------- palabras clave (riesgo_keywords) ----------
+# en memoria; revalida por TTL/firma o al invalidar desde Laravel
+_keywords = KeywordCache()
 
-    idx = _index_lines(text)
-    matches: List[Match] = []
 
-    # 1) Palabras clave desde riesgo_keywords (siempre fresco desde la BD)
-    rows = fetch_riesgo_keywords(active_only=True)
-    keywords: Dict[str, Dict[str, str]] = {}
-    for r in rows:
-        tok = (r.get("texto") or "").strip()
-        if not tok:
-            continue
-        sev = (r.get("severity") or "").upper().strip() or "MEDIUM"
-        reason = (r.get("reason") or "").strip()
-        keywords[tok] = {"severity": sev, "reason": reason}
-
-    for tok, meta in keywords.items():
-        sev = meta["severity"]
-        why = meta["reason"]
-        for start, end in _find_occurrences(text, tok):
-            p, l = _char_to_page_line(start, idx)
-            matches.append(
-                Match(
-                    token=tok,
-                    severity=sev,
-                    source="keyword",
-                    reason=why,
-                    page=p,
-                    line=l,
-                    start=start,
-                    end=end,
-                )
+# ---------- análisis ----------
+def _rule_matches(text: str, idx: _LineIndex, kw_set) -> List[Match]:
+    """Coincidencias de riesgo_keywords y de los patrones regex."""
+    matches: List[Match] = []
+    keywords = kw_set.keywords
+
+    # una sola pasada sobre el texto para todas las keywords
+    for tok, start, end in kw_set.matcher.find_all(text):
+        meta = keywords[tok]
+        p, l = idx.page_line(start)
+        matches.append(
+            Match(
+                token=tok,
+                severity=meta["severity"],
+                source="keyword",
+                reason=meta["reason"],
+                page=p,
+                line=l,
+                start=start,
+                end=end,
             )
+        )
 
-    # 2) patrones regex
+    # patrones regex
     for rx, sev, why in PATTERNS:
         for m in rx.finditer(text):
             start, end = m.span()
             tok = m.group(0)
-            p, l = _char_to_page_line(start, idx)
+            p, l = idx.page_line(start)
             matches.append(
                 Match(
                     token=tok,
@@ -266,67 +341,72 @@ def _analyze(text: str) -> AnalyzeOut:
                     end=end,
                 )
             )
-
-    # 3) modelo entrenado o fallback semántico
-    semantic_hits = 0
-    nlp = spacy.blank("es")
-    nlp.add_pipe("sentencizer")
-    sentences = [s.text.strip() for s in nlp(text).sents if s.text.strip()]
-
-    if _load_head() and sentences and _head is not None and _head_le is not None:
+    return matches
+
+
+def _doc_sentences(doc):
+    """Oraciones con su offset exacto (start_char), aunque se repitan en el texto."""
+    sentences: List[str] = []
+    sent_starts: List[int] = []
+    for s in doc.sents:
+        raw = s.text
+        sent = raw.strip()
+        if sent:
+            sentences.append(sent)
+            sent_starts.append(s.start_char + len(raw) - len(raw.lstrip()))
+    return sentences, sent_starts
+
+
+def _classify(sentences: List[str]):
+    """
+    (severity, reason) por oración, o None si no es un hallazgo, y si la
+    salida del modelo vino del caché. Un solo predict_proba / encode para
+    todas las oraciones sin caché (pueden venir de varios documentos).
+    """
+    hits: List[Optional[tuple]] = [None] * len(sentences)
+    cached = [False] * len(sentences)
+    if not sentences:
+        return hits, cached
+
+    if _load_head() and _head is not None and _head_le is not None:
         classes = list(_head_le.classes_)
         thr = {"HIGH": 0.60, "MEDIUM": 0.55, "LOW": 0.70}
 
         if (_head_embedder is None) and str(_head_embedder_name).startswith("tfidf"):
-            try:
-                proba = _head.predict_proba(sentences)
-            except Exception:
-                proba = None
-        else:
-            proba = None
-            if _head_embedder is not None:
+            def compute(sents):
+                try:
+                    return _head.predict_proba(sents)
+                except Exception:
+                    return None
+        elif _head_embedder is not None:
+            def compute(sents):
                 S = _head_embedder.encode(
-                    sentences, convert_to_numpy=True, normalize_embeddings=True
+                    sents, convert_to_numpy=True, normalize_embeddings=True
                 )
-                proba = _head.predict_proba(S)
+                return _head.predict_proba(S)
+        else:
+            return hits, cached
 
+        proba, cached = _cached_rows(sentences, _head_version, compute)
         if proba is not None:
-            for i, sent in enumerate(sentences):
+            for i in range(len(sentences)):
                 j = int(np.argmax(proba[i]))
                 sev = classes[j]
                 pconf = float(proba[i][j])
                 if pconf >= thr.get(sev, 0.6):
-                    semantic_hits += 1
-                    pos = text.find(sent)
-                    pos = max(0, pos)
-                    pnum, lnum = _char_to_page_line(pos, idx)
-                    matches.append(
-                        Match(
-                            token=sent[:100] + ("…" if len(sent) > 100 else ""),
-                            severity=sev,
-                            source="semantic",
-                            reason=f"Modelo entrenado (p={pconf:.2f})",
-                            page=pnum,
-                            line=lnum,
-                            start=pos,
-                            end=pos + len(sent),
-                        )
-                    )
-
-    elif _EMB_OK and sentences:
-        S = _fallback_embedder.encode(
-            sentences, convert_to_numpy=True, normalize_embeddings=True
-        )
-        T = _fallback_embedder.encode(
-            [t for _, t in ARCHETYPES],
-            convert_to_numpy=True,
-            normalize_embeddings=True,
-        )
-        sim = S @ T.T  # coseno normalizado
-        for i, sent in enumerate(sentences):
+                    hits[i] = (sev, f"Modelo entrenado (p={pconf:.2f})")
+
+    elif _EMB_OK:
+        def compute(sents):
+            S = _fallback_embedder.encode(
+                sents, convert_to_numpy=True, normalize_embeddings=True
+            )
+            return S @ _archetype_embeddings().T  # coseno normalizado
+
+        sim, cached = _cached_rows(sentences, _FALLBACK_VERSION, compute)
+        for i in range(len(sentences)):
             best_j = int(np.argmax(sim[i]))
             score_sim = float(sim[i][best_j])
-            sev_seed, seed_text = ARCHETYPES[best_j]
             sev = None
             if score_sim >= 0.80:
                 sev = "HIGH"
@@ -335,23 +415,13 @@ def _analyze(text: str) -> AnalyzeOut:
             elif score_sim >= 0.60:
                 sev = "LOW"
             if sev:
-                semantic_hits += 1
-                pos = max(0, text.find(sent))
-                pnum, lnum = _char_to_page_line(pos, idx)
-                matches.append(
-                    Match(
-                        token=sent[:100] + ("…" if len(sent) > 100 else ""),
-                        severity=sev,
-                        source="semantic",
-                        reason=f"Similar a arquetipo (sim={score_sim:.2f})",
-                        page=pnum,
-                        line=lnum,
-                        start=pos,
-                        end=pos + len(sent),
-                    )
-                )
+                hits[i] = (sev, f"Similar a arquetipo (sim={score_sim:.2f})")
+    return hits, cached
 
-    # 4) score total
+
+def _result(matches: List[Match], semantic_hits: int, kw_set,
+            n_sents: int = 0, n_cached: int = 0) -> AnalyzeOut:
+    """Score total + resumen de un documento."""
     score = 0.0
     if matches:
         raw = sum(
@@ -378,27 +448,103 @@ def _analyze(text: str) -> AnalyzeOut:
             "semantic_used": bool(_head is not None),
             "model_embedder": _head_embedder_name
             or ("fallback" if _EMB_OK else None),
-            "keywords_db": len(keywords),
+            "keywords_db": len(kw_set.keywords),
             "keywords_table": "riesgo_keywords",
+            "keywords_version": kw_set.version,
+            "sentences": n_sents,
+            "sentences_cached": n_cached,
         },
     )
 
 
+def _analyze_batch(texts: List[str]) -> List[Optional[AnalyzeOut]]:
+    """
+    Varios documentos juntos: se segmentan con nlp.pipe y las oraciones de
+    todos pasan por el modelo en una sola llamada. Mismo resultado que
+    _analyze() documento por documento; None en los textos vacíos (no
+    arrastran al resto del lote).
+    """
+    texts = [_norm(t or "") for t in texts]
+    slots = [i for i, text in enumerate(texts) if text.strip()]
+    out: List[Optional[AnalyzeOut]] = [None] * len(texts)
+    if not slots:
+        return out
+    texts = [texts[i] for i in slots]
+
+    # 1) palabras clave (caché revalidado) y patrones regex
+    kw_set = _keywords.get()
+    indexes = [_LineIndex(text) for text in texts]
+    matches = [_rule_matches(text, idx, kw_set) for text, idx in zip(texts, indexes)]
+
+    # 2) oraciones de todos los documentos
+    per_doc = [_doc_sentences(doc) for doc in _sentencizer.pipe(texts)]
+    all_sents = [sent for sents, _ in per_doc for sent in sents]
+
+    # 3) modelo entrenado o fallback semántico, una vez para todo el lote
+    hits, cached = _classify(all_sents)
+
+    k = 0
+    for slot, doc_matches, idx, (sents, starts) in zip(slots, matches, indexes, per_doc):
+        semantic_hits = 0
+        n_cached = sum(cached[k:k + len(sents)])
+        for sent, pos in zip(sents, starts):
+            hit = hits[k]
+            k += 1
+            if hit is None:
+                continue
+            sev, why = hit
+            semantic_hits += 1
+            pnum, lnum = idx.page_line(pos)
+            doc_matches.append(
+                Match(
+                    token=sent[:100] + ("…" if len(sent) > 100 else ""),
+                    severity=sev,
+                    source="semantic",
+                    reason=why,
+                    page=pnum,
+                    line=lnum,
+                    start=pos,
+                    end=pos + len(sent),
+                )
+            )
+        # 4) score total
+        out[slot] = _result(doc_matches, semantic_hits, kw_set, len(sents), n_cached)
+    return out
+
+
+def _analyze(text: str) -> AnalyzeOut:
+    res = _analyze_batch([text])[0]
+    if res is None:
+        raise HTTPException(status_code=400, detail="Texto vacío")
+    return res
+
+
 # ---------- endpoints ----------
 @app.post("/analyze", response_model=AnalyzeOut)
 def analyze(payload: AnalyzeIn):
     return _analyze(payload.text or "")
 
 
+@app.post("/analyze/batch", response_model=AnalyzeBatchOut)
+def analyze_batch(payload: AnalyzeBatchIn):
+    """
+    Varios textos en una llamada (p.ej. re-analizar versiones pendientes).
+    Un texto vacío no falla el lote: su resultado es null y va a errors.
+    """
+    results = _analyze_batch(payload.texts)
+    errors = [BatchError(index=i, detail="Texto vacío") for i, r in enumerate(results) if r is None]
+    return AnalyzeBatchOut(results=results, errors=errors)
+
+
 @app.get("/health")
 def health():
     loaded = _load_head()
-    # Contamos keywords realmente en BD (no cache)
+    # Keywords del caché (revalidado contra la BD si venció el TTL)
     try:
-        kw_rows = fetch_riesgo_keywords(active_only=True)
-        kw_count = len(kw_rows)
+        kw_set = _keywords.get()
+        kw_count, kw_version = len(kw_set.keywords), kw_set.version
     except Exception:
-        kw_count = 0
+        kw_count, kw_version = 0, None
 
     return {
         "ok": True,
@@ -407,12 +553,27 @@ def health():
         "model_dir": str(MODEL_DIR),
         "model_embedder": _head_embedder_name,
         "embeddings_fallback_ok": bool(_EMB_OK),
+        "embeddings_fallback_quantize": EMBEDDER_QUANTIZE,
         "keywords_db": kw_count,
         "keywords_table": "riesgo_keywords",
+        "keywords_version": kw_version,
+        "keywords_cache": _keywords.stats(),
+        "db_pool": pool_stats(),
+        "sentence_cache": _sent_cache.stats(),
         "patterns": len(PATTERNS),
     }
 
 
+@app.post("/keywords/invalidate")
+def keywords_invalidate():
+    """Relee riesgo_keywords ya (Laravel lo llama tras crear/editar/desactivar)."""
+    try:
+        kw_set = _keywords.invalidate()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"No se pudo leer riesgo_keywords: {e}")
+    return {"ok": True, "keywords_db": len(kw_set.keywords), "keywords_version": kw_set.version}
+
+
 @app.get("/")
 def root():
     return {"ok": True, "message": "NLP Risk Service v1.5"}
\ No newline at end of file
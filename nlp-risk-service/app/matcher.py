@@ -0,0 +1,175 @@
+# app/matcher.py
+import os
+import unicodedata
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+# tope de coincidencias por keyword (igual que el bucle original)
+MAX_PER_KEYWORD = 10000
+
+# desde cuántos patrones distintos conviene el autómata (debajo: str.find en C)
+AC_MIN_KEYWORDS = int(os.getenv("RISK_KEYWORDS_AC_MIN", "300"))
+
+
+def _env_flag(name: str, default: str = "0") -> bool:
+    return os.getenv(name, default).strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _fold_table() -> Dict[int, str]:
+    """á -> a, Ü -> U, ñ -> n ...: un carácter por otro (no cambia offsets)."""
+    table = {}
+    for cp in range(0xC0, 0x250):
+        ch = chr(cp)
+        base = "".join(c for c in unicodedata.normalize("NFD", ch) if not unicodedata.combining(c))
+        if len(base) == 1 and base != ch:
+            table[cp] = base
+    return table
+
+
+_FOLD = _fold_table()
+
+
+def find_occurrences(hay: str, needle: str):
+    """Posiciones start/end de coincidencias exactas (case-insensitive)."""
+    out = []
+    if not needle.strip():
+        return out
+    lo_hay, lo_needle = hay.lower(), needle.lower()
+    idx, guard = 0, 0
+    while True:
+        pos = lo_hay.find(lo_needle, idx)
+        if pos == -1 or guard > MAX_PER_KEYWORD:
+            break
+        out.append((pos, pos + len(needle)))
+        idx = pos + len(needle)
+        guard += 1
+    return out
+
+
+class KeywordMatcher:
+    """
+    Todas las keywords en una sola pasada sobre el texto normalizado.
+    - Mismo resultado que find_occurrences() keyword por keyword: posiciones
+      sobre text.lower(), sin solapes dentro de cada keyword, mismo tope.
+    - fold_accents: "clausula" encuentra "cláusula" (y viceversa).
+    - word_boundary: solo coincidencias que no empiezan/terminan dentro de
+      una palabra.
+    - Con muchos patrones usa un autómata Aho-Corasick; con pocos, un
+      str.find por patrón sobre el texto normalizado una sola vez.
+    Se construye una vez por conjunto de keywords (ver keywords.py).
+    """
+
+    def __init__(self, keywords: List[str], fold_accents: Optional[bool] = None,
+                 word_boundary: Optional[bool] = None):
+        self.fold_accents = _env_flag("RISK_KEYWORDS_FOLD_ACCENTS") if fold_accents is None else fold_accents
+        self.word_boundary = _env_flag("RISK_KEYWORDS_WORD_BOUNDARY") if word_boundary is None else word_boundary
+        self.keywords = [k for k in keywords if k.strip()]
+        # patrones distintos (dos keywords pueden normalizar igual)
+        self._pid: Dict[str, int] = {}
+        self._kw_pid: List[int] = []
+        for k in self.keywords:
+            self._kw_pid.append(self._pid.setdefault(self.normalize(k), len(self._pid)))
+        self.patterns = list(self._pid)
+        self.use_automaton = len(self.patterns) >= AC_MIN_KEYWORDS
+        if self.use_automaton:
+            self._build()
+
+    def normalize(self, s: str) -> str:
+        s = s.lower()
+        return s.translate(_FOLD) if self.fold_accents else s
+
+    # ---------- autómata ----------
+    def _build(self) -> None:
+        goto: List[Dict[str, int]] = [{}]
+        out: List[List[int]] = [[]]
+        for pid, pat in enumerate(self.patterns):
+            s = 0
+            for ch in pat:
+                nxt = goto[s].get(ch)
+                if nxt is None:
+                    nxt = goto[s][ch] = len(goto)
+                    goto.append({})
+                    out.append([])
+                s = nxt
+            out[s].append(pid)
+
+        # enlaces de fallo por BFS (los hijos de la raíz fallan a la raíz)
+        fail = [0] * len(goto)
+        q = deque(goto[0].values())
+        while q:
+            s = q.popleft()
+            for ch, t in goto[s].items():
+                q.append(t)
+                f = fail[s]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[t] = goto[f].get(ch, 0)
+                out[t] = out[t] + out[fail[t]]
+        self._goto, self._fail = goto, fail
+        # None en estados sin salida: chequeo barato en el bucle
+        self._out = [o or None for o in out]
+
+    def _scan(self, hay: str) -> List[List[int]]:
+        """Inicios de cada patrón (todas las apariciones, en orden)."""
+        goto, fail, out = self._goto, self._fail, self._out
+        lens = [len(p) for p in self.patterns]
+        starts: List[List[int]] = [[] for _ in self.patterns]
+        s = 0
+        for i, ch in enumerate(hay):
+            while s and ch not in goto[s]:
+                s = fail[s]
+            s = goto[s].get(ch, 0)
+            o = out[s]
+            if o is not None:
+                for pid in o:
+                    starts[pid].append(i - lens[pid] + 1)
+        return starts
+
+    # ---------- búsqueda ----------
+    def _at_boundary(self, hay: str, a: int, b: int) -> bool:
+        before = hay[a - 1] if a > 0 else " "
+        after = hay[b] if b < len(hay) else " "
+        return not (before.isalnum() or before == "_") and not (after.isalnum() or after == "_")
+
+    def find_all(self, text: str) -> List[Tuple[str, int, int]]:
+        """(keyword, start, end) agrupado por keyword (en su orden) y por posición."""
+        if not self.keywords:
+            return []
+        hay = self.normalize(text)
+        starts = self._scan(hay) if self.use_automaton else None
+
+        out: List[Tuple[str, int, int]] = []
+        for kw, pid in zip(self.keywords, self._kw_pid):
+            pat = self.patterns[pid]
+            step = len(kw)  # como find_occurrences: avanza len(keyword original)
+            idx, n = 0, 0
+            cands = starts[pid] if starts is not None else None
+            ci = 0
+            while n <= MAX_PER_KEYWORD:
+                if cands is None:
+                    pos = hay.find(pat, idx)
+                    if pos == -1:
+                        break
+                else:
+                    while ci < len(cands) and cands[ci] < idx:
+                        ci += 1
+                    if ci == len(cands):
+                        break
+                    pos = cands[ci]
+                if self.word_boundary and not self._at_boundary(hay, pos, pos + len(pat)):
+                    idx = pos + 1
+                    continue
+                out.append((kw, pos, pos + step))
+                idx = pos + step
+                n += 1
+        return out
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "keywords": len(self.keywords),
+            "patterns": len(self.patterns),
+            "automaton": self.use_automaton,
+            "states": len(self._goto) if self.use_automaton else 0,
+            "fold_accents": self.fold_accents,
+            "word_boundary": self.word_boundary,
+        }
@@ -0,0 +1,69 @@
+# app/sentcache.py
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+import numpy as np
+
+
+def sentence_key(model_version: str, sentence: str) -> Hashable:
+    """(versión del modelo, sha1 de la oración): no guarda el texto completo."""
+    return (model_version, hashlib.sha1(sentence.encode("utf-8")).digest())
+
+
+class SentenceCache:
+    """
+    Salida del clasificador por oración (probabilidades por clase, o
+    similitudes con los arquetipos en el fallback), LRU acotado.
+    - Versiones sucesivas de un convenio comparten casi todas sus oraciones:
+      solo las nuevas o cambiadas pasan por el modelo.
+    - La clave incluye la versión del modelo, así que cambiar de modelo no
+      reutiliza resultados viejos.
+    - RISK_SENT_CACHE_SIZE (entradas) acota la memoria; 0 lo desactiva.
+    """
+
+    def __init__(self, max_size: Optional[int] = None):
+        self.max_size = int(os.getenv("RISK_SENT_CACHE_SIZE", "50000") if max_size is None else max_size)
+        self._data: "OrderedDict[Hashable, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: List[Hashable]) -> List[Optional[np.ndarray]]:
+        out: List[Optional[np.ndarray]] = []
+        with self._lock:
+            for k in keys:
+                v = self._data.get(k) if self.max_size > 0 else None
+                if v is None:
+                    self.misses += 1
+                else:
+                    self._data.move_to_end(k)
+                    self.hits += 1
+                out.append(v)
+        return out
+
+    def put_many(self, keys: List[Hashable], rows: np.ndarray) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            for k, row in zip(keys, rows):
+                self._data[k] = np.array(row, dtype=np.float32)
+                self._data.move_to_end(k)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
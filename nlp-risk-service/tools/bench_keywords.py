@@ -0,0 +1,102 @@
+# tools/bench_keywords.py
+"""
+Búsqueda de riesgo_keywords en un documento:
+- antes: find_occurrences() por keyword (lower() del documento + find en cada una)
+- ahora: KeywordMatcher (texto normalizado una vez; autómata Aho-Corasick
+  desde RISK_KEYWORDS_AC_MIN patrones, str.find por patrón debajo)
+
+Verifica además que las coincidencias sean idénticas a las de antes.
+
+Uso (desde nlp-risk-service/):
+    python tools/bench_keywords.py [--sizes 10,1000,10000] [--chars 60000] [--reps 3]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+# añade ../ al PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.matcher import KeywordMatcher, find_occurrences  # noqa: E402
+
+WORDS = (
+    "convenio cláusula vigencia partes obligaciones precio preferencial cantidad mínima "
+    "reemisiones certificados firma digital entidad contratante proveedor descuento "
+    "exclusivo presupuesto límite servicio compra acceso plazo resolución adenda pago "
+    "garantía penalidad rescisión confidencialidad responsabilidad del de la las los "
+    "por para con en el se un una que sus su al"
+).split()
+
+
+def make_text(n_chars, rng):
+    out, n = [], 0
+    while n < n_chars:
+        sent = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 18)))
+        sent = sent[0].upper() + sent[1:] + ". "
+        out.append(sent)
+        n += len(sent)
+    return "".join(out)
+
+
+def make_keywords(n, rng):
+    kws = []
+    seen = set()
+    while len(kws) < n:
+        k = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3)))
+        if len(kws) % 3 == 2:  # parte de las keywords no aparece en el texto
+            k += f" {rng.randint(0, 10 ** 6)}"
+        if k not in seen:
+            seen.add(k)
+            kws.append(k)
+    return kws
+
+
+def best_of(fn, reps):
+    best = float("inf")
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        res = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0, res
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10,1000,10000")
+    ap.add_argument("--chars", type=int, default=60000)
+    ap.add_argument("--reps", type=int, default=3)
+    args = ap.parse_args()
+
+    rng = random.Random(0)
+    text = make_text(args.chars, rng)
+    print(f"documento: {len(text)} caracteres")
+    print(f"{'keywords':>9} {'antes ms':>10} {'find ms':>9} {'AC ms':>9} {'build ms':>9} {'matches':>9}  iguales")
+
+    for n in [int(x) for x in args.sizes.split(",")]:
+        kws = make_keywords(n, rng)
+
+        def before():
+            return [(k, s, e) for k in kws for s, e in find_occurrences(text, k)]
+
+        t_before, ref = best_of(before, args.reps)
+
+        m_find = KeywordMatcher(kws, fold_accents=False, word_boundary=False)
+        m_find.use_automaton = False
+        t_find, res_find = best_of(lambda: m_find.find_all(text), args.reps)
+
+        t0 = time.perf_counter()
+        m_ac = KeywordMatcher(kws, fold_accents=False, word_boundary=False)
+        if not m_ac.use_automaton:
+            m_ac._build()
+            m_ac.use_automaton = True
+        t_build = (time.perf_counter() - t0) * 1000.0
+        t_ac, res_ac = best_of(lambda: m_ac.find_all(text), args.reps)
+
+        same = res_find == ref and res_ac == ref
+        print(f"{n:>9} {t_before:>10.1f} {t_find:>9.1f} {t_ac:>9.1f} {t_build:>9.1f} {len(ref):>9}  {same}")
+
+
+if __name__ == "__main__":
+    main()
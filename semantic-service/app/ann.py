@@ -0,0 +1,143 @@
+from __future__ import annotations
+from typing import Any, Dict, Optional, Tuple
+import math
+
+import numpy as np
+
+from .buffers import GrowableArray
+
+def topk_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Top-k por score descendente: argpartition O(n) + sort de solo k elementos."""
+    n = scores.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        part = np.argpartition(-scores, k - 1)[:k]
+    else:
+        part = np.arange(n)
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+def _assign(X: np.ndarray, C: np.ndarray, chunk: int = 65536) -> np.ndarray:
+    out = np.empty(X.shape[0], dtype=np.int32)
+    for a in range(0, X.shape[0], chunk):
+        out[a:a + chunk] = np.argmax(np.asarray(X[a:a + chunk], dtype=np.float32) @ C.T, axis=1)
+    return out
+
+
+class IVFIndex:
+    """
+    Índice IVF (inverted file) solo con numpy, para embeddings normalizados.
+    - k-means esférico sobre una muestra => nlist centroides.
+    - Cada fila se asigna a su centroide más cercano (listas invertidas).
+    - Consulta: se revisan solo las nprobe listas más cercanas.
+    Las filas nuevas se asignan incrementalmente con add(); conviene
+    reconstruir (build) cuando el corpus crece mucho respecto al entrenamiento.
+    """
+    def __init__(self, nlist: Optional[int] = None, nprobe: int = 8):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.centroids: Optional[np.ndarray] = None  # (nlist, d)
+        self.assign = np.empty(0, dtype=np.int32)     # (N,) lista de cada fila
+        self.trained_on = 0
+        # (orden, límites) de las listas; se arma al consultar y se publica junto
+        self._inv: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    @property
+    def assign(self) -> np.ndarray:
+        return self._assign.view()
+
+    @assign.setter
+    def assign(self, arr: np.ndarray):
+        self._assign = GrowableArray.wrap(np.asarray(arr, dtype=np.int32))
+
+    @property
+    def n(self) -> int:
+        return len(self._assign)
+
+    @property
+    def is_built(self) -> bool:
+        return self.centroids is not None
+
+    # ---------- construcción ----------
+    def build(self, X: np.ndarray, iters: int = 10, sample: int = 50000, seed: int = 0) -> None:
+        N = X.shape[0]
+        nlist = self.nlist or max(1, min(4096, int(4 * math.sqrt(N))))
+        nlist = min(nlist, N)
+        rng = np.random.default_rng(seed)
+
+        train_idx = rng.choice(N, size=min(N, sample), replace=False)
+        T = np.asarray(X[np.sort(train_idx)], dtype=np.float32)
+        # filas normalizadas (X puede venir en float16 / int8 con escala por fila)
+        T /= np.maximum(np.linalg.norm(T, axis=1, keepdims=True), 1e-12)
+        C = T[rng.choice(T.shape[0], size=nlist, replace=False)].copy()
+
+        for _ in range(iters):
+            a = _assign(T, C)
+            sums = np.zeros_like(C)
+            np.add.at(sums, a, T)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            nonempty = norms[:, 0] > 0
+            C[nonempty] = sums[nonempty] / norms[nonempty]  # centroides vacíos se conservan
+
+        self.centroids = C
+        self.nlist = nlist
+        self.assign = _assign(X, C)
+        self.trained_on = N
+        self._inv = None
+
+    def add(self, X: np.ndarray) -> None:
+        """Asigna filas nuevas (se asumen al final, en orden)."""
+        if self.centroids is None or X.shape[0] == 0:
+            return
+        self._assign.extend(_assign(X, self.centroids))
+        self._inv = None
+
+    def select(self, rows: np.ndarray) -> "IVFIndex":
+        """Mismos centroides, solo las filas dadas (renumeradas 0..len(rows)-1)."""
+        ivf = IVFIndex(self.nlist, self.nprobe)
+        ivf.centroids = self.centroids
+        ivf.assign = self.assign[rows]
+        ivf.trained_on = self.trained_on
+        return ivf
+
+    def _lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        # varios lectores a la vez: se calcula en locales y se publica en una
+        # sola asignación (nunca un orden nuevo con límites viejos)
+        inv = self._inv
+        if inv is None:
+            assign = self.assign
+            order = np.argsort(assign, kind="stable")
+            bounds = np.searchsorted(assign[order], np.arange(len(self.centroids) + 1))
+            inv = self._inv = (order, bounds)
+        return inv
+
+    # ---------- consulta ----------
+    def candidates(self, q_vec: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Filas de las nprobe listas más cercanas a q (ordenadas por id de fila)."""
+        order, bounds = self._lists()
+        cs = self.centroids @ q_vec
+        probe = topk_indices(cs, nprobe or self.nprobe)
+        parts = [order[bounds[j]:bounds[j + 1]] for j in probe]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(parts))
+
+    # ---------- persistencia ----------
+    def to_arrays(self) -> Dict[str, Any]:
+        return {
+            "centroids": self.centroids,
+            "assign": self.assign,
+            "nprobe": np.int64(self.nprobe),
+            "trained_on": np.int64(self.trained_on),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrs) -> "IVFIndex":
+        ivf = cls(nprobe=int(arrs["nprobe"]))
+        ivf.centroids = np.asarray(arrs["centroids"], dtype=np.float32)
+        ivf.nlist = ivf.centroids.shape[0]
+        ivf.assign = np.asarray(arrs["assign"], dtype=np.int32)
+        ivf.trained_on = int(arrs["trained_on"])
+        return ivf
@@ -1,18 +1,47 @@
 from __future__ import annotations
-from typing import List, Optional
-from fastapi import FastAPI
+from typing import List, Literal, Optional, Union
+import os
+import threading
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 
+from .jobs import Job, JobQueue, RWLock
+from .qa import answer_from_index
+from .readiness import ModelLoader
 from .semantic import SemanticIndexer
-from .storage import save_index, load_index
+from .storage import (
+    append_segment, load_index, save_ann, load_ann, maybe_compact_async, segment_stats,
+    save_index, save_tombstones, load_tombstones, load_lexical, load_sentences,
+)
 
 app = FastAPI(title="Semantic Service", version="0.1.0")
 
-# indexador global
-indexer: SemanticIndexer = SemanticIndexer()
+# indexador global (modelos en segundo plano: ver /ready)
+indexer: SemanticIndexer = SemanticIndexer(lazy=True)
+loader = ModelLoader(indexer.load_models, indexer.warmup)
+
+# segundos que una petición espera a que los modelos terminen de cargar
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", "60"))
+
+# consultas máximas por /search/batch
+SEARCH_BATCH_MAX = int(os.getenv("SEARCH_BATCH_MAX", "64"))
+
+# serializa los escritores (index / delete / compactación), incluida la persistencia
+_write_lock = threading.Lock()
+# búsquedas (lectores) vs. cambios al índice en memoria (escritor): el escritor
+# solo lo toma para aplicar lo ya calculado (filas embebidas, IVF reentrenado,
+# copias compactadas), nunca durante el encode, el k-means ni las copias
+_rw = RWLock()
+
+
+def _require_models():
+    if not loader.wait(timeout=READY_TIMEOUT):
+        raise HTTPException(status_code=503, detail=f"Modelos no disponibles ({loader.state}).")
 
 
 class DocIn(BaseModel):
+    id: Optional[Union[int, str]] = None  # id de fragmento (opcional, para upsert)
     convenio_id: int
     version_id: int
     fragmento: str
@@ -21,43 +50,212 @@ class DocIn(BaseModel):
 
 class IndexIn(BaseModel):
     items: List[DocIn]
+    # reemplaza lo ya indexado de cada convenio/versión (o solo los ids enviados)
+    upsert: bool = False
+    # espera a que el job termine y responde con su resultado (como antes)
+    wait: bool = False
 
 
 class SearchIn(BaseModel):
     query: str
-    k: int = 5
+    k: int = Field(5, ge=0)
     convenio_id: Optional[int] = None
     version_id: Optional[int] = None
+    # dense | hybrid (denso + BM25 por RRF) | bm25; por defecto SEMANTIC_SEARCH_MODE
+    mode: Optional[Literal["dense", "hybrid", "bm25"]] = None
+
+
+class SearchBatchIn(BaseModel):
+    queries: List[SearchIn] = Field(..., max_length=SEARCH_BATCH_MAX)
+
+
+class QARef(BaseModel):
+    convenio_id: int
+    version_id: Optional[int] = None  # None => todas las versiones del convenio
+
+
+class QARefRequest(BaseModel):
+    question: str
+    refs: List[QARef]
+    top_k: int = 5
+
+
+class QARefResponse(BaseModel):
+    answer: str
+    used: List[QARef]
 
 
 @app.on_event("startup")
 def _startup():
+    loader.start()
     # intenta cargar si existe
     docs, emb = load_index()
-    if docs:
+    if docs and emb is not None:
         indexer.docs = docs
-        indexer.embeddings = emb
+        indexer.vectors = emb.astype(indexer.precision)
+        indexer.mark_deleted(load_tombstones())
+        indexer.lexical = load_lexical()
+        indexer.lexical  # si no estaba persistido se arma ya, no en la primera búsqueda
+        indexer.sentences = load_sentences()
+        indexer.ann = load_ann()
+        indexer.sync_ann()
         print(f"[semantic-service] índice cargado: {len(docs)} fragmentos.")
     else:
         print("[semantic-service] índice vacío.")
 
 
+@app.get("/ready")
+def ready():
+    """Listo para tráfico solo tras carga + warm-up (503 mientras tanto)."""
+    return JSONResponse(loader.status(), status_code=200 if loader.ready else 503)
+
+
 @app.get("/health")
 def health():
-    return {"ok": True, "docs": len(indexer.docs)}
+    with _rw.read():
+        return {
+            "ok": True,
+            "docs": indexer.live_count,
+            "tombstones": indexer.n_deleted,
+            "quantize": indexer.quantize,
+            "vectors": indexer.vectors.stats(),
+            "storage": segment_stats(),
+            "ann": indexer.ann_mode if indexer.ann is not None else "exact",
+            "search_mode": indexer.search_mode,
+            "lexical": indexer.lexical_stats(),
+            "sentences": indexer.sentences.stats(),
+            "batcher": indexer.batcher.stats() if indexer.batcher is not None else None,
+            "query_ner": indexer.query_ner,
+            "query_cache": indexer.query_cache.stats(),
+            "sentence_cache": indexer.sentence_cache.stats(),
+            "timings": indexer.timings.stats(),
+            "jobs": jobs.stats(),
+        }
 
 
-@app.post("/index")
+def _persist_deletes():
+    """
+    Guarda los tombstones; si hay demasiados, compacta y reescribe el índice.
+    Se llama con _write_lock tomado: las copias se arman sin bloquear búsquedas.
+    """
+    if indexer.needs_compaction():
+        prepared = indexer.prepare_compaction()
+        with _rw.write():
+            indexer.compact(prepared)
+        save_index(indexer.docs, indexer.vectors, indexer.sentences)
+        save_ann(indexer.ann)
+    else:
+        save_tombstones(indexer.deleted_rows())
+
+
+def _process_jobs(batch: List[Job]):
+    """
+    Worker de indexado: un solo encode para todos los jobs pendientes (sin
+    locks, las búsquedas siguen), luego se aplican bajo el lock de escritura
+    (rápido: solo agrega filas) y se persiste el lote como un segmento.
+    Si el IVF necesita (re)entrenarse, el k-means corre fuera de ese lock y
+    solo se cambia la referencia.
+    """
+    prep = indexer.prepare_docs([it for j in batch for it in j.payload["items"]])
+    parts = indexer.split_prepared(prep, [j.size for j in batch])
+    counts = []
+    with _write_lock:
+        start = len(indexer.docs)
+        indexer.lexical  # por si falta: se arma antes de tomar el lock de escritura
+        with _rw.write():
+            for j, part in zip(batch, parts):
+                if j.payload["upsert"]:
+                    counts.append(indexer.upsert_docs(part["items"], part, retrain=False))
+                else:
+                    counts.append((indexer.add_docs(part["items"], part, retrain=False), 0))
+        if indexer.ann_needs_training():
+            ann = indexer.train_ann()
+            with _rw.write():
+                indexer.ann = ann
+        stop = len(indexer.docs)
+        # persistimos solo el lote nuevo (segmento inmutable); compactación en segundo plano
+        append_segment(indexer.docs[start:stop], indexer.vectors.take(start, stop),
+                       indexer.sentences.take(start, stop))
+        save_ann(indexer.ann)
+        if any(replaced for _, replaced in counts):
+            _persist_deletes()
+        total = indexer.live_count
+    for j, (added, replaced) in zip(batch, counts):
+        j.finish({"added": added, "replaced": replaced, "total": total})
+    maybe_compact_async()
+
+
+jobs = JobQueue(_process_jobs,
+                max_items=int(os.getenv("INDEX_JOB_MAX_ITEMS", "256")),
+                keep=int(os.getenv("INDEX_JOBS_KEEP", "1000")))
+
+
+@app.post("/index", status_code=202)
 def index(payload: IndexIn):
-    added = indexer.add_docs([d.model_dump() for d in payload.items])
-    # persistimos
-    save_index(indexer.docs, indexer.embeddings)
-    return {"ok": True, "added": added, "total": len(indexer.docs)}
+    """Encola el lote; devuelve el id del job (estado en /jobs/{id})."""
+    _require_models()
+    items = [d.model_dump(exclude_none=True) for d in payload.items]
+    job = jobs.submit({"items": items, "upsert": payload.upsert}, len(items))
+    if not payload.wait:
+        return {"ok": True, "job_id": job.id, "status": job.status}
+
+    job.wait()
+    if job.status == "error":
+        raise HTTPException(status_code=500, detail=job.error)
+    return JSONResponse({"ok": True, "job_id": job.id, **job.result}, status_code=200)
+
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job desconocido (o ya descartado).")
+    return {"ok": True, **job.info()}
+
+
+@app.delete("/index")
+def delete(convenio_id: int, version_id: Optional[int] = None, id: Optional[str] = None):
+    """Borra los fragmentos de un convenio (o de una versión, o un fragmento por id)."""
+    with _write_lock:
+        with _rw.write():
+            deleted = indexer.delete(convenio_id, version_id, ids={id} if id is not None else None)
+        if deleted:
+            _persist_deletes()
+        total = indexer.live_count
+    return {"ok": True, "deleted": deleted, "total": total}
 
 
 @app.post("/search")
 def search(payload: SearchIn):
-    res = indexer.search(payload.query, k=payload.k,
-                         convenio_id=payload.convenio_id,
-                         version_id=payload.version_id)
-    return {"ok": True, "results": res}
\ No newline at end of file
+    _require_models()
+    queries = [payload.model_dump()]
+    # encode fuera del lock: con un escritor esperando, no retiene a otros lectores
+    q_vecs = indexer.query_vectors(queries)
+    with _rw.read():
+        res = indexer.search_batch(queries, q_vecs=q_vecs)[0]
+    return {"ok": True, "results": res}
+
+
+@app.post("/search/batch")
+def search_batch(payload: SearchBatchIn):
+    """Varias consultas en una llamada: un encode y un producto matricial por filtro."""
+    _require_models()
+    queries = [q.model_dump() for q in payload.queries]
+    q_vecs = indexer.query_vectors(queries)
+    with _rw.read():
+        res = indexer.search_batch(queries, q_vecs=q_vecs)
+    return {"ok": True, "results": res}
+
+
+@app.post("/qa/ref", response_model=QARefResponse)
+def qa_ref(req: QARefRequest):
+    """
+    /qa sobre fragmentos ya indexados: solo referencias convenio/versión, sin
+    texto; las oraciones y sus embeddings se calcularon al indexar.
+    Solo las lecturas del índice van bajo _rw (los encodes, fuera).
+    """
+    _require_models()
+    answer, used = answer_from_index(indexer, req.question,
+                                     [r.model_dump() for r in req.refs], req.top_k,
+                                     read_lock=_rw.read)
+    return QARefResponse(answer=answer, used=used)
@@ -0,0 +1,125 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional
+from concurrent.futures import Future
+import asyncio
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+EncodeFn = Callable[[List[str]], np.ndarray]
+
+
+class _Job:
+    __slots__ = ("texts", "future")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future: "Future[np.ndarray]" = Future()
+
+
+class EncodeBatcher:
+    """
+    Micro-batching para un encoder compartido.
+    - Las peticiones concurrentes se acumulan hasta max_wait_ms (o max_batch
+      textos) y se codifican en UN solo forward pass.
+    - Cada llamador recibe solo sus filas.
+    - encode() bloquea (threadpool de FastAPI); encode_async() para endpoints async.
+    """
+    def __init__(self, encode_fn: EncodeFn, max_batch: int = 64, max_wait_ms: float = 5.0):
+        self.encode_fn = encode_fn
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._q: "queue.Queue[_Job]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+        self.requests = 0
+        self.texts = 0
+
+    def _ensure_worker(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="encode-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, texts: List[str]) -> "Future[np.ndarray]":
+        job = _Job(list(texts))
+        if not job.texts:
+            job.future.set_result(np.empty((0, 0), dtype=np.float32))
+            return job.future
+        self._ensure_worker()
+        self._q.put(job)
+        return job.future
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.submit(texts).result()
+
+    async def encode_async(self, texts: List[str]) -> np.ndarray:
+        return await asyncio.wrap_future(self.submit(texts))
+
+    # ---------- worker ----------
+    def _collect(self) -> List[_Job]:
+        jobs = [self._q.get()]
+        n = len(jobs[0].texts)
+        deadline = time.monotonic() + self.max_wait
+        while n < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                job = self._q.get(timeout=remaining)
+            except queue.Empty:
+                break
+            jobs.append(job)
+            n += len(job.texts)
+        return jobs
+
+    def _loop(self):
+        while True:
+            jobs = self._collect()
+            texts = [t for j in jobs for t in j.texts]
+            try:
+                vecs = np.asarray(self.encode_fn(texts), dtype=np.float32)
+            except Exception as e:  # el error llega a cada llamador
+                for j in jobs:
+                    j.future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.requests += len(jobs)
+            self.texts += len(texts)
+            pos = 0
+            for j in jobs:
+                j.future.set_result(vecs[pos:pos + len(j.texts)])
+                pos += len(j.texts)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self.batches,
+            "requests": self.requests,
+            "texts": self.texts,
+            "avg_batch": round(self.texts / self.batches, 2) if self.batches else 0.0,
+            "pending": self._q.qsize(),
+        }
+
+
+def batcher_from_env(encode_fn: EncodeFn) -> Optional[EncodeBatcher]:
+    """
+    ENCODE_BATCHER=0 desactiva el micro-batching (encode directo).
+    ENCODE_MAX_BATCH / ENCODE_BATCH_WAIT_MS ajustan el tamaño y la espera.
+    """
+    if os.getenv("ENCODE_BATCHER", "1").strip().lower() in {"0", "false", "no", "off"}:
+        return None
+    return EncodeBatcher(
+        encode_fn,
+        max_batch=int(os.getenv("ENCODE_MAX_BATCH", "64")),
+        max_wait_ms=float(os.getenv("ENCODE_BATCH_WAIT_MS", "5")),
+    )
@@ -0,0 +1,164 @@
+from __future__ import annotations
+from typing import List, Tuple
+
+import numpy as np
+
+
+class GrowableArray:
+    """
+    Arreglo con capacidad que se duplica y un contador lógico de filas.
+    - extend() es O(k) amortizado: solo copia al reasignar (capacidad x2).
+    - view() expone el prefijo lleno; las vistas ya entregadas siguen siendo
+      válidas (las escrituras nuevas caen fuera de su rango).
+    - Puede envolver un arreglo existente sin copiarlo (p.ej. un mmap de solo
+      lectura); la primera escritura lo copia a un buffer propio.
+    """
+    def __init__(self, dtype, row_shape: Tuple[int, ...] = (), capacity: int = 0):
+        self.dtype = np.dtype(dtype)
+        self.row_shape = tuple(row_shape)
+        self._buf = np.empty((capacity,) + self.row_shape, dtype=self.dtype)
+        self._n = 0
+
+    @classmethod
+    def wrap(cls, arr: np.ndarray) -> "GrowableArray":
+        g = cls(arr.dtype, arr.shape[1:])
+        g._buf = arr
+        g._n = int(arr.shape[0])
+        return g
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def capacity(self) -> int:
+        return int(self._buf.shape[0])
+
+    @property
+    def nbytes(self) -> int:
+        return self._n * self.dtype.itemsize * int(np.prod(self.row_shape, dtype=np.int64))
+
+    def view(self) -> np.ndarray:
+        return self._buf[:self._n]
+
+    def _reserve(self, need: int) -> None:
+        if need <= self.capacity and self._buf.flags.writeable:
+            return
+        cap = max(need, 2 * self.capacity, 16)
+        buf = np.empty((cap,) + self.row_shape, dtype=self.dtype)
+        buf[:self._n] = self._buf[:self._n]
+        self._buf = buf
+
+    def extend(self, rows: np.ndarray) -> None:
+        rows = np.asarray(rows, dtype=self.dtype).reshape((-1,) + self.row_shape)
+        k = rows.shape[0]
+        if k == 0:
+            return
+        self._reserve(self._n + k)
+        self._buf[self._n:self._n + k] = rows
+        self._n += k
+
+
+class SegmentedArray:
+    """
+    Varios arreglos de solo lectura (p.ej. el mmap de cada segmento) vistos
+    como uno solo, sin concatenarlos; las filas agregadas van a un
+    GrowableArray al final, así lo mapeado nunca se copia a RAM.
+    - view(): el arreglo tal cual si hay una sola parte; si no, el propio
+      SegmentedArray.
+    - Indexar con slice o arreglo de filas devuelve un ndarray con solo esas
+      filas (copia únicamente si cruzan partes o son índices sueltos).
+    """
+    def __init__(self, parts: List[np.ndarray]):
+        self.dtype = np.dtype(parts[0].dtype)
+        self.row_shape = tuple(parts[0].shape[1:])
+        self._parts = [p for p in parts if p.shape[0]]
+        self._base_n = sum(int(p.shape[0]) for p in self._parts)
+        self._tail = GrowableArray(self.dtype, self.row_shape)
+
+    @classmethod
+    def join(cls, arrays) -> "SegmentedArray":
+        parts: List[np.ndarray] = []
+        for a in arrays:
+            parts.extend(a._chunks() if isinstance(a, SegmentedArray) else [a])
+        return cls(parts)
+
+    def _chunks(self) -> List[np.ndarray]:
+        tail = self._tail.view()
+        return self._parts + [tail] if tail.shape[0] else list(self._parts)
+
+    def __len__(self) -> int:
+        return self._base_n + len(self._tail)
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return (len(self),) + self.row_shape
+
+    @property
+    def ndim(self) -> int:
+        return 1 + len(self.row_shape)
+
+    @property
+    def capacity(self) -> int:
+        return self._base_n + self._tail.capacity
+
+    @property
+    def nbytes(self) -> int:
+        return sum(int(p.nbytes) for p in self._parts) + self._tail.nbytes
+
+    def view(self):
+        parts = self._chunks()
+        if len(parts) == 1:
+            return parts[0]
+        return self if parts else self._tail.view()
+
+    def extend(self, rows: np.ndarray) -> None:
+        self._tail.extend(rows)
+
+    def __getitem__(self, key) -> np.ndarray:
+        parts = self._chunks()
+        starts = np.cumsum([0] + [p.shape[0] for p in parts])
+        n = int(starts[-1])
+        if isinstance(key, slice):
+            a, b, step = key.indices(n)
+            if step != 1:
+                return self[np.arange(a, b, step)]
+            pieces = [p[max(a - s, 0):b - s] for p, s in zip(parts, starts.tolist())
+                      if s < b and s + p.shape[0] > a]
+            if len(pieces) == 1:
+                return pieces[0]
+            return np.concatenate(pieces) if pieces else np.empty((0,) + self.row_shape, self.dtype)
+        if isinstance(key, (int, np.integer)):
+            i = int(key) + (n if key < 0 else 0)
+            if not 0 <= i < n:
+                raise IndexError(key)
+            j = int(np.searchsorted(starts, i, side="right")) - 1
+            return parts[j][i - starts[j]]
+
+        rows = np.asarray(key)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        rows = rows.astype(np.int64, copy=False)
+        part = np.searchsorted(starts, rows, side="right") - 1
+        out = np.empty((rows.shape[0],) + self.row_shape, dtype=self.dtype)
+        for j in np.unique(part).tolist():
+            m = part == j
+            out[m] = parts[j][rows[m] - starts[j]]
+        return out
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        parts = self._chunks()
+        out = np.concatenate(parts) if parts else np.empty((0,) + self.row_shape, self.dtype)
+        return out if dtype is None else out.astype(dtype, copy=False)
+
+
+def row_buffer(arr):
+    """
+    Buffer de filas para un arreglo existente: los de solo lectura (mmap) o
+    ya segmentados van a SegmentedArray (nunca se copian); el resto se
+    envuelve sin copia en un GrowableArray.
+    """
+    if isinstance(arr, SegmentedArray):
+        return arr
+    if isinstance(arr, np.ndarray) and not arr.flags.writeable:
+        return SegmentedArray([arr])
+    return GrowableArray.wrap(np.asarray(arr))
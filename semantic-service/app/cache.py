@@ -0,0 +1,156 @@
+from __future__ import annotations
+from typing import Any, Dict, Hashable, Optional
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+
+
+class LRUCache:
+    """
+    Caché LRU en memoria, thread-safe, acotado por número de entradas.
+    - max_size <= 0 desactiva el caché (todo es miss).
+    - ttl (segundos, opcional): las entradas vencidas cuentan como miss.
+    """
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        self.max_size = int(max_size)
+        self.ttl = float(ttl) if ttl and ttl > 0 else None
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (valor, vence)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or time.monotonic() < expires:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.expired += 1
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.max_size <= 0:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def text_key(text: str, model_name: str) -> str:
+    """Clave por contenido: hash del texto (ya limpio) + nombre del modelo."""
+    h = hashlib.sha1()
+    h.update(model_name.encode("utf-8"))
+    h.update(b"\x00")
+    h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Caché de embeddings direccionado por contenido.
+    - Nivel 1: LRU en memoria (max_size entradas).
+    - Nivel 2 (opcional): un .npy por clave en disk_dir; sobrevive reinicios.
+    El texto debe llegar ya limpio (clean_ocr_text), así la clave es estable.
+    """
+    def __init__(self, model_name: str, max_size: int = 2048,
+                 disk_dir: Optional[str] = None):
+        self.model_name = model_name
+        self.mem = LRUCache(max_size)
+        self.disk_dir = disk_dir
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+        self.disk_hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        return text_key(text, self.model_name)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir or "", key[:2], key + ".npy")
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        key = self.key(text)
+        vec = self.mem.get(key)
+        if vec is not None:
+            return vec
+
+        if self.disk_dir:
+            fp = self._disk_path(key)
+            if os.path.isfile(fp):
+                try:
+                    vec = np.load(fp)
+                except (OSError, ValueError):
+                    vec = None
+                if vec is not None:
+                    self.disk_hits += 1
+                    self.mem.put(key, vec)
+                    return vec
+
+        self.misses += 1
+        return None
+
+    def put(self, text: str, vec: np.ndarray) -> None:
+        key = self.key(text)
+        vec = np.asarray(vec, dtype=np.float32)
+        self.mem.put(key, vec)
+
+        if self.disk_dir:
+            fp = self._disk_path(key)
+            if os.path.isfile(fp):
+                return
+            os.makedirs(os.path.dirname(fp), exist_ok=True)
+            tmp = fp + f".{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp, "wb") as f:
+                    np.save(f, vec)
+                os.replace(tmp, fp)
+            except OSError:
+                # el nivel de disco es best-effort
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+    def stats(self) -> Dict[str, Any]:
+        mem = self.mem.stats()
+        lookups = mem["hits"] + self.disk_hits + self.misses
+        return {
+            "model": self.model_name,
+            "mem_size": mem["size"],
+            "mem_max_size": mem["max_size"],
+            "mem_hits": mem["hits"],
+            "disk_enabled": bool(self.disk_dir),
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((mem["hits"] + self.disk_hits) / lookups, 4) if lookups else 0.0,
+        }
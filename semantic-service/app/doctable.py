@@ -0,0 +1,127 @@
+from __future__ import annotations
+from typing import Any, Dict, Iterator, List
+import bisect
+import json
+
+import numpy as np
+
+from .buffers import GrowableArray
+
+# id ausente en las columnas enteras
+NULL_ID = -1
+
+ID_COLUMNS = ("convenio_id", "version_id")
+
+
+def _id(v: Any) -> int:
+    return NULL_ID if v is None else int(v)
+
+
+class DocTable:
+    """
+    Metadatos de fragmentos en forma columnar.
+    - Columnas enteras convenio_id / version_id (np.int64) para filtrar sin
+      recorrer dicts.
+    - Cada fila completa es un JSON dentro de un blob (el .jsonl del segmento)
+      indexado por offsets; se decodifica solo al acceder a esa fila.
+    - Los blobs suelen ser mmap de solo lectura: varios workers comparten las
+      páginas del page cache. Las filas agregadas en memoria van a 'tail'.
+    Se comporta como una lista de dicts (len, índice, slice, iteración, extend).
+    """
+    def __init__(self):
+        self._parts: List[tuple] = []   # (blob, offsets, ids (n, 2))
+        self._starts: List[int] = []    # fila inicial de cada parte
+        self._base_n = 0
+        self._tail: List[Dict[str, Any]] = []
+        self._ids = GrowableArray(np.int64, (2,))  # columnas (N, 2) de todas las filas
+
+    # ---------- construcción ----------
+    def add_part(self, blob, offsets: np.ndarray, ids: np.ndarray) -> None:
+        """Agrega un segmento persistido: blob JSONL + offsets (n+1,) + ids (n, 2)."""
+        if self._tail:
+            raise ValueError("No se pueden agregar segmentos después de filas en memoria.")
+        n = int(ids.shape[0])
+        if n == 0:
+            return
+        self._starts.append(self._base_n)
+        self._parts.append((blob, offsets, ids))
+        self._base_n += n
+        if not self._parts[:-1]:
+            self._ids = GrowableArray.wrap(ids)  # primer segmento: sin copia
+        else:
+            self._ids.extend(ids)
+
+    def append(self, item: Dict[str, Any]) -> None:
+        self.extend([item])
+
+    def extend(self, items) -> None:
+        items = list(items)
+        if not items:
+            return
+        self._tail.extend(items)
+        self._ids.extend([[_id(it.get(c)) for c in ID_COLUMNS] for it in items])
+
+    # ---------- columnas ----------
+    def ids(self) -> np.ndarray:
+        """Matriz (N, 2) int64 con [convenio_id, version_id] de cada fila."""
+        return self._ids.view()
+
+    def column(self, name: str) -> np.ndarray:
+        return self.ids()[:, ID_COLUMNS.index(name)]
+
+    # ---------- acceso tipo lista ----------
+    def __len__(self) -> int:
+        return self._base_n + len(self._tail)
+
+    def _row(self, i: int) -> Dict[str, Any]:
+        if i >= self._base_n:
+            return self._tail[i - self._base_n]
+        p = bisect.bisect_right(self._starts, i) - 1
+        blob, offsets, _ = self._parts[p]
+        j = i - self._starts[p]
+        return json.loads(blob[int(offsets[j]):int(offsets[j + 1])])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._row(j) for j in range(*i.indices(len(self)))]
+        i = int(i)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._row(i)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self._row(i)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def select(self, rows) -> "DocTable":
+        """Nueva tabla solo con las filas dadas (un blob en memoria, columnar)."""
+        t = DocTable()
+        if len(rows):
+            t.add_part(*encode_rows([self._row(int(i)) for i in rows]))
+        return t
+
+    @classmethod
+    def from_list(cls, items: List[Dict[str, Any]]) -> "DocTable":
+        t = cls()
+        t.extend(items)
+        return t
+
+
+def encode_rows(docs) -> tuple:
+    """(blob bytes, offsets (n+1,), ids (n, 2)) para escribir un segmento."""
+    chunks: List[bytes] = []
+    offsets = np.zeros(len(docs) + 1, dtype=np.int64)
+    ids = np.empty((len(docs), 2), dtype=np.int64)
+    pos = 0
+    for i, d in enumerate(docs):
+        b = (json.dumps(d, ensure_ascii=False) + "\n").encode("utf-8")
+        chunks.append(b)
+        pos += len(b)
+        offsets[i + 1] = pos
+        ids[i] = [_id(d.get(c)) for c in ID_COLUMNS]
+    return b"".join(chunks), offsets, ids
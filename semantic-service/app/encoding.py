@@ -0,0 +1,28 @@
+from __future__ import annotations
+from typing import Callable, List, Optional
+
+import numpy as np
+
+
+EncodeFn = Callable[[List[str]], np.ndarray]
+
+
+def encode_sorted(encode_fn: EncodeFn, texts: List[str], batch_size: int = 32) -> Optional[np.ndarray]:
+    """
+    Codifica textos en lotes ordenados por longitud.
+    - Lotes de longitud similar => menos padding por forward pass.
+    - Devuelve la matriz (n, d) en el orden original de 'texts'.
+    """
+    if not texts:
+        return None
+    batch_size = max(1, int(batch_size))
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+
+    out: Optional[np.ndarray] = None
+    for b in range(0, len(order), batch_size):
+        idx = order[b:b + batch_size]
+        vecs = np.asarray(encode_fn([texts[i] for i in idx]), dtype=np.float32)
+        if out is None:
+            out = np.empty((len(texts), vecs.shape[1]), dtype=np.float32)
+        out[idx] = vecs
+    return out
@@ -0,0 +1,183 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional
+from collections import OrderedDict
+from contextlib import contextmanager
+import queue
+import threading
+import time
+import uuid
+
+
+class RWLock:
+    """
+    Lock lectores/escritor.
+    - Varios lectores (búsquedas) a la vez; el escritor entra solo.
+    - Preferencia al escritor: si hay uno esperando, los lectores nuevos
+      esperan (las escrituras son cortas y no quedan postergadas).
+    """
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class Job:
+    """Un pedido de indexado y su estado: queued | running | done | error."""
+    def __init__(self, payload: Any, size: int):
+        self.id = uuid.uuid4().hex
+        self.payload = payload
+        self.size = size
+        self.status = "queued"
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.queued_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._done = threading.Event()
+
+    def finish(self, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        self.result = result
+        self.error = error
+        self.status = "error" if error is not None else "done"
+        self.finished_at = time.time()
+        self._done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "items": self.size,
+            "result": self.result,
+            "error": self.error,
+            "queued_at": self.queued_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+ProcessFn = Callable[[List[Job]], None]
+
+
+class JobQueue:
+    """
+    Cola de indexado con un worker en segundo plano.
+    - submit() devuelve el Job al instante; el llamador consulta su estado.
+    - El worker toma los pedidos pendientes (hasta max_items ítems) y los
+      procesa juntos: process_fn recibe la lista y debe cerrar cada Job.
+    - Se recuerdan los últimos 'keep' jobs terminados (consulta por id).
+    """
+    def __init__(self, process_fn: ProcessFn, max_items: int = 256, keep: int = 1000):
+        self.process_fn = process_fn
+        self.max_items = max(1, int(max_items))
+        self.keep = max(1, int(keep))
+        self._q: "queue.Queue[Job]" = queue.Queue()
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+        self.done = 0
+        self.failed = 0
+
+    def _ensure_worker(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="index-jobs", daemon=True)
+                self._thread.start()
+
+    def submit(self, payload: Any, size: int) -> Job:
+        job = Job(payload, size)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict()
+        self._ensure_worker()
+        self._q.put(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _evict(self):
+        # descarta los terminados más antiguos; los pendientes no se tocan
+        finished = [k for k, j in self._jobs.items() if j.finished_at is not None]
+        for k in finished[:max(0, len(finished) - self.keep)]:
+            del self._jobs[k]
+
+    # ---------- worker ----------
+    def _collect(self) -> List[Job]:
+        jobs = [self._q.get()]
+        n = jobs[0].size
+        while n < self.max_items:
+            try:
+                job = self._q.get_nowait()
+            except queue.Empty:
+                break
+            jobs.append(job)
+            n += job.size
+        return jobs
+
+    def _loop(self):
+        while True:
+            jobs = self._collect()
+            now = time.time()
+            for j in jobs:
+                j.status, j.started_at = "running", now
+            try:
+                self.process_fn(jobs)
+            except Exception as e:  # el error queda en cada job sin cerrar
+                for j in jobs:
+                    if j.finished_at is None:
+                        j.finish(error=f"{type(e).__name__}: {e}")
+            self.batches += 1
+            for j in jobs:
+                if j.status == "done":
+                    self.done += 1
+                else:
+                    self.failed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            running = sum(1 for j in self._jobs.values() if j.status == "running")
+        return {
+            "max_items": self.max_items,
+            "pending": self._q.qsize(),
+            "running": running,
+            "batches": self.batches,
+            "done": self.done,
+            "failed": self.failed,
+        }
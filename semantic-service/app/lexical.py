@@ -0,0 +1,225 @@
+from __future__ import annotations
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from collections import Counter
+import math
+import re
+import unicodedata
+
+import numpy as np
+
+from .ann import topk_indices
+from .buffers import GrowableArray
+
+# montos / numerales ("15.000", "3,5") como un solo token; si no, palabras
+_TOKEN_RE = re.compile(r"\d+(?:[.,]\d+)*|[^\W\d_]+")
+
+# palabras funcionales frecuentes (no aportan al ranking y engordan las listas)
+STOPWORDS = frozenset("""
+a al ante con contra de del desde durante e el en entre es esta este esto hacia
+hasta la las le les lo los mas me mediante ni no o os para pero por que se segun
+si sin sobre su sus te tu u un una unas uno unos y ya
+""".split())
+
+
+def _fold(s: str) -> str:
+    """Minúsculas sin tildes (cláusula == clausula)."""
+    s = unicodedata.normalize("NFKD", s.lower())
+    return "".join(ch for ch in s if not unicodedata.combining(ch))
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(_fold(text or "")) if t not in STOPWORDS]
+
+
+def segment_postings(texts: Iterable[str]) -> Dict[str, np.ndarray]:
+    """
+    Postings de un lote de textos (filas locales 0..n-1), en arreglos planos
+    para guardarlos junto al segmento:
+    terms (T,), ptr (T+1,), rows / tf (P,) agrupados por término, doclen (n,).
+    """
+    vocab: Dict[str, int] = {}
+    tids: List[int] = []
+    rows: List[int] = []
+    tfs: List[int] = []
+    doclen: List[int] = []
+    for row, text in enumerate(texts):
+        counts = Counter(tokenize(text))
+        doclen.append(sum(counts.values()))
+        for term, c in counts.items():
+            tids.append(vocab.setdefault(term, len(vocab)))
+            rows.append(row)
+            tfs.append(c)
+
+    tids_a = np.asarray(tids, dtype=np.int64)
+    order = np.argsort(tids_a, kind="stable")  # filas ascendentes dentro de cada término
+    return {
+        "terms": np.asarray(list(vocab), dtype=np.str_),
+        "ptr": np.searchsorted(tids_a[order], np.arange(len(vocab) + 1)).astype(np.int64),
+        "rows": np.asarray(rows, dtype=np.int64)[order],
+        "tf": np.asarray(tfs, dtype=np.int32)[order],
+        "doclen": np.asarray(doclen, dtype=np.int32),
+    }
+
+
+def take_postings(p: Dict[str, np.ndarray], start: int, stop: int) -> Dict[str, np.ndarray]:
+    """Las filas start..stop-1 de segment_postings() (renumeradas desde 0)."""
+    tids = np.repeat(np.arange(len(p["terms"])), np.diff(p["ptr"]))
+    m = (p["rows"] >= start) & (p["rows"] < stop)
+    counts = np.bincount(tids[m], minlength=len(p["terms"]))
+    used = counts > 0
+    return {
+        "terms": p["terms"][used],
+        "ptr": np.concatenate(([0], np.cumsum(counts[used]))).astype(np.int64),
+        "rows": p["rows"][m] - start,
+        "tf": p["tf"][m],
+        "doclen": p["doclen"][start:stop],
+    }
+
+
+class BM25Index:
+    """
+    Índice invertido léxico (BM25) sobre los fragmentos.
+    - add(): filas nuevas al final; por término se agregan trozos (sin
+      recorrer lo anterior) que se consolidan al consultar.
+    - search(): top-k por BM25, opcionalmente restringido a filas dadas y
+      saltando filas borradas.
+    Complementa al denso con nombres propios, números de artículo y montos.
+    """
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._vocab: Dict[str, int] = {}
+        # por término: trozos (filas, frecuencias); cada trozo es una tupla, así
+        # filas y frecuencias siempre se leen juntas y del mismo largo
+        self._chunks: List[List[Tuple[np.ndarray, np.ndarray]]] = []
+        self._doclen = GrowableArray(np.int32)
+        self._total_len = 0
+        self._norm: Optional[np.ndarray] = None  # caché de _norms()
+
+    @property
+    def n(self) -> int:
+        return len(self._doclen)
+
+    # ---------- construcción ----------
+    def add(self, texts: Iterable[str]) -> None:
+        self.add_postings(segment_postings(texts))
+
+    def add_postings(self, p: Dict[str, np.ndarray]) -> None:
+        """Agrega las filas de segment_postings() a continuación de las actuales."""
+        off = self.n
+        ptr = p["ptr"]
+        for j, term in enumerate(p["terms"].tolist()):
+            tid = self._vocab.get(term)
+            if tid is None:
+                tid = self._vocab[term] = len(self._chunks)
+                self._chunks.append([])
+            a, b = int(ptr[j]), int(ptr[j + 1])
+            self._chunks[tid].append((np.asarray(p["rows"][a:b], dtype=np.int64) + off,
+                                      np.asarray(p["tf"][a:b], dtype=np.int32)))
+        self._doclen.extend(p["doclen"])
+        self._total_len += int(np.sum(p["doclen"], dtype=np.int64))
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str]) -> "BM25Index":
+        ix = cls()
+        ix.add(texts)
+        return ix
+
+    def _postings(self, tid: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (filas, tf) del término. Se llama con varios lectores a la vez: los
+        trozos se unen en locales y se publican con UNA asignación (una lista
+        nueva), sin modificar la lista que otro lector puede estar leyendo.
+        """
+        chunks = self._chunks[tid]
+        if len(chunks) == 1:
+            return chunks[0]
+        merged = (np.concatenate([r for r, _ in chunks]),
+                  np.concatenate([t for _, t in chunks]))
+        self._chunks[tid] = [merged]
+        return merged
+
+    def select(self, keep: np.ndarray) -> "BM25Index":
+        """Solo las filas dadas (renumeradas 0..len(keep)-1), p.ej. al compactar."""
+        remap = np.full(self.n, -1, dtype=np.int64)
+        remap[keep] = np.arange(len(keep))
+        ix = BM25Index(self.k1, self.b)
+        for term, tid in self._vocab.items():
+            rows, tf = self._postings(tid)
+            new = remap[rows]
+            m = new >= 0
+            if m.any():
+                ix._vocab[term] = len(ix._chunks)
+                ix._chunks.append([(new[m], tf[m])])
+        doclen = self._doclen.view()[keep]
+        ix._doclen.extend(doclen)
+        ix._total_len = int(np.sum(doclen, dtype=np.int64))
+        return ix
+
+    # ---------- consulta ----------
+    def search(self, query: str, k: int, rows: Optional[np.ndarray] = None,
+               exclude: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (filas, scores) del top-k BM25 de la consulta.
+        rows: restringe a esas filas (ordenadas); exclude: máscara de filas a saltar.
+        """
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        if not self.n or k <= 0:
+            return empty
+        N = self.n
+        norm = self._norms()
+        acc = np.zeros(N, dtype=np.float32)
+        matched = False
+        for term in set(tokenize(query)):
+            tid = self._vocab.get(term)
+            if tid is None:
+                continue
+            r, tf = self._postings(tid)
+            idf = math.log(1.0 + (N - r.size + 0.5) / (r.size + 0.5))
+            tf = tf.astype(np.float32)
+            acc[r] += np.float32(idf * (self.k1 + 1.0)) * tf / (tf + norm[r])
+            matched = True
+        if not matched:
+            return empty
+
+        # idf > 0 siempre: las filas con score > 0 son las que tienen algún término
+        if rows is None:
+            cand = np.flatnonzero(acc)
+        else:
+            cand = rows[acc[rows] > 0]
+        if exclude is not None:
+            cand = cand[~exclude[cand]]
+        scores = acc[cand]
+        order = topk_indices(scores, k)
+        return cand[order], scores[order]
+
+    def _norms(self) -> np.ndarray:
+        """k1 * (1 - b + b * dl / avgdl) por fila; se recalcula si cambió el corpus."""
+        norm = self._norm
+        if norm is None or norm.shape[0] != self.n:
+            dl = self._doclen.view().astype(np.float32)
+            avgdl = max(self._total_len / self.n, 1e-9)
+            norm = (self.k1 * (1.0 - self.b + self.b * dl / avgdl)).astype(np.float32)
+            self._norm = norm  # una asignación: los lectores ven el viejo o el nuevo
+        return norm
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "docs": self.n,
+            "terms": len(self._vocab),
+            "avgdl": round(self._total_len / self.n, 2) if self.n else 0.0,
+        }
+
+
+def reciprocal_rank_fusion(ranked: List[np.ndarray], k: int = 60) -> Tuple[np.ndarray, np.ndarray]:
+    """RRF: score(fila) = sum 1 / (k + rango) sobre las listas donde aparece."""
+    acc: Dict[int, float] = {}
+    for lst in ranked:
+        for rank, r in enumerate(np.asarray(lst).tolist()):
+            acc[r] = acc.get(r, 0.0) + 1.0 / (k + rank + 1)
+    if not acc:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    rows = np.fromiter(acc.keys(), dtype=np.int64, count=len(acc))
+    scores = np.fromiter(acc.values(), dtype=np.float32, count=len(acc))
+    order = np.argsort(-scores, kind="stable")
+    return rows[order], scores[order]
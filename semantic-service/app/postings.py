@@ -0,0 +1,50 @@
+from __future__ import annotations
+from typing import Dict, List
+
+import numpy as np
+
+
+_EMPTY = np.empty(0, dtype=np.int64)
+
+
+class PostingIndex:
+    """
+    Listas de filas por valor de una columna entera (p.ej. convenio_id -> filas).
+    - build(): de una sola vez a partir de la columna completa.
+    - add(): filas nuevas al final (incremental, sin recorrer lo anterior).
+    - rows(): filas ordenadas; los trozos agregados se consolidan al consultar.
+    """
+    def __init__(self):
+        self._lists: Dict[int, List[np.ndarray]] = {}
+
+    def build(self, col: np.ndarray) -> None:
+        self._lists = {}
+        self.add(col, 0)
+
+    def add(self, values: np.ndarray, start_row: int) -> None:
+        values = np.asarray(values, dtype=np.int64)
+        if values.size == 0:
+            return
+        order = np.argsort(values, kind="stable")
+        sorted_vals = values[order]
+        uniq, starts = np.unique(sorted_vals, return_index=True)
+        bounds = list(starts) + [values.size]
+        for j, v in enumerate(uniq.tolist()):
+            rows = order[bounds[j]:bounds[j + 1]].astype(np.int64) + start_row
+            self._lists.setdefault(v, []).append(rows)
+
+    def rows(self, value: int) -> np.ndarray:
+        # lo llaman varios lectores a la vez: se une en una local y se publica
+        # con una sola asignación (lista nueva), sin tocar la que otro recorre
+        value = int(value)
+        chunks = self._lists.get(value)
+        if not chunks:
+            return _EMPTY
+        if len(chunks) == 1:
+            return chunks[0]
+        merged = np.concatenate(chunks)
+        self._lists[value] = [merged]
+        return merged
+
+    def __len__(self) -> int:
+        return len(self._lists)
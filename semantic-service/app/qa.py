@@ -0,0 +1,82 @@
+from __future__ import annotations
+from contextlib import nullcontext
+from typing import Any, Callable, ContextManager, Dict, List, Tuple
+
+import numpy as np
+
+from .semantic import SemanticIndexer, clean_ocr_text
+
+# similitud mínima del mejor fragmento para intentar responder
+QA_MIN_SCORE = 0.30
+
+NO_ANSWER = "No tengo una respuesta exacta para esa consulta en el texto analizado."
+NO_ANSWER_LOW = "No tengo una respuesta exacta para esa consulta en el texto disponible."
+NO_SENTS = "No tengo una respuesta exacta para esa consulta porque el texto del convenio no se pudo dividir en oraciones útiles."
+NO_QUESTION = "No tengo una respuesta exacta para esa consulta, la pregunta llegó vacía."
+NO_INDEXED = "No tengo una respuesta exacta para esa consulta, porque ese convenio no está indexado."
+
+
+def top_sentences(sims: np.ndarray, top_k: int) -> List[int]:
+    """Índices de las top_k oraciones, en orden textual."""
+    topk = min(top_k, sims.shape[0])
+    best_idx = np.argsort(-sims, kind="stable")[:topk].tolist()
+    best_idx.sort()  # mantener orden textual
+    return best_idx
+
+
+def compose_answer(chosen: List[str]) -> str:
+    answer = " ".join(chosen)
+    MAX_OUT = 10000
+    if len(answer) > MAX_OUT:
+        answer = answer[:MAX_OUT] + " …"
+
+    answer = clean_ocr_text(answer)
+
+    if not answer or len(answer) < 10:
+        answer = NO_ANSWER
+    return answer
+
+
+def _ref(indexer: SemanticIndexer, row: int) -> Dict[str, Any]:
+    d = indexer.docs[row]
+    return {"convenio_id": d.get("convenio_id"), "version_id": d.get("version_id")}
+
+
+def answer_from_index(indexer: SemanticIndexer, question: str,
+                      refs: List[Dict[str, Any]], top_k: int = 5,
+                      read_lock: Callable[[], ContextManager] = nullcontext) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    /qa por referencia: mismo criterio que /qa, pero sobre lo ya indexado.
+    - Fragmentos de los convenio/versión pedidos (posting lists).
+    - Mejor fragmento por similitud con la pregunta (umbral QA_MIN_SCORE);
+      top_k oraciones solo de ese fragmento (orden textual), para no mezclar
+      fragmentos ni versiones que se contradicen.
+    Los encodes (pregunta; oraciones no guardadas, cacheadas) van fuera de
+    read_lock: bajo el lock solo posting lists, productos punto y copias.
+    Devuelve (respuesta, usados).
+    """
+    q = question.strip()
+    if not q:
+        return NO_QUESTION, []
+
+    q_vec = indexer.encode_question(q)
+    with read_lock():
+        parts = [indexer.find_rows(r["convenio_id"], r.get("version_id")) for r in refs]
+        rows = np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+        if rows.size == 0:
+            return NO_INDEXED, []
+
+        scores = indexer.vectors.scores(q_vec, rows)
+        best = int(rows[int(np.argmax(scores))])
+        used = [_ref(indexer, best)]
+        if float(scores.max()) < QA_MIN_SCORE:
+            return NO_ANSWER_LOW, used
+        stored = indexer.stored_sentences(best)
+        frag = indexer.docs[best].get("fragmento", "") if stored is None else ""
+
+    sents, embs = stored if stored is not None else indexer.fragment_sentences(frag)
+    if not sents:
+        return NO_SENTS, used
+
+    idx = top_sentences(embs @ q_vec, top_k)
+    return compose_answer([sents[i] for i in idx]), used
@@ -0,0 +1,31 @@
+from __future__ import annotations
+from typing import Optional
+import os
+
+
+QUANT_MODES = ("fp32", "int8")
+
+
+def quant_mode(value: Optional[str] = None) -> str:
+    """Modo de inferencia del encoder: argumento explícito o EMBEDDER_QUANTIZE (fp32 por defecto)."""
+    mode = (value if value is not None else os.getenv("EMBEDDER_QUANTIZE", "fp32")).strip().lower()
+    if mode in {"", "0", "none", "off", "false"}:
+        mode = "fp32"
+    if mode not in QUANT_MODES:
+        raise ValueError(f"EMBEDDER_QUANTIZE desconocido: {mode!r} (usa {QUANT_MODES})")
+    return mode
+
+
+def maybe_quantize(model, mode: str = "fp32"):
+    """
+    mode="int8": cuantización dinámica int8 de las capas Linear (CPU).
+    Pesos en int8, activaciones cuantizadas al vuelo; sin recalibración.
+    Experimental: el recall@k frente a fp32 todavía no se midió con el modelo
+    real (tools/check_quant.py); por eso fp32 sigue siendo el default.
+    """
+    if mode != "int8":
+        return model
+    import torch
+
+    model.to("cpu")  # los kernels int8 dinámicos son solo de CPU
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
@@ -0,0 +1,80 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, Optional
+import threading
+import time
+
+
+# Texto representativo para el warm-up (JIT / allocator del encoder y spaCy)
+WARMUP_TEXTS = [
+    "¿Cuál es la vigencia del convenio con AGETIC?",
+    "El presente convenio interinstitucional tiene por objeto establecer los "
+    "mecanismos de cooperación entre las partes para la implementación de la "
+    "firma digital, con una vigencia de dos (2) años a partir de su suscripción.",
+    "CLÁUSULA QUINTA.- (OBLIGACIONES) La entidad se compromete a cubrir los "
+    "costos de los certificados digitales y a capacitar al personal técnico.",
+]
+
+
+class ModelLoader:
+    """
+    Carga de modelos en un hilo de fondo, seguida de un warm-up.
+    - start() es idempotente; wait() bloquea hasta que termine (o timeout).
+    - status() alimenta /ready: estado + duraciones de carga y warm-up.
+    """
+    def __init__(self, load_fn: Callable[[], None],
+                 warmup_fn: Optional[Callable[[], None]] = None):
+        self.load_fn = load_fn
+        self.warmup_fn = warmup_fn
+        self.state = "pending"  # pending | loading | warming | ready | error
+        self.error: Optional[str] = None
+        self.load_ms: Optional[float] = None
+        self.warmup_ms: Optional[float] = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="model-loader", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            self.state = "loading"
+            t0 = time.perf_counter()
+            self.load_fn()
+            self.load_ms = round((time.perf_counter() - t0) * 1000.0, 1)
+
+            if self.warmup_fn is not None:
+                self.state = "warming"
+                t0 = time.perf_counter()
+                self.warmup_fn()
+                self.warmup_ms = round((time.perf_counter() - t0) * 1000.0, 1)
+
+            self.state = "ready"
+        except Exception as e:
+            self.state = "error"
+            self.error = f"{type(e).__name__}: {e}"
+        finally:
+            self._done.set()
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Arranca la carga si hace falta y espera. True si quedó lista."""
+        self.start()
+        self._done.wait(timeout)
+        return self.ready
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "state": self.state,
+            "load_ms": self.load_ms,
+            "warmup_ms": self.warmup_ms,
+            "error": self.error,
+        }
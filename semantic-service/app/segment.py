@@ -0,0 +1,47 @@
+from __future__ import annotations
+from typing import List, Tuple
+
+import spacy
+
+
+SEGMENTER_MODES = ("parser", "sentencizer")
+
+# Componentes de es_core_news_sm que no intervienen en doc.sents
+# (el parser solo necesita tok2vec).
+_PARSER_EXCLUDE = ["ner", "lemmatizer", "attribute_ruler", "morphologizer"]
+
+
+class Segmenter:
+    """
+    Divide texto en oraciones.
+    - mode="parser": es_core_news_sm solo con tok2vec + parser (mismas
+      oraciones que el pipeline completo, sin NER/lemmas).
+    - mode="sentencizer": reglas de puntuación (spacy.blank), mucho más rápido.
+    """
+    def __init__(self, mode: str = "parser", model: str = "es_core_news_sm",
+                 max_chars: int = 60000):
+        if mode not in SEGMENTER_MODES:
+            raise ValueError(f"Modo de segmentación desconocido: {mode!r} (usa {SEGMENTER_MODES})")
+        self.mode = mode
+        self.max_chars = max_chars
+        if mode == "parser":
+            self.nlp = spacy.load(model, exclude=_PARSER_EXCLUDE)
+        else:
+            self.nlp = spacy.blank("es")
+            self.nlp.add_pipe("sentencizer")
+
+    def spans(self, text: str) -> List[Tuple[int, int]]:
+        """(start, end) de cada oración no vacía, sin espacios en los bordes."""
+        out: List[Tuple[int, int]] = []
+        doc = self.nlp(text[:self.max_chars])
+        for s in doc.sents:
+            raw = s.text
+            stripped = raw.strip()
+            if not stripped:
+                continue
+            start = s.start_char + (len(raw) - len(raw.lstrip()))
+            out.append((start, start + len(stripped)))
+        return out
+
+    def split(self, text: str) -> List[str]:
+        return [text[a:b] for a, b in self.spans(text)]
@@ -1,11 +1,26 @@
 from __future__ import annotations
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import numpy as np
+import os
 import re
 
 import spacy
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+
+from .ann import IVFIndex, topk_indices
+from .batcher import batcher_from_env
+from .buffers import GrowableArray
+from .cache import LRUCache, text_key
+from .doctable import DocTable, ID_COLUMNS
+from .encoding import encode_sorted
+from .lexical import BM25Index, reciprocal_rank_fusion, segment_postings, take_postings
+from .postings import PostingIndex
+from .quant import maybe_quantize, quant_mode
+from .readiness import WARMUP_TEXTS
+from .segment import Segmenter
+from .sentences import SentenceStore
+from .timing import StageTimer
+from .vectors import VectorStore, precision_mode
 
 
 def clean_text(s: str) -> str:
@@ -14,6 +29,21 @@ def clean_text(s: str) -> str:
     return s
 
 
+def _env_flag(name: str, default: str = "1") -> bool:
+    return os.getenv(name, default).strip().lower() not in {"0", "false", "no", "off"}
+
+
+SEARCH_MODES = ("dense", "hybrid", "bm25")
+
+
+def search_mode(value: Optional[str] = None) -> str:
+    """dense | hybrid (RRF denso + BM25) | bm25; por defecto SEMANTIC_SEARCH_MODE."""
+    mode = (value if value is not None else os.getenv("SEMANTIC_SEARCH_MODE", "dense")).strip().lower()
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Modo de búsqueda desconocido: {mode!r} (usa {SEARCH_MODES})")
+    return mode
+
+
 def clean_ocr_text(s: str) -> str:
     """
     Limpieza fuerte para texto proveniente de imágenes / OCR:
@@ -40,28 +70,94 @@ class SemanticIndexer:
     Indexador en memoria con embeddings + filtro por convenio/version.
     - Usa 'paraphrase-multilingual-MiniLM-L12-v2' (bueno para español).
     - spaCy se usa para pequeñas expansiones/normalización de consulta.
+    - Con muchos fragmentos, un índice IVF (ann.py) acota los candidatos;
+      búsqueda exacta para corpus chicos o filtros muy selectivos.
+    - Índice léxico BM25 (lexical.py) en paralelo: modo híbrido por
+      reciprocal-rank fusion y, opcionalmente, pre-filtro de candidatos.
+    - Al indexar también se guardan las oraciones de cada fragmento (spans +
+      embeddings), así /qa/ref responde sin volver a segmentar ni codificar.
+    - Borrado lógico: las filas borradas/reemplazadas quedan marcadas en un
+      bitmap (tombstones) que search() salta; compact() las elimina.
     Persistencia: ver storage.py (save/load).
     """
     def __init__(self, model_name: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
-                 device: str = "cpu"):
+                 device: str = "cpu", lazy: bool = False, quantize: Optional[str] = None,
+                 ann: Optional[str] = None, precision: Optional[str] = None,
+                 query_ner: Optional[bool] = None):
         self.model_name = model_name
         self.device = device
-        self.encoder: SentenceTransformer = SentenceTransformer(model_name, device=device)
-        self.nlp = spacy.load("es_core_news_sm")
+        # "fp32" | "int8" (por defecto EMBEDDER_QUANTIZE)
+        self.quantize = quant_mode(quantize)
+        # lazy=True: los modelos se cargan luego con load_models() (p.ej. en un hilo de fondo)
+        self.encoder: Optional[SentenceTransformer] = None
+        self.nlp = None
+        # oraciones por fragmento al indexar (SEMANTIC_SENTENCES=0 lo desactiva);
+        # mismo segmentador que /qa (QA_SEGMENTER: parser | sentencizer)
+        self.index_sentences = _env_flag("SEMANTIC_SENTENCES")
+        self.segmenter_mode = os.getenv("QA_SEGMENTER", "parser")
+        self.segmenter: Optional[Segmenter] = None
+        # encodes concurrentes (index/search) comparten forward pass
+        self.batcher = batcher_from_env(self._encode)
+
+        # listas de filas por convenio_id / version_id (filtros sin escanear)
+        self.postings: Dict[str, PostingIndex] = {c: PostingIndex() for c in ID_COLUMNS}
+        # matriz de embeddings (N, D): float32 | float16 | int8 (SEMANTIC_PRECISION)
+        self.precision = precision_mode(precision)
+        self.vectors = VectorStore(self.precision)
+        # documentos crudos + metadatos (columnar; ver doctable.py)
+        self.docs = DocTable()
+
+        # búsqueda aproximada: "ivf" | "exact" (SEMANTIC_ANN)
+        self.ann_mode = (ann or os.getenv("SEMANTIC_ANN", "ivf")).strip().lower()
+        # por debajo de estas filas (o candidatos filtrados) se busca exacto
+        self.ann_min_rows = int(os.getenv("ANN_MIN_ROWS", "20000"))
+        self.ann_nprobe = int(os.getenv("ANN_NPROBE", "8"))
+        self.ann: Optional[IVFIndex] = None
+
+        # BM25 + fusión: modo por defecto, constante RRF y profundidad de cada lista
+        self.search_mode = search_mode()
+        self.rrf_k = int(os.getenv("RRF_K", "60"))
+        self.rrf_depth = int(os.getenv("RRF_DEPTH", "50"))
+        # >0: con corpus grandes, puntúa denso solo el top-N de BM25 (si alcanza k)
+        self.bm25_prefilter = int(os.getenv("BM25_PREFILTER", "0"))
+
+        # consultas: expansión con NER de spaCy (SEMANTIC_QUERY_NER=0 => solo regex)
+        self.query_ner = _env_flag("SEMANTIC_QUERY_NER") if query_ner is None else bool(query_ner)
+        # consulta normalizada -> (expandida, vector); TTL opcional en segundos
+        self.query_cache = LRUCache(int(os.getenv("QUERY_CACHE_SIZE", "512")),
+                                    ttl=float(os.getenv("QUERY_CACHE_TTL", "0")))
+        # fragmento sin oraciones guardadas -> (oraciones, vectores) segmentados al vuelo
+        self.sentence_cache = LRUCache(int(os.getenv("SENTENCE_CACHE_SIZE", "256")))
+        self.timings = StageTimer()
+
+        # fracción de filas borradas a partir de la cual conviene compact()
+        self.compact_ratio = float(os.getenv("TOMBSTONE_COMPACT_RATIO", "0.2"))
+
+        if not lazy:
+            self.load_models()
 
-        # documentos crudos + metadatos
-        self.docs: List[Dict[str, Any]] = []
-        # matriz de embeddings (N, D)
-        self.embeddings: Optional[np.ndarray] = None
+    def load_models(self):
+        encoder = SentenceTransformer(self.model_name, device=self.device)
+        self.encoder = maybe_quantize(encoder, self.quantize)
+        # spaCy solo se usa para el NER de las consultas
+        self.nlp = spacy.load("es_core_news_sm") if self.query_ner else None
+        if self.index_sentences:
+            self.segmenter = Segmenter(mode=self.segmenter_mode)
+
+    def warmup(self):
+        """Un encode + NER de texto representativo (JIT / allocator)."""
+        self._embed(WARMUP_TEXTS)
+        self._expand_query(WARMUP_TEXTS[0], ner=self.query_ner)
+        if self.segmenter is not None:
+            self.segmenter.split(" ".join(WARMUP_TEXTS))
 
     # ---------- indexado ----------
-    def add_docs(self, items: List[Dict[str, Any]]) -> int:
+    def prepare_docs(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
+        Parte cara de add_docs (limpieza, embeddings de fragmentos y oraciones,
+        tokenizado BM25), sin tocar el índice: puede correr mientras otros leen.
         items: [{id?, convenio_id, version_id, fragmento, meta?}, ...]
         """
-        if not items:
-            return 0
-
         # limpiar texto
         for it in items:
             raw = str(it.get("fragmento", ""))
@@ -70,26 +166,339 @@ class SemanticIndexer:
             it["fragmento"] = raw
 
         texts = [it["fragmento"] for it in items]
-        vecs = self._embed(texts)  # (k, d)
+        # encode directo (ya en lotes): el micro-batcher queda libre para las consultas
+        vecs = encode_sorted(self._encode, texts)  # (k, d)
+        spans, sent_embs = self._sentence_spans(texts, self._encode)
+        return {"items": items, "texts": texts, "vecs": vecs, "spans": spans, "sent_embs": sent_embs,
+                "postings": segment_postings(texts)}
 
+    @staticmethod
+    def split_prepared(prep: Dict[str, Any], sizes: List[int]) -> List[Dict[str, Any]]:
+        """Parte un lote preparado en trozos de sizes ítems (un encode para varios lotes)."""
+        out, a, s0 = [], 0, 0
+        for n in sizes:
+            spans = prep["spans"][a:a + n]
+            s1 = s0 + sum(len(sp) for sp in spans)
+            embs = prep["sent_embs"]
+            out.append({
+                "items": prep["items"][a:a + n],
+                "texts": prep["texts"][a:a + n],
+                "vecs": None if prep["vecs"] is None else prep["vecs"][a:a + n],
+                "spans": spans,
+                "sent_embs": None if embs is None or s1 == s0 else embs[s0:s1],
+                "postings": take_postings(prep["postings"], a, a + n),
+            })
+            a, s0 = a + n, s1
+        return out
+
+    def add_docs(self, items: List[Dict[str, Any]], prepared: Optional[Dict[str, Any]] = None,
+                 retrain: bool = True) -> int:
+        """
+        items: [{id?, convenio_id, version_id, fragmento, meta?}, ...]
+        prepared: resultado de prepare_docs(items) si ya se calculó.
+        retrain=False: el IVF solo asigna las filas nuevas; si hace falta
+        (re)entrenarlo queda para train_ann() (ver sync_ann).
+        """
+        if not items:
+            return 0
+        prep = prepared if prepared is not None else self.prepare_docs(items)
+
+        lexical = self.lexical  # (re)construido hasta las filas actuales
         start_len = len(self.docs)
-        self.docs.extend(items)
+        self._docs.extend(prep["items"])
+        lexical.add_postings(prep["postings"])
+        self.vectors.append(prep["vecs"])
+        self.sentences.append(prep["spans"], prep["sent_embs"])
+        self._dead.extend(np.zeros(len(items), dtype=bool))
+        ids = self._docs.ids()[start_len:]
+        for j, c in enumerate(ID_COLUMNS):
+            self.postings[c].add(ids[:, j], start_len)
+
+        self.sync_ann(retrain)
+        return len(self.docs) - start_len
+
+    def sync_ann(self, retrain: bool = True):
+        """
+        Mantiene el índice IVF alineado con self.vectors:
+        - se construye al superar ann_min_rows filas,
+        - las filas nuevas se asignan incrementalmente,
+        - se reentrena si el corpus duplicó el tamaño de entrenamiento.
+        retrain=False: solo lo barato (asignar filas nuevas / descartarlo);
+        el k-means lo hace train_ann() y se publica con `ann = ...`.
+        """
+        n = len(self.vectors)
+        if self.ann_mode != "ivf" or n < self.ann_min_rows:
+            self.ann = None
+            return
+        if self.ann is not None and self.ann.n > n:
+            self.ann = None  # desalineado (más filas que vectores)
+        if retrain and self.ann_needs_training():
+            self.ann = self.train_ann()
+        elif self.ann is not None and self.ann.n < n:
+            self.ann.add(self.vectors.data[self.ann.n:])
+
+    def ann_needs_training(self) -> bool:
+        n = len(self.vectors)
+        if self.ann_mode != "ivf" or n < self.ann_min_rows:
+            return False
+        return self.ann is None or n > 2 * self.ann.trained_on
+
+    def train_ann(self, vectors: Optional[VectorStore] = None) -> IVFIndex:
+        """
+        IVF entrenado sobre vectors (por defecto los actuales). Solo lee: con los
+        escritores serializados puede correr mientras otros buscan.
+        """
+        vectors = self.vectors if vectors is None else vectors
+        # la asignación a centroides es invariante a la escala por fila,
+        # así que se puede trabajar directamente sobre los datos guardados
+        ann = IVFIndex(nprobe=self.ann_nprobe)
+        ann.build(vectors.data)
+        return ann
+
+    @property
+    def docs(self) -> DocTable:
+        return self._docs
+
+    @docs.setter
+    def docs(self, table):
+        """Reemplaza los metadatos (p.ej. al cargar) y reconstruye las posting lists."""
+        if not isinstance(table, DocTable):
+            table = DocTable.from_list(list(table))
+        self._docs = table
+        self.postings = self._build_postings(table)
+        # bitmap de filas borradas, alineado con docs / vectors
+        self._dead = GrowableArray.wrap(np.zeros(len(table), dtype=bool))
+        self._n_dead = 0
+        self._lexical: Optional[BM25Index] = None  # se reconstruye al usarlo
+        self._sentences = SentenceStore.empty(len(table), self.precision)
+
+    @staticmethod
+    def _build_postings(table: DocTable) -> Dict[str, PostingIndex]:
+        postings = {c: PostingIndex() for c in ID_COLUMNS}
+        ids = table.ids()
+        for j, c in enumerate(ID_COLUMNS):
+            postings[c].build(ids[:, j])
+        return postings
+
+    @property
+    def sentences(self) -> SentenceStore:
+        return self._sentences
+
+    @sentences.setter
+    def sentences(self, store: Optional[SentenceStore]):
+        # desalineadas con docs => filas sin oraciones (se calculan al vuelo en /qa/ref)
+        if store is None or store.n_rows != len(self._docs) or not store.n_sents:
+            store = SentenceStore.empty(len(self._docs), self.precision)
+        self._sentences = store
+
+    @property
+    def lexical(self) -> BM25Index:
+        """Índice BM25 alineado con docs (se reconstruye desde los textos si falta)."""
+        if self._lexical is None:
+            self._lexical = BM25Index.from_texts(d.get("fragmento", "") for d in self._docs)
+        return self._lexical
+
+    @lexical.setter
+    def lexical(self, index: Optional[BM25Index]):
+        # uno desalineado (p.ej. segmentos a medio escribir) se descarta
+        self._lexical = index if index is not None and index.n == len(self._docs) else None
+
+    def lexical_stats(self) -> Optional[Dict[str, Any]]:
+        """Stats del BM25 sin construirlo (None si todavía no se armó)."""
+        lexical = self._lexical
+        return lexical.stats() if lexical is not None else None
+
+    @property
+    def embeddings(self) -> Optional[np.ndarray]:
+        """Matriz (N, D) decodificada a float32 (sin copia si la precisión es float32)."""
+        return self.vectors.get()
+
+    @embeddings.setter
+    def embeddings(self, X: Optional[np.ndarray]):
+        self.vectors = VectorStore.from_float(X, self.precision)
+
+    # ---------- upsert / borrado ----------
+    @property
+    def n_deleted(self) -> int:
+        return self._n_dead
+
+    @property
+    def live_count(self) -> int:
+        return len(self.docs) - self._n_dead
+
+    def _dead_mask(self) -> Optional[np.ndarray]:
+        return self._dead.view() if self._n_dead else None
+
+    def _drop_dead(self, rows: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        if rows is None or not self._n_dead:
+            return rows
+        return rows[~self._dead.view()[rows]]
+
+    def find_rows(self, convenio_id: int, version_id: Optional[int] = None,
+                  ids: Optional[set] = None) -> np.ndarray:
+        """Filas vivas del convenio (/versión); con ids, solo esos fragmentos."""
+        rows = self._drop_dead(self._filter_rows(convenio_id, version_id))
+        if ids is not None:
+            want = {str(i) for i in ids}
+            fids = [self.docs[r].get("id") for r in rows.tolist()]
+            rows = rows[[f is not None and str(f) in want for f in fids]]
+        return rows
+
+    def mark_deleted(self, rows) -> int:
+        """Marca filas como borradas (tombstones). Devuelve cuántas estaban vivas."""
+        rows = np.unique(np.asarray(rows, dtype=np.int64))
+        dead = self._dead.view()
+        rows = rows[~dead[rows]]
+        dead[rows] = True
+        self._n_dead += int(rows.size)
+        return int(rows.size)
+
+    def deleted_rows(self) -> np.ndarray:
+        return np.flatnonzero(self._dead.view()) if self._n_dead else np.empty(0, dtype=np.int64)
 
-        if self.embeddings is None:
-            self.embeddings = vecs
+    def delete(self, convenio_id: int, version_id: Optional[int] = None,
+               ids: Optional[set] = None) -> int:
+        return self.mark_deleted(self.find_rows(convenio_id, version_id, ids))
+
+    def upsert_docs(self, items: List[Dict[str, Any]],
+                    prepared: Optional[Dict[str, Any]] = None, retrain: bool = True) -> tuple:
+        """
+        add_docs reemplazando lo ya indexado de cada (convenio_id, version_id):
+        - ítems con 'id': solo los fragmentos con ese mismo id,
+        - algún ítem sin 'id': la versión completa (re-indexado).
+        Lo anterior se marca como borrado recién después de agregar lo nuevo.
+        retrain: como en add_docs. Devuelve (agregadas, reemplazadas).
+        """
+        groups: Dict[tuple, Optional[set]] = {}
+        for it in items:
+            key = (int(it["convenio_id"]), int(it["version_id"]))
+            fid = it.get("id")
+            if fid is None or (key in groups and groups[key] is None):
+                groups[key] = None
+            else:
+                groups.setdefault(key, set()).add(fid)
+        stale = [self.find_rows(c, v, ids) for (c, v), ids in groups.items()]
+
+        added = self.add_docs(items, prepared, retrain)
+        replaced = self.mark_deleted(np.concatenate(stale)) if stale else 0
+        return added, replaced
+
+    def needs_compaction(self) -> bool:
+        return self._n_dead > 0 and self._n_dead >= self.compact_ratio * len(self.docs)
+
+    def prepare_compaction(self) -> Optional[Dict[str, Any]]:
+        """
+        Parte cara de compact(): copias sin las filas borradas (docs, posting
+        lists, vectores, BM25, oraciones e IVF, reentrenado si hace falta).
+        Solo lee el índice: puede correr mientras otros buscan, siempre que no
+        haya otro escritor entre esto y compact(prepared).
+        """
+        n = self._n_dead
+        if not n:
+            return None
+        keep = np.flatnonzero(~self._dead.view())
+        docs = self.docs.select(keep)
+        vectors = self.vectors.select(keep)
+        ann = self.ann.select(keep) if self.ann is not None else None
+        if (self.ann_mode == "ivf" and len(keep) >= self.ann_min_rows
+                and (ann is None or len(keep) > 2 * ann.trained_on)):
+            ann = self.train_ann(vectors)
+        return {
+            "n_dead": n,
+            "n_rows": len(self.docs),
+            "docs": docs,
+            "postings": self._build_postings(docs),
+            "vectors": vectors,
+            "lexical": self.lexical.select(keep),
+            "sentences": self.sentences.select(keep),
+            "ann": ann,
+        }
+
+    def compact(self, prepared: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Elimina físicamente las filas borradas (renumera docs, posting lists e IVF).
+        prepared: resultado de prepare_compaction(); así acá solo se cambian
+        referencias (rápido bajo el lock de escritura).
+        """
+        prep = prepared if prepared is not None else self.prepare_compaction()
+        if prep is None:
+            return 0
+        if prep["n_rows"] != len(self.docs) or prep["n_dead"] != self._n_dead:
+            raise RuntimeError("prepare_compaction() desactualizado: hubo escrituras en el medio.")
+        docs = prep["docs"]
+        self._docs = docs
+        self.postings = prep["postings"]
+        self._dead = GrowableArray.wrap(np.zeros(len(docs), dtype=bool))
+        self._n_dead = 0
+        self.vectors = prep["vectors"]
+        self._lexical = prep["lexical"]
+        self._sentences = prep["sentences"]
+        self.ann = prep["ann"]
+        self.sync_ann(retrain=False)
+        return prep["n_dead"]
+
+    # ---------- oraciones ----------
+    def _sentence_spans(self, texts: List[str], encode_fn=None):
+        """Spans de oraciones de cada texto + embeddings de todas (None si no hay)."""
+        if self.segmenter is None:
+            return [[] for _ in texts], None
+        spans = [self.segmenter.spans(t) for t in texts]
+        sents = [t[a:b] for t, sp in zip(texts, spans) for a, b in sp]
+        return spans, encode_sorted(encode_fn or self._embed, sents)
+
+    def stored_sentences(self, row: int) -> Optional[Tuple[List[str], np.ndarray]]:
+        """
+        Oraciones guardadas de una fila, en orden textual: (textos, (m, d) float32).
+        None si la fila no las tiene (segmentos anteriores): ver fragment_sentences().
+        Solo lee el índice (copias): va con el lock de lectura, sin encode.
+        """
+        st = self.sentences
+        a, b = int(st.ptr[row]), int(st.ptr[row + 1])
+        if a == b:
+            return None
+        frag = self.docs[row].get("fragmento", "")
+        texts = [frag[s0:s1] for s0, s1 in st.spans[a:b].tolist()]
+        return texts, np.asarray(st.vectors.get(np.arange(a, b)), dtype=np.float32)
+
+    def fragment_sentences(self, text: str) -> Tuple[List[str], Optional[np.ndarray]]:
+        """
+        Oraciones de un fragmento segmentadas y codificadas al vuelo, cacheadas
+        por texto (sentence_cache). No toca el índice: va fuera del lock.
+        """
+        if self.segmenter is None:
+            return [], None
+        key = text_key(text, self.model_name)
+        hit = self.sentence_cache.get(key)
+        if hit is not None:
+            return hit
+        spans, embs = self._sentence_spans([text])
+        sents = [text[a:b] for a, b in spans[0]]
+        if sents:
+            embs = np.array(embs, dtype=np.float32)  # copia propia
+            embs.setflags(write=False)
+            hit = (sents, embs)
         else:
-            self.embeddings = np.vstack([self.embeddings, vecs])
+            hit = ([], None)
+        self.sentence_cache.put(key, hit)
+        return hit
 
-        return len(self.docs) - start_len
+    def encode_question(self, question: str) -> np.ndarray:
+        """Vector de una pregunta tal cual (sin expansión), como en /qa."""
+        return np.asarray(self._embed([question])[0], dtype=np.float32)
 
-    def _embed(self, texts: List[str]) -> np.ndarray:
+    def _encode(self, texts: List[str]) -> np.ndarray:
         return np.asarray(self.encoder.encode(texts, normalize_embeddings=True))  # (n, d)
 
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        if self.batcher is not None:
+            return self.batcher.encode(texts)
+        return self._encode(texts)
+
     # ---------- búsqueda ----------
-    def _expand_query(self, q: str) -> str:
+    def _expand_query(self, q: str, ner: bool = True) -> str:
         """
         Pequeña expansión semántica:
-        - Normaliza y añade entidades (ORG, MISC) detectadas por spaCy.
+        - Normaliza y añade entidades (ORG, MISC) detectadas por spaCy (si ner).
         - Si aparece 'con ...' o 'convenio con ...', intenta quedarse con el nombre.
         """
         q = q.strip()
@@ -103,53 +512,204 @@ class SemanticIndexer:
             extra.append(m.group(1).strip())
 
         # NER
-        doc = self.nlp(q)
-        ents = [e.text for e in doc.ents if e.label_ in {"ORG", "MISC", "PER"}]
-        extra.extend(ents)
+        if ner:
+            doc = self.nlp(q)
+            ents = [e.text for e in doc.ents if e.label_ in {"ORG", "MISC", "PER"}]
+            extra.extend(ents)
 
         expanded = q + (" " + " ".join(set(extra)) if extra else "")
         return expanded
 
-    def search(self, query: str, k: int = 5,
-               convenio_id: Optional[int] = None,
-               version_id: Optional[int] = None) -> List[Dict[str, Any]]:
-        if not self.docs or self.embeddings is None:
-            return []
+    def _query_vectors(self, queries: List[str]) -> np.ndarray:
+        """
+        (Q, d) vectores de las consultas expandidas, cacheados por texto
+        normalizado; los que faltan se codifican en un solo encode.
+        """
+        keys = [(self.query_ner, clean_text(q)) for q in queries]
+        vecs: List[Optional[np.ndarray]] = []
+        missing: Dict[tuple, List[int]] = {}
+        for i, key in enumerate(keys):
+            hit = self.query_cache.get(key)
+            vecs.append(None if hit is None else hit[1])
+            if hit is None:
+                missing.setdefault(key, []).append(i)
 
-        q_expanded = self._expand_query(query)
-        q_vec = self._embed([q_expanded])[0].reshape(1, -1)  # (1, d)
+        if missing:
+            with self.timings.stage("expand"):
+                expanded = [self._expand_query(q, ner=ner) for ner, q in missing]
+            with self.timings.stage("encode"):
+                E = np.asarray(self._embed(expanded), dtype=np.float32)
+            for (key, idx), text, v in zip(missing.items(), expanded, E):
+                v = np.array(v)  # copia propia (no retiene el lote)
+                v.setflags(write=False)
+                self.query_cache.put(key, (text, v))
+                for i in idx:
+                    vecs[i] = v
+        return np.vstack(vecs)
 
-        # filtro por convenio/version (si vienen)
-        mask = np.ones(len(self.docs), dtype=bool)
+    def _modes(self, queries: List[Dict[str, Any]]) -> List[str]:
+        return [search_mode(q.get("mode") or self.search_mode) for q in queries]
+
+    def query_vectors(self, queries: List[Dict[str, Any]]) -> Dict[int, np.ndarray]:
+        """
+        Vectores de las consultas de search_batch() que usan denso (i -> vector).
+        No toca el índice: el encode va fuera del lock de lectura y luego se
+        pasa como search_batch(..., q_vecs=...).
+        """
+        need_dense = [i for i, m in enumerate(self._modes(queries)) if m != "bm25"]
+        if not need_dense:
+            return {}
+        return dict(zip(need_dense, self._query_vectors([queries[i]["query"] for i in need_dense])))
+
+    def _filter_rows(self, convenio_id: Optional[int] = None,
+                     version_id: Optional[int] = None) -> Optional[np.ndarray]:
+        """Filas que cumplen el filtro (None = sin filtro, todas)."""
+        if convenio_id is None and version_id is None:
+            return None
+        lists = []
         if convenio_id is not None:
-            mask &= np.array([d.get("convenio_id") == convenio_id for d in self.docs])
+            lists.append(self.postings["convenio_id"].rows(convenio_id))
         if version_id is not None:
-            mask &= np.array([d.get("version_id") == version_id for d in self.docs])
+            lists.append(self.postings["version_id"].rows(version_id))
+        if len(lists) == 1:
+            return lists[0]
+        return np.intersect1d(lists[0], lists[1], assume_unique=True)
 
-        if not mask.any():
-            return []
+    def _scores(self, q_vec: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Coseno contra las filas dadas (embeddings normalizados => producto punto)."""
+        return self.vectors.scores(q_vec, rows)
 
-        sims = cosine_similarity(q_vec, self.embeddings[mask])[0]  # (M,)
-        idxs = np.where(mask)[0]
+    def _use_ann(self, rows: Optional[np.ndarray]) -> bool:
+        """IVF solo si está construido y el filtro no deja ya pocas filas."""
+        return self.ann is not None and (rows is None or rows.size >= self.ann_min_rows)
 
-        # topk
-        topk_rel = min(k, sims.shape[0])
-        order = np.argsort(-sims)[:topk_rel]
+    def _use_prefilter(self, rows: Optional[np.ndarray]) -> bool:
+        n = len(self.docs) if rows is None else rows.size
+        return self.bm25_prefilter > 0 and n >= self.ann_min_rows
 
+    def _candidates(self, q_vec: np.ndarray, rows: Optional[np.ndarray], k: int,
+                    query: Optional[str] = None) -> Optional[np.ndarray]:
+        """
+        Filas a puntuar: el top de BM25 (pre-filtro) o las del IVF si conviene;
+        si no, las filtradas (exacto).
+        """
+        if query is not None and self._use_prefilter(rows):
+            lex, _ = self.lexical.search(query, self.bm25_prefilter, rows, self._dead_mask())
+            if lex.size >= k:
+                return np.sort(lex)
+        if not self._use_ann(rows):
+            return rows
+        cand = self._drop_dead(self.ann.candidates(q_vec))
+        if rows is not None:
+            cand = np.intersect1d(cand, rows, assume_unique=True)
+        return cand if cand.size >= k else rows
+
+    def _top(self, sims: np.ndarray, rows: Optional[np.ndarray], k: int):
+        """(filas globales, scores) del top-k de sims; sin filtro se saltan los tombstones."""
+        if rows is None and self._n_dead:
+            sims[self._dead.view()] = -np.inf
+        order = topk_indices(sims, k)
+        order = order[np.isfinite(sims[order])]
+        return (order if rows is None else rows[order]), sims[order]
+
+    def _results(self, rows: np.ndarray, scores: np.ndarray,
+                 extra: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
         results: List[Dict[str, Any]] = []
-        for oi in order:
-            global_i = idxs[oi]
+        for j, (global_i, score) in enumerate(zip(rows.tolist(), scores.tolist())):
             d = self.docs[global_i]
-            results.append({
-                "score": float(sims[oi]),
+            res = {
+                "score": float(score),
                 "convenio_id": d.get("convenio_id"),
                 "version_id": d.get("version_id"),
                 "fragmento": d.get("fragmento"),
                 "meta": d.get("meta", {}),
-            })
+            }
+            if extra is not None:
+                res.update(extra[j])
+            results.append(res)
         return results
 
+    def _fuse(self, dense, lexical, k: int):
+        """RRF de las listas densa y BM25 => (filas, scores, scores de cada lista)."""
+        rows, scores = reciprocal_rank_fusion([dense[0], lexical[0]], self.rrf_k)
+        rows, scores = rows[:k], scores[:k]
+        ds = dict(zip(dense[0].tolist(), dense[1].tolist()))
+        ls = dict(zip(lexical[0].tolist(), lexical[1].tolist()))
+        extra = [{"dense_score": ds.get(r), "bm25_score": ls.get(r)} for r in rows.tolist()]
+        return rows, scores, extra
+
+    def search(self, query: str, k: int = 5,
+               convenio_id: Optional[int] = None,
+               version_id: Optional[int] = None,
+               exact: bool = False, mode: Optional[str] = None) -> List[Dict[str, Any]]:
+        q = {"query": query, "k": k, "convenio_id": convenio_id, "version_id": version_id, "mode": mode}
+        return self.search_batch([q], exact=exact)[0]
+
+    def search_batch(self, queries: List[Dict[str, Any]], exact: bool = False,
+                     q_vecs: Optional[Dict[int, np.ndarray]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Varias consultas de una vez: queries = [{query, k?, convenio_id?, version_id?, mode?}, ...].
+        - Un solo encode para todas las consultas (las cacheadas no se recodifican).
+        - Por cada filtro distinto, un producto matriz-matriz contra sus filas.
+        - Si el IVF (o el pre-filtro BM25) aplica, cada consulta puntúa solo sus candidatos.
+        - mode: dense | bm25 | hybrid (RRF de ambas listas, rrf_depth filas cada una).
+        - q_vecs: vectores ya calculados con query_vectors() (si no, se codifican aquí).
+        Devuelve el top-k de cada consulta, en el mismo orden.
+        """
+        out: List[List[Dict[str, Any]]] = [[] for _ in queries]
+        if not queries or not self.live_count or not len(self.vectors):
+            return out
+
+        texts = [q["query"] for q in queries]
+        modes = self._modes(queries)
+        # k=0 => sin resultados (no el default); negativos cuentan como 0
+        ks = [max(0, int(5 if q.get("k") is None else q["k"])) for q in queries]
+        # en híbrido cada lista va más profundo para que la fusión tenga de dónde elegir
+        depth = [max(k, self.rrf_depth) if m == "hybrid" else k for k, m in zip(ks, modes)]
+
+        qv = self.query_vectors(queries) if q_vecs is None else q_vecs
+
+        groups: Dict[tuple, List[int]] = {}
+        for i, q in enumerate(queries):
+            groups.setdefault((q.get("convenio_id"), q.get("version_id")), []).append(i)
+
+        dense: Dict[int, tuple] = {}    # i -> (filas, scores) ordenadas
+        lexical: Dict[int, tuple] = {}
+        with self.timings.stage("rank"):
+            for (convenio_id, version_id), idx in groups.items():
+                # filtro por convenio/version (si vienen)
+                rows = self._drop_dead(self._filter_rows(convenio_id, version_id))
+                if rows is not None and rows.size == 0:
+                    continue
+                for i in idx:
+                    if modes[i] != "dense":
+                        lexical[i] = self.lexical.search(texts[i], depth[i], rows, self._dead_mask())
+
+                didx = [i for i in idx if modes[i] != "bm25"]
+                if not didx:
+                    continue
+                if not exact and (self._use_ann(rows) or self._use_prefilter(rows)):
+                    for i in didx:
+                        cand = self._candidates(qv[i], rows, depth[i], query=texts[i])
+                        dense[i] = self._top(self._scores(qv[i], cand), cand, depth[i])
+                    continue
+
+                S = np.ascontiguousarray(self._scores(np.stack([qv[i] for i in didx]), rows).T)  # (g, M)
+                for j, i in enumerate(didx):
+                    dense[i] = self._top(S[j], rows, depth[i])
+
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        with self.timings.stage("fetch"):
+            for i, m in enumerate(modes):
+                if m == "hybrid":
+                    out[i] = self._results(*self._fuse(dense.get(i, empty), lexical.get(i, empty), ks[i]))
+                else:
+                    hits = (dense if m == "dense" else lexical).get(i, empty)
+                    out[i] = self._results(*hits)
+        return out
+
     # ---------- util ----------
     def clear(self):
-        self.docs = []
-        self.embeddings = None
\ No newline at end of file
+        self.docs = DocTable()
+        self.vectors = VectorStore(self.precision)
+        self.ann = None
\ No newline at end of file
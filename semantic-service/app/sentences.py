@@ -0,0 +1,114 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .buffers import GrowableArray
+from .vectors import VectorStore
+
+
+class SentenceStore:
+    """
+    Oraciones de cada fila (fragmento) del índice, calculadas al indexar:
+    - spans (start, end) sobre el texto limpio del fragmento (el texto no
+      se duplica: la oración es fragmento[start:end]),
+    - sus embeddings en un VectorStore (misma precisión que el índice).
+    Las oraciones de la fila i son [ptr[i], ptr[i+1]); una fila sin oraciones
+    (p.ej. de un segmento anterior) tiene ptr[i] == ptr[i+1].
+    """
+    def __init__(self, precision: str = "float32", ptr: Optional[np.ndarray] = None,
+                 spans: Optional[np.ndarray] = None, vectors: Optional[VectorStore] = None):
+        self._ptr = GrowableArray.wrap(np.zeros(1, dtype=np.int64) if ptr is None else ptr)
+        self._spans = GrowableArray.wrap(np.empty((0, 2), dtype=np.int32) if spans is None else spans)
+        self.vectors = vectors if vectors is not None else VectorStore(precision)
+
+    @classmethod
+    def empty(cls, n_rows: int, precision: str = "float32") -> "SentenceStore":
+        return cls(precision, ptr=np.zeros(n_rows + 1, dtype=np.int64))
+
+    @property
+    def ptr(self) -> np.ndarray:
+        return self._ptr.view()
+
+    @property
+    def spans(self) -> np.ndarray:
+        return self._spans.view()
+
+    @property
+    def n_rows(self) -> int:
+        return len(self._ptr) - 1
+
+    @property
+    def n_sents(self) -> int:
+        return len(self._spans)
+
+    # ---------- escritura ----------
+    def append(self, spans_per_row: Sequence[Sequence[Tuple[int, int]]],
+               embs: Optional[np.ndarray]) -> None:
+        """Filas nuevas al final: spans de cada fila + embeddings (todas sus oraciones)."""
+        counts = np.fromiter((len(s) for s in spans_per_row), dtype=np.int64, count=len(spans_per_row))
+        self._ptr.extend(self.ptr[-1] + np.cumsum(counts))
+        flat = [sp for s in spans_per_row for sp in s]
+        if flat:
+            self._spans.extend(np.asarray(flat, dtype=np.int32))
+            self.vectors.append(embs)
+
+    # ---------- lectura ----------
+    def sentences(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(índices de oración, fila dueña) de las filas dadas, en orden."""
+        ptr = self.ptr
+        rows = np.asarray(rows, dtype=np.int64)
+        counts = ptr[rows + 1] - ptr[rows]
+        owner = np.repeat(rows, counts)
+        # a cada fila le corresponde el rango ptr[r] .. ptr[r+1]
+        starts = np.repeat(ptr[rows] - np.concatenate([[0], np.cumsum(counts)[:-1]]), counts)
+        return starts + np.arange(owner.size), owner
+
+    # ---------- sub-rangos ----------
+    def _subset(self, ptr: np.ndarray, sent_idx: np.ndarray) -> "SentenceStore":
+        vs = self.vectors
+        if vs.data is not None and sent_idx.size:
+            scale = None if vs.scale is None else vs.scale[sent_idx]
+            vectors = VectorStore(vs.precision, data=vs.data[sent_idx], scale=scale)
+        else:
+            vectors = VectorStore(vs.precision)
+        return SentenceStore(vs.precision, ptr=ptr, spans=self.spans[sent_idx], vectors=vectors)
+
+    def take(self, start: int, stop: int) -> "SentenceStore":
+        """Filas [start, stop) con ptr relativo (para escribir un segmento)."""
+        ptr = self.ptr[start:stop + 1]
+        a, b = int(ptr[0]), int(ptr[-1])
+        vs = self.vectors
+        vectors = vs.take(a, b) if vs.data is not None else VectorStore(vs.precision)
+        return SentenceStore(vs.precision, ptr=ptr - a, spans=self.spans[a:b], vectors=vectors)
+
+    def select(self, rows: np.ndarray) -> "SentenceStore":
+        """Solo las filas dadas (p.ej. al compactar tombstones)."""
+        rows = np.asarray(rows, dtype=np.int64)
+        sent_idx, _ = self.sentences(rows)
+        counts = self.ptr[rows + 1] - self.ptr[rows]
+        ptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return self._subset(ptr, sent_idx)
+
+    @classmethod
+    def concat(cls, stores: List["SentenceStore"], precision: str = "float32") -> "SentenceStore":
+        if not stores:
+            return cls(precision)
+        if len(stores) == 1:
+            return stores[0]
+        ptrs, off = [np.zeros(1, dtype=np.int64)], 0
+        for st in stores:
+            ptrs.append(np.asarray(st.ptr[1:], dtype=np.int64) + off)
+            off += int(st.ptr[-1])
+        spans = np.concatenate([np.asarray(st.spans) for st in stores])
+        vectors = VectorStore.concat([st.vectors for st in stores]) or VectorStore(stores[0].vectors.precision)
+        return cls(vectors.precision, ptr=np.concatenate(ptrs), spans=spans, vectors=vectors)
+
+    def stats(self) -> Dict[str, Any]:
+        covered = int(np.count_nonzero(np.diff(self.ptr))) if self.n_rows else 0
+        return {
+            "rows": self.n_rows,
+            "rows_with_sentences": covered,
+            "sentences": self.n_sents,
+            "bytes": self.vectors.nbytes + self._spans.nbytes + self._ptr.nbytes,
+        }
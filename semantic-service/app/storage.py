@@ -1,38 +1,432 @@
 from __future__ import annotations
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import os, json
+import mmap
+import threading
 import numpy as np
 
+from .doctable import DocTable, encode_rows
+from .lexical import BM25Index, segment_postings
+from .sentences import SentenceStore
+from .vectors import VectorStore
+
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+SEG_DIR = os.path.join(DATA_DIR, "segments")
+MANIFEST_FP = os.path.join(DATA_DIR, "manifest.json")
+ANN_FP  = os.path.join(DATA_DIR, "ann_ivf.npz")
+
+# formato anterior (un solo par de archivos); se migra a segmentos al cargar
 DOCS_FP = os.path.join(DATA_DIR, "index.jsonl")
 EMB_FP  = os.path.join(DATA_DIR, "embeddings.npy")
+SCALE_FP = os.path.join(DATA_DIR, "emb_scale.npy")
+
+# segmentos con menos filas que esto se fusionan al compactar
+COMPACT_MIN_ROWS = int(os.getenv("SEGMENT_COMPACT_MIN_ROWS", "5000"))
+# cantidad de segmentos chicos que dispara la compactación en segundo plano
+COMPACT_TRIGGER = int(os.getenv("SEGMENT_COMPACT_TRIGGER", "8"))
+
+# carga con memory-map (embeddings + blob de docs compartidos vía page cache)
+USE_MMAP = os.getenv("SEMANTIC_MMAP", "1").strip().lower() not in {"0", "false", "no", "off"}
+
+# serializa los cambios del manifest (append / compactación / reescritura)
+_lock = threading.Lock()
+_compactor: Optional[threading.Thread] = None
 
 
 def ensure_data_dir():
     os.makedirs(DATA_DIR, exist_ok=True)
+    os.makedirs(SEG_DIR, exist_ok=True)
+
+
+# ---------- escritura atómica ----------
+def _atomic_write(fp: str, write_fn):
+    """Escribe en fp.tmp, fsync y os.replace: nunca queda un archivo a medias."""
+    tmp = fp + ".tmp"
+    with open(tmp, "wb") as f:
+        write_fn(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, fp)
+
+
+def _read_manifest() -> Dict[str, Any]:
+    if not os.path.isfile(MANIFEST_FP):
+        return {"segments": [], "next_id": 1}
+    with open(MANIFEST_FP, "r", encoding="utf-8") as f:
+        return json.load(f)
 
 
-def save_index(docs: List[Dict[str, Any]], embeddings):
+def _write_manifest(manifest: Dict[str, Any]):
+    data = json.dumps(manifest, ensure_ascii=False, indent=1).encode("utf-8")
+    _atomic_write(MANIFEST_FP, lambda f: f.write(data))
+
+
+# ---------- segmentos ----------
+# Cada segmento: <name>.jsonl (blob de docs), .off.npy (offsets de cada fila
+# en el blob), .ids.npy (columnas convenio_id/version_id), .npy (embeddings),
+# .scale.npy (solo int8), .lex.npz (postings BM25 de sus filas) y, si se
+# indexaron oraciones, .sptr.npy / .spans.npy / .sent.npy [/ .sent.scale.npy].
+def _seg_paths(name: str):
+    base = os.path.join(SEG_DIR, name)
+    return {
+        "docs": base + ".jsonl",
+        "emb": base + ".npy",
+        "scale": base + ".scale.npy",
+        "off": base + ".off.npy",
+        "ids": base + ".ids.npy",
+        "lex": base + ".lex.npz",
+        "sptr": base + ".sptr.npy",
+        "spans": base + ".spans.npy",
+        "sent": base + ".sent.npy",
+        "sent_scale": base + ".sent.scale.npy",
+    }
+
+
+def _write_segment(seg_id: int, docs, vectors: VectorStore,
+                   sentences: Optional[SentenceStore] = None) -> Dict[str, Any]:
+    """Escribe un segmento inmutable (docs + columnas + embeddings [+ escala int8] [+ oraciones])."""
+    name = f"seg_{seg_id:06d}"
+    fps = _seg_paths(name)
+    blob, offsets, ids = encode_rows(docs)
+    _atomic_write(fps["docs"], lambda f: f.write(blob))
+    _atomic_write(fps["off"], lambda f: np.save(f, offsets))
+    _atomic_write(fps["ids"], lambda f: np.save(f, ids))
+    _atomic_write(fps["emb"], lambda f: np.save(f, np.asarray(vectors.data)))
+    if vectors.scale is not None:
+        _atomic_write(fps["scale"], lambda f: np.save(f, np.asarray(vectors.scale)))
+    lex = segment_postings(d.get("fragmento", "") for d in docs)
+    _atomic_write(fps["lex"], lambda f: np.savez(f, **lex))
+    if sentences is not None and sentences.n_sents:
+        sv = sentences.vectors
+        _atomic_write(fps["sptr"], lambda f: np.save(f, np.asarray(sentences.ptr)))
+        _atomic_write(fps["spans"], lambda f: np.save(f, np.asarray(sentences.spans)))
+        _atomic_write(fps["sent"], lambda f: np.save(f, np.asarray(sv.data)))
+        if sv.scale is not None:
+            _atomic_write(fps["sent_scale"], lambda f: np.save(f, np.asarray(sv.scale)))
+    return {"name": name, "rows": len(docs), "precision": vectors.precision}
+
+
+def _map_blob(fp: str):
+    with open(fp, "rb") as f:
+        if not USE_MMAP:
+            return f.read()
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _ensure_columns(fps: Dict[str, str]):
+    """Segmentos anteriores sin .off/.ids: se generan una vez a partir del .jsonl."""
+    if os.path.isfile(fps["off"]) and os.path.isfile(fps["ids"]):
+        return
+    docs: List[Dict[str, Any]] = []
+    with open(fps["docs"], "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                docs.append(json.loads(line))
+    blob, offsets, ids = encode_rows(docs)
+    _atomic_write(fps["docs"], lambda f: f.write(blob))
+    _atomic_write(fps["off"], lambda f: np.save(f, offsets))
+    _atomic_write(fps["ids"], lambda f: np.save(f, ids))
+
+
+def _read_segment(entry: Dict[str, Any]):
+    """(blob, offsets, ids, VectorStore) de un segmento; mmap si USE_MMAP."""
+    fps = _seg_paths(entry["name"])
+    _ensure_columns(fps)
+    mode = "r" if USE_MMAP else None
+    offsets = np.load(fps["off"], mmap_mode=mode)
+    ids = np.load(fps["ids"], mmap_mode=mode)
+    data = np.load(fps["emb"], mmap_mode=mode)
+    scale = np.load(fps["scale"], mmap_mode=mode) if os.path.isfile(fps["scale"]) else None
+    vectors = VectorStore(entry.get("precision", "float32"), data=data, scale=scale)
+    return _map_blob(fps["docs"]), offsets, ids, vectors
+
+
+def _read_lexical(entry: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """Postings BM25 del segmento; en segmentos anteriores se generan una vez."""
+    fps = _seg_paths(entry["name"])
+    if os.path.isfile(fps["lex"]):
+        with np.load(fps["lex"]) as z:
+            return {k: z[k] for k in z.files}
+    texts: List[str] = []
+    with open(fps["docs"], "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                texts.append(json.loads(line).get("fragmento", ""))
+    lex = segment_postings(texts)
+    _atomic_write(fps["lex"], lambda f: np.savez(f, **lex))
+    return lex
+
+
+def _read_sentences(entry: Dict[str, Any]) -> SentenceStore:
+    """Oraciones del segmento (mmap si USE_MMAP); sin archivos => filas sin oraciones."""
+    fps = _seg_paths(entry["name"])
+    if not os.path.isfile(fps["sptr"]):
+        return SentenceStore.empty(entry["rows"])
+    mode = "r" if USE_MMAP else None
+    data = np.load(fps["sent"], mmap_mode=mode)
+    scale = np.load(fps["sent_scale"], mmap_mode=mode) if os.path.isfile(fps["sent_scale"]) else None
+    vectors = VectorStore(_precision_of(data), data=data, scale=scale)
+    return SentenceStore(vectors.precision, ptr=np.load(fps["sptr"], mmap_mode=mode),
+                         spans=np.load(fps["spans"], mmap_mode=mode), vectors=vectors)
+
+
+def _remove_segments(entries: List[Dict[str, Any]]):
+    for e in entries:
+        for fp in _seg_paths(e["name"]).values():
+            try:
+                if os.path.isfile(fp):
+                    os.remove(fp)
+            except OSError:
+                pass  # mapeado por otro proceso (Windows): lo limpia _gc_orphans
+
+
+def _gc_orphans(manifest: Dict[str, Any]):
+    """Borra archivos de segmentos que no están en el manifest (p.ej. tras un crash)."""
+    live = {e["name"] for e in manifest["segments"]}
+    for fn in os.listdir(SEG_DIR):
+        name = fn.split(".", 1)[0]
+        if name.startswith("seg_") and name not in live:
+            try:
+                os.remove(os.path.join(SEG_DIR, fn))
+            except OSError:
+                pass
+
+
+def _precision_of(data: np.ndarray) -> str:
+    return {np.dtype(np.int8): "int8", np.dtype(np.float16): "float16"}.get(data.dtype, "float32")
+
+
+def _as_store(embeddings) -> VectorStore:
+    if isinstance(embeddings, VectorStore):
+        return embeddings
+    return VectorStore.from_float(embeddings)
+
+
+# ---------- API ----------
+def append_segment(docs: List[Dict[str, Any]], embeddings,
+                   sentences: Optional[SentenceStore] = None):
+    """
+    Persiste SOLO las filas nuevas como un segmento inmutable y lo registra
+    en el manifest (reemplazo atómico). Costo O(k) por lote indexado.
+    """
+    if not docs:
+        return
     ensure_data_dir()
-    with open(DOCS_FP, "w", encoding="utf-8") as f:
-        for d in docs:
-            f.write(json.dumps(d, ensure_ascii=False) + "\n")
-    if embeddings is not None:
-        np.save(EMB_FP, embeddings)
+    with _lock:
+        manifest = _read_manifest()
+        entry = _write_segment(manifest["next_id"], docs, _as_store(embeddings), sentences)
+        manifest["next_id"] += 1
+        manifest["segments"].append(entry)
+        _write_manifest(manifest)
 
 
-def load_index():
+def save_index(docs: List[Dict[str, Any]], embeddings,
+               sentences: Optional[SentenceStore] = None):
+    """
+    Reescritura completa: todo el índice en un único segmento nuevo.
+    embeddings: VectorStore (se guarda en su precisión) o matriz float32.
+    Las filas cambian de posición, así que se descartan los tombstones.
+    """
     ensure_data_dir()
+    with _lock:
+        manifest = _read_manifest()
+        old = manifest["segments"]
+        old_tomb = manifest.get("tombstones")
+        segments = []
+        if docs and embeddings is not None:
+            segments.append(_write_segment(manifest["next_id"], docs, _as_store(embeddings), sentences))
+        manifest = {"segments": segments, "next_id": manifest["next_id"] + 1}
+        _write_manifest(manifest)
+        _remove_segments(old)
+        _remove_tombstones(old_tomb)
+
+
+# ---------- tombstones ----------
+# Filas borradas (posiciones globales en el orden del manifest) en un
+# tomb_<id>.npy referenciado desde el manifest; se reemplaza entero en
+# cada borrado. compact_segments() conserva el orden de filas, así que
+# sigue siendo válido; save_index() lo descarta.
+def _remove_tombstones(name: Optional[str]):
+    if not name:
+        return
+    try:
+        os.remove(os.path.join(DATA_DIR, name))
+    except OSError:
+        pass
+
+
+def save_tombstones(rows: np.ndarray):
+    ensure_data_dir()
+    rows = np.asarray(rows, dtype=np.int64)
+    with _lock:
+        manifest = _read_manifest()
+        old = manifest.get("tombstones")
+        name = None
+        if rows.size:
+            name = f"tomb_{manifest['next_id']:06d}.npy"
+            manifest["next_id"] += 1
+            _atomic_write(os.path.join(DATA_DIR, name), lambda f: np.save(f, rows))
+        manifest["tombstones"] = name
+        _write_manifest(manifest)
+        if old != name:
+            _remove_tombstones(old)
+
+
+def load_tombstones() -> np.ndarray:
+    name = _read_manifest().get("tombstones")
+    fp = os.path.join(DATA_DIR, name) if name else None
+    if not fp or not os.path.isfile(fp):
+        return np.empty(0, dtype=np.int64)
+    return np.load(fp)
+
+
+def _migrate_legacy():
+    """index.jsonl + embeddings.npy (formato anterior) => un segmento."""
+    if os.path.isfile(MANIFEST_FP) or not os.path.isfile(DOCS_FP):
+        return
     docs: List[Dict[str, Any]] = []
-    if os.path.isfile(DOCS_FP):
-        with open(DOCS_FP, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if line:
-                    docs.append(json.loads(line))
-
-    embeddings = None
+    with open(DOCS_FP, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                docs.append(json.loads(line))
+    vectors = None
     if os.path.isfile(EMB_FP):
-        embeddings = np.load(EMB_FP)
+        data = np.load(EMB_FP)
+        scale = np.load(SCALE_FP) if data.dtype == np.int8 else None
+        precision = _precision_of(data)
+        if precision == "float32":
+            data = data.astype(np.float32, copy=False)
+        vectors = VectorStore(precision, data=data, scale=scale)
+    save_index(docs, vectors)
+    for fp in (DOCS_FP, EMB_FP, SCALE_FP):
+        if os.path.isfile(fp):
+            os.remove(fp)
+
+
+def load_index():
+    """
+    Ensambla los segmentos del manifest => (DocTable, VectorStore | None).
+    Con USE_MMAP los embeddings y el blob de docs quedan mapeados, un mmap por
+    segmento (VectorStore los ve como una sola matriz sin concatenarlos).
+    """
+    ensure_data_dir()
+    _migrate_legacy()
+    with _lock:
+        manifest = _read_manifest()
+        docs = DocTable()
+        stores: List[VectorStore] = []
+        for entry in manifest["segments"]:
+            blob, offsets, ids, vectors = _read_segment(entry)
+            docs.add_part(blob, offsets, ids)
+            stores.append(vectors)
+    return docs, VectorStore.concat(stores)
+
+
+def load_lexical() -> BM25Index:
+    """Índice BM25 ensamblado a partir de los postings de cada segmento."""
+    ensure_data_dir()
+    bm25 = BM25Index()
+    with _lock:
+        for entry in _read_manifest()["segments"]:
+            bm25.add_postings(_read_lexical(entry))
+    return bm25
+
+
+def load_sentences() -> SentenceStore:
+    """Oraciones indexadas de todos los segmentos, alineadas con load_index()."""
+    ensure_data_dir()
+    with _lock:
+        stores = [_read_sentences(e) for e in _read_manifest()["segments"]]
+    return SentenceStore.concat(stores)
+
+
+def segment_stats() -> Dict[str, Any]:
+    manifest = _read_manifest()
+    rows = [e["rows"] for e in manifest["segments"]]
+    return {
+        "segments": len(rows),
+        "small_segments": sum(1 for r in rows if r < COMPACT_MIN_ROWS),
+        "rows": sum(rows),
+        "compacting": _compactor is not None and _compactor.is_alive(),
+    }
+
+
+def compact_segments(min_rows: int = COMPACT_MIN_ROWS) -> int:
+    """
+    Fusiona tramos CONSECUTIVOS de segmentos chicos (< min_rows filas), así
+    el orden de filas no cambia. Devuelve en cuántos segmentos bajó el total.
+    """
+    ensure_data_dir()
+    with _lock:
+        manifest = _read_manifest()
+        segments = manifest["segments"]
+        out: List[Dict[str, Any]] = []
+        removed: List[Dict[str, Any]] = []
+        run: List[Dict[str, Any]] = []
+
+        def flush():
+            if len(run) >= 2:
+                docs = DocTable()
+                stores: List[VectorStore] = []
+                sents: List[SentenceStore] = []
+                for e in run:
+                    blob, offsets, ids, v = _read_segment(e)
+                    docs.add_part(blob, offsets, ids)
+                    stores.append(v)
+                    sents.append(_read_sentences(e))
+                out.append(_write_segment(manifest["next_id"], docs, VectorStore.concat(stores),
+                                          SentenceStore.concat(sents)))
+                manifest["next_id"] += 1
+                removed.extend(run)
+            else:
+                out.extend(run)
+            run.clear()
+
+        for e in segments:
+            if e["rows"] < min_rows:
+                run.append(e)
+            else:
+                flush()
+                out.append(e)
+        flush()
+
+        if removed:
+            manifest["segments"] = out
+            _write_manifest(manifest)
+            _remove_segments(removed)
+        _gc_orphans(manifest)
+        return len(segments) - len(out)
+
+
+def maybe_compact_async(trigger: int = COMPACT_TRIGGER) -> bool:
+    """Lanza compact_segments() en un hilo de fondo si hay demasiados segmentos chicos."""
+    global _compactor
+    if _compactor is not None and _compactor.is_alive():
+        return False
+    if segment_stats()["small_segments"] < trigger:
+        return False
+    _compactor = threading.Thread(target=compact_segments, name="segment-compactor", daemon=True)
+    _compactor.start()
+    return True
+
+
+def save_ann(ann):
+    """Persiste el índice IVF junto a los segmentos (o lo borra si no hay)."""
+    ensure_data_dir()
+    if ann is None or not ann.is_built:
+        if os.path.isfile(ANN_FP):
+            os.remove(ANN_FP)
+        return
+    _atomic_write(ANN_FP, lambda f: np.savez(f, **ann.to_arrays()))
+
+
+def load_ann():
+    from .ann import IVFIndex
 
-    return docs, embeddings
\ No newline at end of file
+    if not os.path.isfile(ANN_FP):
+        return None
+    with np.load(ANN_FP) as arrs:
+        return IVFIndex.from_arrays(arrs)
@@ -0,0 +1,37 @@
+from __future__ import annotations
+from typing import Any, Dict
+from contextlib import contextmanager
+import threading
+import time
+
+
+class StageTimer:
+    """
+    Tiempos acumulados por etapa (p.ej. expand / encode / rank).
+    stats(): por etapa, cantidad, promedio y último valor en ms.
+    """
+    def __init__(self):
+        self._stats: Dict[str, list] = {}  # etapa -> [count, total_ms, last_ms]
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - t0) * 1000.0)
+
+    def add(self, name: str, ms: float) -> None:
+        with self._lock:
+            st = self._stats.setdefault(name, [0, 0.0, 0.0])
+            st[0] += 1
+            st[1] += ms
+            st[2] = ms
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                name: {"count": c, "avg_ms": round(total / c, 3), "last_ms": round(last, 3)}
+                for name, (c, total, last) in self._stats.items()
+            }
@@ -0,0 +1,188 @@
+from __future__ import annotations
+from typing import Any, Dict, Optional
+import os
+
+import numpy as np
+
+from .buffers import GrowableArray, SegmentedArray, row_buffer
+
+PRECISIONS = ("float32", "float16", "int8")
+
+# filas por bloque al decodificar/puntuar (acota la memoria temporal)
+_CHUNK = 4096
+
+
+def precision_mode(value: Optional[str] = None) -> str:
+    """Precisión de almacenamiento: argumento explícito o SEMANTIC_PRECISION (float32 por defecto)."""
+    mode = (value if value is not None else os.getenv("SEMANTIC_PRECISION", "float32")).strip().lower()
+    aliases = {"fp32": "float32", "fp16": "float16", "half": "float16", "i8": "int8"}
+    mode = aliases.get(mode, mode)
+    if mode not in PRECISIONS:
+        raise ValueError(f"SEMANTIC_PRECISION desconocida: {mode!r} (usa {PRECISIONS})")
+    return mode
+
+
+def quantize_rows(X: np.ndarray, precision: str):
+    """(data, scale) para filas float32; scale solo en int8 (una por fila)."""
+    X = np.asarray(X, dtype=np.float32)
+    if precision == "float16":
+        return X.astype(np.float16), None
+    if precision == "int8":
+        scale = np.abs(X).max(axis=1) / 127.0 if X.size else np.empty(0, np.float32)
+        scale = np.where(scale > 0, scale, 1.0).astype(np.float32)
+        data = np.clip(np.rint(X / scale[:, None]), -127, 127).astype(np.int8)
+        return data, scale
+    return X, None
+
+
+class VectorStore:
+    """
+    Matriz de embeddings (N, D) con precisión configurable.
+    - float32: tal cual.
+    - float16: mitad de memoria; se puntúa en float32 por bloques.
+    - int8: cuantización escalar simétrica con una escala por fila
+      (x ≈ q * scale); un cuarto de memoria.
+    Los scores son siempre float32 (producto punto con la consulta).
+    Las filas viven en buffers con capacidad duplicable (buffers.py): append
+    es O(k) amortizado y data/scale son vistas del prefijo lleno. Los mmaps
+    de los segmentos quedan mapeados (uno por segmento, SegmentedArray) y las
+    filas nuevas van aparte: cargar o agregar no los copia a RAM.
+    """
+    def __init__(self, precision: str = "float32",
+                 data: Optional[np.ndarray] = None, scale: Optional[np.ndarray] = None):
+        self.precision = precision_mode(precision)
+        self.data = data
+        self.scale = scale
+
+    @property
+    def data(self) -> Optional[np.ndarray]:
+        return None if self._data is None else self._data.view()
+
+    @data.setter
+    def data(self, arr: Optional[np.ndarray]):
+        self._data = None if arr is None else row_buffer(arr)
+
+    @property
+    def scale(self) -> Optional[np.ndarray]:
+        return None if self._scale is None else self._scale.view()
+
+    @scale.setter
+    def scale(self, arr: Optional[np.ndarray]):
+        self._scale = None if arr is None else row_buffer(arr)
+
+    @classmethod
+    def from_float(cls, X: Optional[np.ndarray], precision: str = "float32") -> "VectorStore":
+        vs = cls(precision)
+        if X is not None and len(X):
+            vs.data, vs.scale = quantize_rows(X, vs.precision)
+        return vs
+
+    def __len__(self) -> int:
+        return 0 if self._data is None else len(self._data)
+
+    @property
+    def dim(self) -> Optional[int]:
+        return None if self._data is None else int(self._data.row_shape[0])
+
+    @property
+    def nbytes(self) -> int:
+        n = 0 if self._data is None else self._data.nbytes
+        return n + (0 if self._scale is None else self._scale.nbytes)
+
+    @property
+    def capacity(self) -> int:
+        return 0 if self._data is None else self._data.capacity
+
+    # ---------- escritura ----------
+    def append(self, X: np.ndarray) -> None:
+        data, scale = quantize_rows(X, self.precision)
+        if data.shape[0] == 0:
+            return
+        if self._data is None:
+            self._data = GrowableArray(data.dtype, data.shape[1:])
+        self._data.extend(data)
+        if scale is not None:
+            if self._scale is None:
+                self._scale = GrowableArray(np.float32)
+            self._scale.extend(scale)
+
+    def take(self, start: int, stop: int) -> "VectorStore":
+        """Sub-rango de filas [start, stop) en la misma precisión (vista, sin copia)."""
+        if self.data is None:
+            return VectorStore(self.precision)
+        scale = None if self.scale is None else self.scale[start:stop]
+        return VectorStore(self.precision, data=self.data[start:stop], scale=scale)
+
+    def select(self, rows: np.ndarray) -> "VectorStore":
+        """Copia solo con las filas dadas (p.ej. al descartar filas borradas)."""
+        if self.data is None:
+            return VectorStore(self.precision)
+        scale = None if self.scale is None else self.scale[rows]
+        return VectorStore(self.precision, data=self.data[rows], scale=scale)
+
+    @classmethod
+    def concat(cls, stores) -> Optional["VectorStore"]:
+        """
+        Une varios stores sin copiar sus filas (SegmentedArray); si difieren en
+        precisión el resultado es float32 (copia).
+        """
+        stores = [vs for vs in stores if vs is not None and len(vs)]
+        if not stores:
+            return None
+        if len(stores) == 1:
+            return stores[0]
+        precision = stores[0].precision
+        if any(vs.precision != precision for vs in stores):
+            return cls.from_float(np.vstack([vs.get() for vs in stores]), "float32")
+        data = SegmentedArray.join([vs.data for vs in stores])
+        scale = None if stores[0].scale is None else SegmentedArray.join([vs.scale for vs in stores])
+        return cls(precision, data=data, scale=scale)
+
+    def astype(self, precision: str) -> "VectorStore":
+        """Copia en otra precisión (p.ej. al cargar un índice guardado en float32)."""
+        precision = precision_mode(precision)
+        if precision == self.precision:
+            return self
+        return VectorStore.from_float(self.get(), precision)
+
+    # ---------- lectura ----------
+    def _decode(self, data: np.ndarray, scale: Optional[np.ndarray]) -> np.ndarray:
+        out = np.asarray(data, dtype=np.float32)
+        if scale is not None:
+            out = out * np.asarray(scale)[:, None]
+        return out
+
+    def get(self, rows: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """Filas decodificadas a float32 (todas si rows es None)."""
+        if self.data is None:
+            return None
+        if rows is None:
+            return self._decode(self.data, self.scale)
+        return self._decode(self.data[rows], None if self.scale is None else self.scale[rows])
+
+    def scores(self, q_vec: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Producto punto (coseno si todo está normalizado) contra las filas dadas.
+        q_vec (d,) => (M,); varias consultas (m, d) => (M, m) en un solo producto.
+        """
+        q_vec = np.asarray(q_vec, dtype=np.float32)
+        data = self.data if rows is None else self.data[rows]
+        scale = self.scale if (rows is None or self.scale is None) else self.scale[rows]
+        if self.precision == "float32" and isinstance(data, np.ndarray):
+            return data @ q_vec.T
+
+        out = np.empty((data.shape[0],) + q_vec.shape[:-1], dtype=np.float32)
+        for a in range(0, data.shape[0], _CHUNK):
+            out[a:a + _CHUNK] = np.asarray(data[a:a + _CHUNK], dtype=np.float32) @ q_vec.T
+        if scale is not None:
+            out *= np.asarray(scale).reshape((-1,) + (1,) * (out.ndim - 1))
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "precision": self.precision,
+            "rows": len(self),
+            "capacity": self.capacity,
+            "dim": self.dim,
+            "bytes": self.nbytes,
+        }
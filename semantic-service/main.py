@@ -1,38 +1,131 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Tuple
 import uvicorn
-import re
+import json
+import os
 
-import spacy
-from sentence_transformers import SentenceTransformer, util
-import torch
+from sentence_transformers import SentenceTransformer
+import numpy as np
+
+from app.batcher import batcher_from_env
+from app.cache import EmbeddingCache, LRUCache, text_key
+from app.encoding import encode_sorted
+from app.qa import (
+    QA_MIN_SCORE, NO_ANSWER_LOW, NO_QUESTION, NO_SENTS, NO_ANSWER,
+    compose_answer, top_sentences,
+)
+from app.quant import maybe_quantize, quant_mode
+from app.readiness import ModelLoader, WARMUP_TEXTS
+from app.segment import Segmenter
+from app.semantic import clean_ocr_text
 
 app = FastAPI(title="semantic-service", version="1.1")
 
-nlp = spacy.load("es_core_news_sm")
-embedder = SentenceTransformer("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+# EMBEDDER_QUANTIZE=int8 activa la cuantización dinámica del encoder
+# (experimental, sin validar: ver tools/check_quant.py antes de usarlo)
+QUANT_MODE = quant_mode()
+# identifica al encoder en las claves de caché (fp32 e int8 no se mezclan)
+ENCODER_ID = MODEL_NAME if QUANT_MODE == "fp32" else f"{MODEL_NAME}|{QUANT_MODE}"
+
+# Los modelos se cargan en segundo plano al arrancar (ver _load_models / /ready)
+embedder: Optional[SentenceTransformer] = None
+
+# Caché de embeddings de fragmentos (LRU en memoria + disco opcional)
+frag_cache = EmbeddingCache(
+    ENCODER_ID,
+    max_size=int(os.getenv("QA_EMB_CACHE_SIZE", "2048")),
+    disk_dir=os.getenv("QA_EMB_CACHE_DIR") or None,
+)
+
+# Tamaño de lote al codificar fragmentos / oraciones
+QA_BATCH_SIZE = int(os.getenv("QA_BATCH_SIZE", "32"))
+
+# Segmentación en oraciones: "parser" (es_core_news_sm reducido) o "sentencizer" (reglas)
+QA_SEGMENTER = os.getenv("QA_SEGMENTER", "parser")
+segmenter: Optional[Segmenter] = None
+
+# segundos que una petición espera a que los modelos terminen de cargar
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", "60"))
+
+# Caché por fragmento: (oraciones, embeddings de oraciones)
+sent_cache = LRUCache(int(os.getenv("QA_SENT_CACHE_SIZE", "256")))
+
+
+def _load_models():
+    global embedder, segmenter
+    embedder = maybe_quantize(SentenceTransformer(MODEL_NAME), QUANT_MODE)
+    segmenter = Segmenter(mode=QA_SEGMENTER)
+
+
+def _warmup():
+    encode_texts(WARMUP_TEXTS)
+    segmenter.split(" ".join(WARMUP_TEXTS))
+
+
+loader = ModelLoader(_load_models, _warmup)
+
+
+def _require_models():
+    if not loader.wait(timeout=READY_TIMEOUT):
+        raise HTTPException(status_code=503, detail=f"Modelos no disponibles ({loader.state}).")
 
 
-def clean_ocr_text(s: str) -> str:
+def _encode_direct(texts: List[str]) -> np.ndarray:
+    """Un forward pass por lote (embeddings normalizados)."""
+    return embedder.encode(texts, batch_size=QA_BATCH_SIZE,
+                           convert_to_numpy=True, normalize_embeddings=True)
+
+
+# Micro-batching entre peticiones concurrentes (ENCODE_BATCHER=0 lo desactiva)
+batcher = batcher_from_env(_encode_direct)
+
+
+def encode_texts(texts: List[str]) -> np.ndarray:
+    if batcher is not None:
+        return batcher.encode(texts)
+    return _encode_direct(texts)
+
+
+def fragment_embeddings(frags: List[str]) -> np.ndarray:
     """
-    Limpieza fuerte para respuestas / fragmentos:
-    - Elimina entidades HTML (&quot;, &#8203;, etc.)
-    - Elimina caracteres de control
-    - Elimina bloques numéricos largos (códigos de OCR)
-    - Normaliza espacios
+    Matriz (n, d) de embeddings para fragmentos ya limpios.
+    - Los que están en caché no se recalculan.
+    - El resto se codifica junto, en lotes ordenados por longitud.
     """
-    if not s:
-        return ""
-    s = re.sub(r"&#\d+;?", " ", s)
-    s = re.sub(r"&[A-Za-z0-9#]+;", " ", s)
-    s = re.sub(r"[\x00-\x1F\x7F\xAD]", " ", s)
+    vecs: List[Optional[np.ndarray]] = [frag_cache.get(f) for f in frags]
+    missing = [i for i, v in enumerate(vecs) if v is None]
+    if missing:
+        uniq = list(dict.fromkeys(frags[i] for i in missing))
+        enc = encode_sorted(encode_texts, uniq, QA_BATCH_SIZE)
+        by_text = dict(zip(uniq, enc))
+        for t, v in by_text.items():
+            frag_cache.put(t, v)
+        for i in missing:
+            vecs[i] = by_text[frags[i]]
+    return np.vstack(vecs)
 
-    # 🔥 elimina bloques numéricos largos (6+ dígitos)
-    s = re.sub(r"\b\d{6,}\b", " ", s)
 
-    s = re.sub(r"\s+", " ", s)
-    return s.strip()
+def sent_key(frag: str) -> str:
+    return text_key(frag, f"{ENCODER_ID}|{QA_SEGMENTER}")
+
+
+def fragment_sentences(frag: str) -> Tuple[List[str], Optional[np.ndarray]]:
+    """
+    Oraciones de un fragmento limpio y sus embeddings (n, d).
+    Se cachean por hash del fragmento: una pregunta repetida sobre el mismo
+    convenio no vuelve a pasar por spaCy ni por el encoder.
+    """
+    key = sent_key(frag)
+    hit = sent_cache.get(key)
+    if hit is not None:
+        return hit
+    sents = segmenter.split(frag)
+    embs = encode_sorted(encode_texts, sents, QA_BATCH_SIZE) if sents else None
+    sent_cache.put(key, (sents, embs))
+    return sents, embs
 
 
 class QAItem(BaseModel):
@@ -53,83 +146,169 @@ class QAResponse(BaseModel):
     used: List[QAItem]
 
 
+@app.on_event("startup")
+def _startup():
+    loader.start()
+
+
+@app.get("/ready")
+def ready():
+    """Listo para tráfico solo tras carga + warm-up (503 mientras tanto)."""
+    return JSONResponse(loader.status(), status_code=200 if loader.ready else 503)
+
+
 @app.get("/health")
 def health():
-    return {"ok": True}
+    return {
+        "ok": True,
+        "quantize": QUANT_MODE,
+        "emb_cache": frag_cache.stats(),
+        "segmenter": QA_SEGMENTER,
+        "sent_cache": sent_cache.stats(),
+        "batcher": batcher.stats() if batcher is not None else None,
+    }
 
 
-@app.post("/qa", response_model=QAResponse)
-def qa(req: QARequest):
+# oraciones por bloque al puntuar en modo streaming
+QA_STREAM_CHUNK = int(os.getenv("QA_STREAM_CHUNK", "32"))
+
+
+def _pick_fragment(req: QARequest):
+    """
+    Etapa 1: elige el mejor item.
+    Devuelve (respuesta_temprana, best_item, best_score, frag_clean, q_vec);
+    si respuesta_temprana no es None, no hay nada más que hacer.
+    """
     if not req.items:
         return QAResponse(
             answer="No tengo una respuesta exacta para esa consulta, porque no recibí contenido para analizar.",
             used=[],
-        )
+        ), None, -1.0, "", None
 
     q = req.question.strip()
     if not q:
-        return QAResponse(
-            answer="No tengo una respuesta exacta para esa consulta, la pregunta llegó vacía.",
-            used=[],
-        )
+        return QAResponse(answer=NO_QUESTION, used=[]), None, -1.0, "", None
 
-    q_emb = embedder.encode(q, convert_to_tensor=True, normalize_embeddings=True)
+    q_vec = encode_texts([q])[0]
 
-    # 1) Elegir el mejor item (por documento)
-    best_item: Optional[QAItem] = None
-    best_score: float = -1.0
+    # todos los fragmentos en lote
+    cands = []
     for it in req.items:
         frag = clean_ocr_text(it.fragmento or "")
-        if not frag:
-            continue
-        emb = embedder.encode(frag, convert_to_tensor=True, normalize_embeddings=True)
-        score = float(util.cos_sim(q_emb, emb)[0][0])
-        if score > best_score:
-            best_score = score
-            best_item = it
-
-    if not best_item:
-        return QAResponse(
-            answer="No tengo una respuesta exacta para esa consulta en el texto analizado.",
-            used=[],
-        )
+        if frag:
+            cands.append((it, frag))
+
+    if not cands:
+        return QAResponse(answer=NO_ANSWER, used=[]), None, -1.0, "", q_vec
+
+    M = fragment_embeddings([f for _, f in cands])  # (n, d)
+    scores = M @ q_vec  # coseno (embeddings normalizados)
+    bi = int(np.argmax(scores))
+    best_item, frag_clean = cands[bi]
+    return None, best_item, float(scores[bi]), frag_clean, q_vec
+
+
+@app.post("/qa", response_model=QAResponse)
+def qa(req: QARequest):
+    _require_models()
+    early, best_item, best_score, frag_clean, q_vec = _pick_fragment(req)
+    if early is not None:
+        return early
 
     # umbral: si la similitud es muy baja, mejor responder que no hay respuesta clara
-    if best_score < 0.30:
-        return QAResponse(
-            answer="No tengo una respuesta exacta para esa consulta en el texto disponible.",
-            used=[best_item],
-        )
+    if best_score < QA_MIN_SCORE:
+        return QAResponse(answer=NO_ANSWER_LOW, used=[best_item])
 
     # 2) Dentro del fragmento ganador, elegir oraciones más relevantes
-    frag_clean = clean_ocr_text(best_item.fragmento or "")
-    doc = nlp(frag_clean[:60000])
-    sents = [s.text.strip() for s in doc.sents if s.text.strip()]
+    sents, sent_embs = fragment_sentences(frag_clean)
     if not sents:
-        return QAResponse(
-            answer="No tengo una respuesta exacta para esa consulta porque el texto del convenio no se pudo dividir en oraciones útiles.",
-            used=[best_item],
-        )
+        return QAResponse(answer=NO_SENTS, used=[best_item])
+
+    # Similitud con cada oración (embeddings normalizados => producto punto)
+    sims = sent_embs @ q_vec
+    chosen = [sents[i] for i in top_sentences(sims, req.top_k)]
+    return QAResponse(answer=compose_answer(chosen), used=[best_item])
+
+
+def _stream_events(req: QARequest):
+    """
+    Eventos de /qa/stream:
+    - item:     en cuanto se elige el fragmento (QAItem + score).
+    - sentence: oraciones que entran al top-k parcial, en orden textual,
+                a medida que se puntúa cada bloque (provisionales).
+    - retract:  {"index"} de una oración ya emitida que salió del top-k
+                (la desplazó una mejor de un bloque posterior).
+    - answer:   QAResponse final, idéntica a la de /qa.
+    Las oraciones emitidas y no retiradas son exactamente las de la respuesta.
+    """
+    early, best_item, best_score, frag_clean, q_vec = _pick_fragment(req)
+    if early is not None:
+        yield "answer", early.model_dump()
+        return
+
+    yield "item", {"item": best_item.model_dump(), "score": best_score}
+
+    if best_score < QA_MIN_SCORE:
+        yield "answer", QAResponse(answer=NO_ANSWER_LOW, used=[best_item]).model_dump()
+        return
+
+    key = sent_key(frag_clean)
+    hit = sent_cache.get(key)
+    if hit is not None:
+        sents, sent_embs = hit
+    else:
+        sents, sent_embs = segmenter.split(frag_clean), None
+
+    if not sents:
+        yield "answer", QAResponse(answer=NO_SENTS, used=[best_item]).model_dump()
+        return
+
+    k = max(0, min(req.top_k, len(sents)))
+    sims = np.empty(len(sents), dtype=np.float32)
+    blocks = []
+    shown = set()
+    for a in range(0, len(sents), QA_STREAM_CHUNK):
+        b = min(a + QA_STREAM_CHUNK, len(sents))
+        if sent_embs is not None:
+            emb = sent_embs[a:b]
+        else:
+            emb = encode_sorted(encode_texts, sents[a:b], QA_BATCH_SIZE)
+            blocks.append(emb)
+        sims[a:b] = emb @ q_vec
+
+        # top-k parcial sobre lo puntuado hasta ahora
+        # (una oración que sale no vuelve: los bloques siguientes solo suman rivales)
+        if k:
+            partial = set(top_sentences(sims[:b], k))
+            for i in sorted(shown - partial):
+                yield "retract", {"index": i}
+            shown &= partial
+            for i in range(a, b):
+                if i in partial:
+                    shown.add(i)
+                    yield "sentence", {"index": i, "text": sents[i], "score": float(sims[i])}
 
-    # Embeddings por oraciones
-    sent_embs = embedder.encode(sents, convert_to_tensor=True, normalize_embeddings=True)
-    sims = util.cos_sim(q_emb, sent_embs)[0]
-    topk = min(req.top_k, len(sents))
-    best_idx = torch.topk(sims, k=topk).indices.tolist()
-    best_idx.sort()  # mantener orden textual
+    if sent_embs is None:
+        sent_cache.put(key, (sents, np.vstack(blocks)))
 
-    chosen = [sents[i] for i in best_idx]
-    answer = " ".join(chosen)
-    MAX_OUT = 10000
-    if len(answer) > MAX_OUT:
-        answer = answer[:MAX_OUT] + " …"
+    chosen = [sents[i] for i in top_sentences(sims, req.top_k)]
+    yield "answer", QAResponse(answer=compose_answer(chosen), used=[best_item]).model_dump()
 
-    answer = clean_ocr_text(answer)
 
-    if not answer or len(answer) < 10:
-        answer = "No tengo una respuesta exacta para esa consulta en el texto analizado."
+@app.post("/qa/stream")
+def qa_stream(req: QARequest, format: str = "ndjson"):
+    """Variante en streaming de /qa: NDJSON (por defecto) o SSE (?format=sse)."""
+    _require_models()
+    if format == "sse":
+        def gen():
+            for event, data in _stream_events(req):
+                yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+        return StreamingResponse(gen(), media_type="text/event-stream")
 
-    return QAResponse(answer=answer, used=[best_item])
+    def gen():
+        for event, data in _stream_events(req):
+            yield json.dumps({"event": event, **data}, ensure_ascii=False) + "\n"
+    return StreamingResponse(gen(), media_type="application/x-ndjson")
 
 
 if __name__ == "__main__":
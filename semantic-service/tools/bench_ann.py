@@ -0,0 +1,79 @@
+# tools/bench_ann.py
+"""
+Recall@k y latencia del índice IVF (app/ann.py) frente a búsqueda exacta.
+
+Usa el índice persistido (data/embeddings.npy) o, con --synthetic N,
+vectores sintéticos agrupados de dimensión 384.
+
+Uso (desde semantic-service/):
+    python tools/bench_ann.py [--synthetic 100000] [--k 10] [--nprobe 4 8 16]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# añade ../ al PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.ann import IVFIndex, topk_indices  # noqa: E402
+from app.storage import load_index  # noqa: E402
+
+
+def _normalize(X):
+    return (X / np.linalg.norm(X, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _synthetic(n: int, d: int = 384, topics: int = 200, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((topics, d))
+    labels = rng.integers(0, topics, size=n)
+    return _normalize(centers[labels] + 0.6 * rng.standard_normal((n, d)))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--synthetic", type=int, default=0, help="N filas sintéticas (0 = índice persistido)")
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    args = ap.parse_args()
+
+    if args.synthetic:
+        X = _synthetic(args.synthetic)
+    else:
+        _, vs = load_index()
+        if vs is None or not len(vs):
+            sys.exit("No hay embeddings persistidos; usa --synthetic N.")
+        X = vs.get()
+
+    rng = np.random.default_rng(1)
+    Q = _normalize(X[rng.integers(0, X.shape[0], size=args.queries)]
+                   + 0.3 * rng.standard_normal((args.queries, X.shape[1])) / np.sqrt(X.shape[1]))
+
+    t0 = time.perf_counter()
+    ivf = IVFIndex()
+    ivf.build(X)
+    print(f"N={X.shape[0]} d={X.shape[1]} nlist={ivf.nlist} build={time.perf_counter() - t0:.2f}s")
+
+    t0 = time.perf_counter()
+    exact = [set(topk_indices(X @ q, args.k).tolist()) for q in Q]
+    t_exact = (time.perf_counter() - t0) / len(Q) * 1000.0
+    print(f"exacto        : {t_exact:7.2f} ms/consulta")
+
+    for nprobe in args.nprobe:
+        hits, t = 0, 0.0
+        for q, ref in zip(Q, exact):
+            t0 = time.perf_counter()
+            cand = ivf.candidates(q, nprobe=nprobe)
+            got = cand[topk_indices(X[cand] @ q, args.k)]
+            t += time.perf_counter() - t0
+            hits += len(ref & set(got.tolist()))
+        print(f"ivf nprobe={nprobe:<3}: {t / len(Q) * 1000.0:7.2f} ms/consulta  "
+              f"recall@{args.k}={hits / (len(Q) * args.k):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# tools/bench_append.py
+"""
+Costo de muchas llamadas pequeñas a /index (un fragmento por llamada):
+- antes: np.vstack sobre la matriz completa en cada add_docs (copia O(N))
+- ahora: buffer con capacidad duplicable (O(k) amortizado)
+
+El encoder se reemplaza por vectores aleatorios: se mide solo la
+actualización del índice en memoria (docs, embeddings, posting lists).
+
+Uso (desde semantic-service/):
+    python tools/bench_append.py [--calls 10000] [--dim 384] [--precision float32]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# añade ../ al PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.semantic import SemanticIndexer  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calls", type=int, default=10000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--precision", default="float32")
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((args.calls, args.dim)).astype(np.float32)
+    X /= np.linalg.norm(X, axis=1, keepdims=True)
+
+    # antes: vstack de la matriz completa por llamada
+    t0 = time.perf_counter()
+    emb = None
+    for i in range(args.calls):
+        v = X[i:i + 1]
+        emb = v if emb is None else np.vstack([emb, v])
+    t_before = time.perf_counter() - t0
+
+    # ahora: SemanticIndexer.add_docs con encoder falso
+    ix = SemanticIndexer(lazy=True, ann="exact", precision=args.precision)
+    ix.batcher = None
+    pos = iter(range(args.calls))
+    ix._encode = lambda texts: X[[next(pos) for _ in texts]]
+    t0 = time.perf_counter()
+    for i in range(args.calls):
+        ix.add_docs([{"convenio_id": i % 50, "version_id": i % 200, "fragmento": f"fragmento {i}"}])
+    t_after = time.perf_counter() - t0
+
+    assert len(ix.vectors) == args.calls and len(ix.docs) == args.calls
+    print(f"antes (np.vstack)      : {t_before:8.2f} s  ({t_before / args.calls * 1e6:8.1f} us/llamada)")
+    print(f"add_docs (buffer x2)   : {t_after:8.2f} s  ({t_after / args.calls * 1e6:8.1f} us/llamada)")
+    print(f"vectors: {ix.vectors.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# tools/bench_batcher.py
+"""
+Throughput del encoder compartido con N clientes concurrentes:
+encode directo (comportamiento anterior) vs EncodeBatcher (micro-batching).
+
+Uso (desde semantic-service/):
+    python tools/bench_batcher.py [--clients 32] [--requests 20] [--wait-ms 5] [--simulate]
+
+--simulate usa tools/sim_encoder.py en vez del modelo (sin torch).
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# añade ../ al PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import main  # noqa: E402
+from app.batcher import EncodeBatcher  # noqa: E402
+
+QUERIES = [
+    "¿Cuál es la vigencia del convenio?",
+    "convenio con AGETIC",
+    "¿Quién asume los costos de los certificados digitales?",
+    "fecha de vencimiento del convenio",
+    "obligaciones de las partes",
+    "¿Se puede modificar el presupuesto asignado?",
+    "cláusula de resolución anticipada",
+    "capacitación del personal técnico",
+]
+
+
+def _run(encode, clients: int, requests: int) -> float:
+    def client(c):
+        for r in range(requests):
+            encode([QUERIES[(c + r) % len(QUERIES)]])
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as ex:
+        list(ex.map(client, range(clients)))
+    return time.perf_counter() - t0
+
+
+def main_():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=32)
+    ap.add_argument("--requests", type=int, default=20, help="peticiones por cliente")
+    ap.add_argument("--wait-ms", type=float, default=5.0)
+    ap.add_argument("--max-batch", type=int, default=64)
+    ap.add_argument("--simulate", action="store_true", help="encoder simulado (tools/sim_encoder.py)")
+    args = ap.parse_args()
+
+    if args.simulate:
+        from sim_encoder import SimEncoder
+
+        main.embedder = SimEncoder()
+    elif not main.loader.wait():
+        sys.exit(f"No se pudieron cargar los modelos: {main.loader.error}")
+
+    main._encode_direct(QUERIES)  # warm-up
+    total = args.clients * args.requests
+
+    t_direct = _run(main._encode_direct, args.clients, args.requests)
+    batcher = EncodeBatcher(main._encode_direct, max_batch=args.max_batch, max_wait_ms=args.wait_ms)
+    t_batched = _run(batcher.encode, args.clients, args.requests)
+
+    print(f"clientes={args.clients} peticiones={total}")
+    print(f"directo : {total / t_direct:8.1f} req/s  ({t_direct:.2f} s)")
+    print(f"batcher : {total / t_batched:8.1f} req/s  ({t_batched:.2f} s)  {batcher.stats()}")
+
+
+if __name__ == "__main__":
+    main_()
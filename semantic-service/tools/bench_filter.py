@@ -0,0 +1,71 @@
+# tools/bench_filter.py
+"""
+Latencia de una búsqueda filtrada por convenio_id / version_id
+(filtro + similitud + top-k, sin el encode de la consulta):
+- antes: máscara con listas Python sobre todos los docs
+- ahora: posting lists (solo se tocan las filas del convenio/versión)
+
+Uso (desde semantic-service/):
+    python tools/bench_filter.py [--n 100000] [--convenios 500] [--versions 4]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# añade ../ al PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.ann import topk_indices  # noqa: E402
+from app.doctable import DocTable  # noqa: E402
+from app.semantic import SemanticIndexer  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=100000)
+    ap.add_argument("--convenios", type=int, default=500)
+    ap.add_argument("--versions", type=int, default=4, help="versiones por convenio")
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--k", type=int, default=5)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    conv = rng.integers(1, args.convenios + 1, size=args.n)
+    vers = conv * 100 + rng.integers(1, args.versions + 1, size=args.n)
+    docs = [{"convenio_id": int(c), "version_id": int(v), "fragmento": "x"} for c, v in zip(conv, vers)]
+    X = rng.standard_normal((args.n, args.dim)).astype(np.float32)
+    X /= np.linalg.norm(X, axis=1, keepdims=True)
+
+    ix = SemanticIndexer(lazy=True, ann="exact")
+    ix.docs = DocTable.from_list(docs)
+    ix.embeddings = X
+
+    Q = X[rng.integers(0, args.n, size=args.queries)]
+    targets = [(int(conv[i]), int(vers[i])) for i in rng.integers(0, args.n, size=args.queries)]
+
+    def before(q, c, v):
+        mask = np.ones(len(docs), dtype=bool)
+        mask &= np.array([d.get("convenio_id") == c for d in docs])
+        mask &= np.array([d.get("version_id") == v for d in docs])
+        idxs = np.where(mask)[0]
+        sims = X[mask] @ q
+        return idxs[np.argsort(-sims)[:args.k]]
+
+    def after(q, c, v):
+        rows = ix._filter_rows(c, v)
+        return rows[topk_indices(ix._scores(q, rows), args.k)]
+
+    for name, fn in (("antes (listas Python)", before), ("posting lists", after)):
+        t0 = time.perf_counter()
+        for q, (c, v) in zip(Q, targets):
+            fn(q, c, v)
+        print(f"{name:<22}: {(time.perf_counter() - t0) / len(Q) * 1000:8.3f} ms/consulta")
+    print(f"N={args.n} filas por convenio+versión ~ {args.n / (args.convenios * args.versions):.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# tools/bench_hybrid.py
+"""
+Latencia por consulta (sin el encode) sobre un corpus sintético:
+- denso exacto (todas las filas)
+- BM25 solo
+- híbrido (RRF denso + BM25)
+- denso con pre-filtro BM25 (solo el top-N léxico se puntúa denso)
+
+Uso (desde semantic-service/):
+    python tools/bench_hybrid.py [--n 100000] [--prefilter 2000]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# añade ../ al PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.doctable import DocTable  # noqa: E402
+from app.semantic import SemanticIndexer  # noqa: E402
+
+WORDS = ("convenio vigencia firma digital costos presupuesto partes obligaciones "
+         "capacitación certificados entidad cooperación plazo cláusula resolución").split()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=100000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--prefilter", type=int, default=2000)
+    ap.add_argument("--k", type=int, default=5)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    words = rng.integers(0, len(WORDS), size=(args.n, 20))
+    texts = [" ".join(WORDS[w] for w in row) + f" artículo {i % 997} monto {i}" for i, row in enumerate(words)]
+    X = rng.standard_normal((args.n, args.dim)).astype(np.float32)
+    X /= np.linalg.norm(X, axis=1, keepdims=True)
+
+    ix = SemanticIndexer(lazy=True, ann="exact", query_ner=False)
+    ix.batcher = None
+    ix._encode = lambda t: X[rng.integers(0, args.n, size=len(t))]
+    ix.docs = DocTable.from_list([{"convenio_id": 1, "version_id": 1, "fragmento": t} for t in texts])
+    ix.embeddings = X
+    t0 = time.perf_counter()
+    ix.lexical  # construye BM25
+    print(f"BM25 build: {time.perf_counter() - t0:.2f} s  {ix.lexical.stats()}")
+
+    queries = [f"artículo {rng.integers(0, 997)} cláusula plazo" for _ in range(args.queries)]
+    ix._query_vectors(queries)  # encode fuera de la medición (queda en caché)
+
+    def run(label, mode, prefilter=0):
+        ix.bm25_prefilter = prefilter
+        ix.ann_min_rows = 0 if prefilter else 20000
+        t0 = time.perf_counter()
+        for q in queries:
+            ix.search(q, k=args.k, mode=mode)
+        print(f"{label:<26}: {(time.perf_counter() - t0) / len(queries) * 1000:8.2f} ms/consulta")
+
+    run("denso exacto", "dense")
+    run("bm25", "bm25")
+    run("híbrido (RRF)", "hybrid")
+    run(f"denso + pre-filtro {args.prefilter}", "dense", args.prefilter)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# tools/bench_precision.py
+"""
+Memoria y calidad de ranking del índice según precisión de almacenamiento
+(float32 / float16 / int8 con escala por fila), sobre vectores sintéticos.
+
+Uso (desde semantic-service/):
+    python tools/bench_precision.py [--sizes 10000 100000 1000000] [--k 10]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# añade ../ al PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.ann import topk_indices  # noqa: E402
+from app.vectors import PRECISIONS, VectorStore  # noqa: E402
+
+
+def _synthetic(n: int, d: int = 384, topics: int = 200, seed: int = 0, chunk: int = 100000):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((topics, d)).astype(np.float32)
+    X = np.empty((n, d), dtype=np.float32)
+    for a in range(0, n, chunk):
+        b = min(a + chunk, n)
+        labels = rng.integers(0, topics, size=b - a)
+        Y = centers[labels] + 0.6 * rng.standard_normal((b - a, d), dtype=np.float32)
+        X[a:b] = Y / np.linalg.norm(Y, axis=1, keepdims=True)
+    return X
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--queries", type=int, default=50)
+    args = ap.parse_args()
+
+    print(f"{'N':>9} {'precisión':>9} {'MB':>9} {'ms/consulta':>12} {'recall@k':>9} {'err. score':>10}")
+    for n in args.sizes:
+        X = _synthetic(n)
+        rng = np.random.default_rng(1)
+        Q = X[rng.integers(0, n, size=args.queries)]
+        ref_scores = [X @ q for q in Q]
+        ref_top = [set(topk_indices(s, args.k).tolist()) for s in ref_scores]
+
+        for precision in PRECISIONS:
+            vs = VectorStore.from_float(X, precision)
+            hits, err, t = 0, 0.0, 0.0
+            for q, ref_s, ref_t in zip(Q, ref_scores, ref_top):
+                t0 = time.perf_counter()
+                s = vs.scores(q)
+                top = topk_indices(s, args.k)
+                t += time.perf_counter() - t0
+                hits += len(ref_t & set(top.tolist()))
+                err = max(err, float(np.abs(s - ref_s).max()))
+            print(f"{n:>9} {precision:>9} {vs.nbytes / 2**20:>9.1f} {t / len(Q) * 1000:>12.2f} "
+                  f"{hits / (len(Q) * args.k):>9.3f} {err:>10.4f}")
+            del vs
+        del X
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# tools/bench_qa.py
+"""
+Latencia de la etapa de selección de fragmento en /qa: antes (un encode por
+item) vs ahora (lotes ordenados por longitud + caché), para 5, 20 y 100 items.
+
+Uso (desde semantic-service/):
+    python tools/bench_qa.py [--sizes 5 20 100] [--repeat 3] [--simulate]
+
+--simulate usa tools/sim_encoder.py en vez del modelo (sin torch).
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+# añade ../ al PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import main  # noqa: E402
+
+WORDS = (
+    "el convenio interinstitucional tendrá una vigencia de dos años a partir "
+    "de su suscripción las partes se comprometen a coordinar acciones de "
+    "gobierno electrónico firma digital y capacitación del personal técnico "
+    "la entidad asumirá los costos de certificados y soporte el presupuesto "
+    "asignado no podrá ser modificado sin adenda expresa de ambas partes"
+).split()
+
+
+def _fragments(n: int, seed: int):
+    rnd = random.Random(seed)
+    return [" ".join(rnd.choice(WORDS) for _ in range(rnd.randint(40, 400)))
+            for _ in range(n)]
+
+
+def _before(q_vec, frags):
+    best, best_score = None, -1.0
+    for i, f in enumerate(frags):
+        emb = main.embedder.encode(f, convert_to_numpy=True, normalize_embeddings=True)
+        score = float(emb @ q_vec)
+        if score > best_score:
+            best, best_score = i, score
+    return best
+
+
+def _after(q_vec, frags):
+    M = main.fragment_embeddings(frags)
+    return int((M @ q_vec).argmax())
+
+
+def main_():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[5, 20, 100])
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--simulate", action="store_true", help="encoder simulado (tools/sim_encoder.py)")
+    args = ap.parse_args()
+
+    if args.simulate:
+        from sim_encoder import SimEncoder
+
+        main.embedder = SimEncoder()
+    elif not main.loader.wait():
+        sys.exit(f"No se pudieron cargar los modelos: {main.loader.error}")
+
+    q_vec = main.encode_texts(["¿Cuál es la vigencia del convenio?"])[0]
+    main.encode_texts(WORDS[:8])  # warm-up
+
+    print(f"batch_size={main.QA_BATCH_SIZE}")
+    print(f"{'items':>6} {'antes (ms)':>12} {'lotes (ms)':>12} {'caché (ms)':>12}")
+    for n in args.sizes:
+        t_before = t_cold = t_warm = 0.0
+        for r in range(args.repeat):
+            frags = _fragments(n, seed=1000 * n + r)
+
+            t0 = time.perf_counter()
+            a = _before(q_vec, frags)
+            t_before += time.perf_counter() - t0
+
+            main.frag_cache.mem.clear()
+            t0 = time.perf_counter()
+            b = _after(q_vec, frags)
+            t_cold += time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            _after(q_vec, frags)
+            t_warm += time.perf_counter() - t0
+
+            if a != b:
+                print(f"  aviso: distinto ganador con {n} items ({a} vs {b})")
+
+        k = 1000.0 / args.repeat
+        print(f"{n:>6} {t_before * k:>12.1f} {t_cold * k:>12.1f} {t_warm * k:>12.1f}")
+
+
+if __name__ == "__main__":
+    main_()
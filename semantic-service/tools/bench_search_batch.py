@@ -0,0 +1,70 @@
+# tools/bench_search_batch.py
+"""
+Q consultas con /search una por una vs. una sola llamada a search_batch
+(un encode + un producto matriz-matriz por filtro). El encoder se
+reemplaza por vectores aleatorios con un costo fijo por llamada, así se
+ve el efecto de agrupar sin depender del modelo.
+
+Uso (desde semantic-service/):
+    python tools/bench_search_batch.py [--n 100000] [--queries 32] [--encode-ms 8]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# añade ../ al PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.doctable import DocTable  # noqa: E402
+from app.semantic import SemanticIndexer  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=100000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--queries", type=int, default=32)
+    ap.add_argument("--convenios", type=int, default=20, help="filtros distintos entre las consultas")
+    ap.add_argument("--encode-ms", type=float, default=8.0, help="costo fijo simulado por encode")
+    ap.add_argument("--k", type=int, default=5)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((args.n, args.dim)).astype(np.float32)
+    X /= np.linalg.norm(X, axis=1, keepdims=True)
+    conv = rng.integers(1, args.convenios + 1, size=args.n)
+    docs = [{"convenio_id": int(c), "version_id": 1, "fragmento": "x"} for c in conv]
+
+    ix = SemanticIndexer(lazy=True, ann="exact", query_ner=False)
+    ix.batcher = None
+    ix.query_cache.max_size = 0  # cada consulta se codifica
+
+    def fake_encode(texts):
+        time.sleep(args.encode_ms / 1000.0)
+        v = rng.standard_normal((len(texts), args.dim)).astype(np.float32)
+        return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+    ix._encode = fake_encode
+    ix.docs = DocTable.from_list(docs)
+    ix.embeddings = X
+
+    for label, filt in (("sin filtro", False), ("por convenio", True)):
+        queries = [{"query": f"consulta {i}", "k": args.k,
+                    "convenio_id": int(rng.integers(1, args.convenios + 1)) if filt else None}
+                   for i in range(args.queries)]
+        t0 = time.perf_counter()
+        for q in queries:
+            ix.search(q["query"], k=q["k"], convenio_id=q["convenio_id"])
+        t_single = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        ix.search_batch(queries)
+        t_batch = time.perf_counter() - t0
+        print(f"{label:<13} Q={args.queries}: una por una {t_single * 1000:8.1f} ms | "
+              f"search_batch {t_batch * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# tools/bench_segments.py
+"""
+Memoria privada (RssAnon, Linux) al cargar un índice de varios segmentos:
+con SEMANTIC_MMAP los embeddings quedan mapeados, un mmap por segmento,
+en vez de concatenarse en RAM. Mide tras load_index() y tras un recorrido
+completo (scores contra todas las filas).
+
+Uso (desde semantic-service/):
+    python tools/bench_segments.py [--segments 6] [--rows 20000] [--dim 384] [--precision float32]
+"""
+import argparse
+import gc
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# añade ../ al PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import app.storage as storage  # noqa: E402
+from app.doctable import DocTable  # noqa: E402
+from app.vectors import VectorStore  # noqa: E402
+
+
+def rss_anon_mib() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1]) / 1024.0
+    return float("nan")
+
+
+def use_dir(d: str) -> None:
+    storage.DATA_DIR = d
+    storage.SEG_DIR = f"{d}/segments"
+    storage.MANIFEST_FP = f"{d}/manifest.json"
+    storage.DOCS_FP = f"{d}/index.jsonl"
+    storage.EMB_FP = f"{d}/embeddings.npy"
+    storage.SCALE_FP = f"{d}/emb_scale.npy"
+    storage.ANN_FP = f"{d}/ann.npz"
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--segments", type=int, default=6)
+    ap.add_argument("--rows", type=int, default=20000, help="filas por segmento")
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--precision", default="float32")
+    args = ap.parse_args()
+
+    use_dir(tempfile.mkdtemp(prefix="bench_segments_"))
+    rng = np.random.default_rng(0)
+    for s in range(args.segments):
+        X = rng.standard_normal((args.rows, args.dim)).astype(np.float32)
+        docs = DocTable.from_list([{"convenio_id": i % 50, "version_id": s, "fragmento": ""}
+                                   for i in range(args.rows)])
+        storage.append_segment(docs, VectorStore.from_float(X, args.precision))
+        del X, docs
+    gc.collect()
+
+    r0 = rss_anon_mib()
+    t0 = time.perf_counter()
+    _, vectors = storage.load_index()
+    t_load = time.perf_counter() - t0
+    r1 = rss_anon_mib()
+    vectors.scores(np.ones(args.dim, dtype=np.float32))
+    r2 = rss_anon_mib()
+
+    print(f"segmentos={args.segments} filas={len(vectors)} precisión={vectors.precision} "
+          f"matriz={vectors.nbytes / 2 ** 20:.0f} MiB (mmap={storage.USE_MMAP})")
+    print(f"load_index: {t_load * 1000:.0f} ms, RAM privada +{r1 - r0:.0f} MiB")
+    print(f"tras recorrer todas las filas: +{r2 - r0:.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# tools/check_quant.py
+"""
+Control de precisión del modo cuantizado (EMBEDDER_QUANTIZE=int8).
+
+Compara, sobre un conjunto fijo de consultas, los rankings top-k de fp32 vs int8:
+- SemanticIndexer.search (fragmentos indexados)
+- selección de oraciones de /qa (mejor fragmento + top-k oraciones)
+y termina con código 1 si el recall@k medio cae bajo --min-recall.
+Aún no se corrió con el modelo real: int8 queda apagado hasta tener ese número.
+
+Uso (desde semantic-service/):
+    python tools/check_quant.py [--k 5] [--min-recall 0.9] [--use-index]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# añade ../ al PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.encoding import encode_sorted  # noqa: E402
+from app.segment import Segmenter  # noqa: E402
+from app.semantic import SemanticIndexer  # noqa: E402
+from app.storage import load_index  # noqa: E402
+
+QUERIES = [
+    "¿Cuál es la vigencia del convenio?",
+    "convenio con AGETIC",
+    "¿Quién asume los costos de los certificados digitales?",
+    "fecha de vencimiento del convenio",
+    "obligaciones de las partes",
+    "¿Se puede modificar el presupuesto asignado?",
+    "resolución anticipada del convenio",
+    "capacitación del personal técnico",
+    "precios preferenciales para la entidad",
+    "cantidad mínima de compra",
+    "confidencialidad de la información",
+    "solución de controversias",
+]
+
+FRAGMENTS = [
+    "CLÁUSULA PRIMERA.- (ANTECEDENTES) La Agencia para el Desarrollo de la Sociedad de la Información en Bolivia (ADSIB) es la entidad certificadora pública. La Agencia de Gobierno Electrónico y Tecnologías de Información y Comunicación (AGETIC) impulsa la ciudadanía digital.",
+    "CLÁUSULA SEGUNDA.- (OBJETO) El presente convenio tiene por objeto establecer mecanismos de cooperación interinstitucional para la implementación de la firma digital en los trámites de la entidad.",
+    "CLÁUSULA TERCERA.- (VIGENCIA) El convenio tendrá una vigencia de dos (2) años computables a partir de su suscripción, pudiendo ampliarse mediante adenda expresa de ambas partes.",
+    "CLÁUSULA CUARTA.- (OBLIGACIONES DE LA ADSIB) La ADSIB emitirá los certificados digitales solicitados y brindará soporte técnico a los servidores públicos designados.",
+    "CLÁUSULA QUINTA.- (OBLIGACIONES DE LA ENTIDAD) La entidad asumirá los costos de los certificados digitales y de los dispositivos criptográficos, y designará un responsable de coordinación.",
+    "CLÁUSULA SEXTA.- (CAPACITACIÓN) La ADSIB capacitará al personal técnico de la entidad en el uso de la firma digital y en la gestión del ciclo de vida de los certificados.",
+    "CLÁUSULA SÉPTIMA.- (FINANCIAMIENTO) El convenio queda sujeto al límite presupuestario asignado; el presupuesto no podrá ser modificado sin adenda.",
+    "CLÁUSULA OCTAVA.- (CONDICIONES COMERCIALES) El proveedor otorgará precios preferenciales a la entidad y se requiere una cantidad mínima de compra de cien certificados por gestión.",
+    "CLÁUSULA NOVENA.- (CONFIDENCIALIDAD) Las partes guardarán reserva sobre la información a la que tengan acceso en el marco del presente convenio.",
+    "CLÁUSULA DÉCIMA.- (RESOLUCIÓN) El convenio podrá resolverse anticipadamente por incumplimiento de obligaciones, previa notificación escrita con treinta días de anticipación.",
+    "CLÁUSULA DÉCIMA PRIMERA.- (CONTROVERSIAS) Las controversias se resolverán de manera amigable entre las partes; en su defecto, se acudirá a la vía legal correspondiente.",
+    "CLÁUSULA DÉCIMA SEGUNDA.- (CONFORMIDAD) En señal de conformidad, las partes suscriben el presente convenio en tres ejemplares de igual valor legal.",
+]
+
+
+def _ids(results):
+    return [(r["convenio_id"], r["version_id"], r["fragmento"]) for r in results]
+
+
+def _recall(ref, got) -> float:
+    if not ref:
+        return 1.0
+    return len(set(ref) & set(got)) / len(ref)
+
+
+def _qa_topk(indexer: SemanticIndexer, segmenter: Segmenter, q: str, frags, k: int):
+    """Misma lógica que /qa: mejor fragmento y top-k oraciones."""
+    q_vec = indexer._embed([q])[0]
+    M = encode_sorted(indexer._embed, frags)
+    best = int(np.argmax(M @ q_vec))
+    sents = segmenter.split(frags[best])
+    if not sents:
+        return best, []
+    sims = encode_sorted(indexer._embed, sents) @ q_vec
+    return best, sorted(np.argsort(-sims, kind="stable")[:k].tolist())
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--min-recall", type=float, default=0.9)
+    ap.add_argument("--use-index", action="store_true",
+                    help="usar los fragmentos del índice persistido en lugar del set fijo")
+    args = ap.parse_args()
+
+    if args.use_index:
+        docs, _ = load_index()
+        items = [{"convenio_id": d.get("convenio_id"), "version_id": d.get("version_id"),
+                  "fragmento": d.get("fragmento", "")} for d in docs]
+    else:
+        items = [{"convenio_id": i + 1, "version_id": 1, "fragmento": f}
+                 for i, f in enumerate(FRAGMENTS)]
+    if not items:
+        sys.exit("No hay fragmentos para evaluar.")
+
+    ref = SemanticIndexer(quantize="fp32")
+    ref.batcher = None
+    ref.add_docs([dict(it) for it in items])
+    cand = SemanticIndexer(quantize="int8")
+    cand.batcher = None
+    cand.add_docs([dict(it) for it in items])
+
+    segmenter = Segmenter(mode="sentencizer")
+    frags = [d["fragmento"] for d in ref.docs]
+
+    search_recalls, qa_recalls, qa_same_frag = [], [], 0
+    for q in QUERIES:
+        r_ref = _ids(ref.search(q, k=args.k))
+        r_int = _ids(cand.search(q, k=args.k))
+        search_recalls.append(_recall(r_ref, r_int))
+
+        b_ref, s_ref = _qa_topk(ref, segmenter, q, frags, args.k)
+        b_int, s_int = _qa_topk(cand, segmenter, q, frags, args.k)
+        qa_same_frag += int(b_ref == b_int)
+        qa_recalls.append(_recall(s_ref, s_int) if b_ref == b_int else 0.0)
+
+    search_r = float(np.mean(search_recalls))
+    qa_r = float(np.mean(qa_recalls))
+    print(f"fragmentos={len(items)} consultas={len(QUERIES)} k={args.k}")
+    print(f"search recall@{args.k} int8 vs fp32: {search_r:.3f}")
+    print(f"/qa    recall@{args.k} int8 vs fp32: {qa_r:.3f} (mismo fragmento en {qa_same_frag}/{len(QUERIES)})")
+
+    if min(search_r, qa_r) < args.min_recall:
+        print(f"FALLA: recall por debajo de {args.min_recall}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
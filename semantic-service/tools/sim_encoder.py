@@ -0,0 +1,53 @@
+# tools/sim_encoder.py
+"""
+Encoder simulado para los benchmarks (--simulate) cuando no hay modelo/torch.
+- Misma interfaz que SentenceTransformer.encode (str o lista, batch_size).
+- Costo por forward pass parecido a MiniLM en CPU: fijo por llamada + por
+  token, con padding al texto más largo del lote (como el modelo real,
+  ordena por longitud dentro de cada llamada).
+- Un forward a la vez (el modelo ocupa todos los núcleos): llamadas
+  concurrentes se encolan en vez de solaparse.
+- Vectores deterministas por hash de palabras: sirven para comparar
+  rankings antes/después, no para medir calidad.
+"""
+import hashlib
+import threading
+import time
+
+import numpy as np
+
+
+class SimEncoder:
+    def __init__(self, call_ms: float = 5.0, token_us: float = 60.0,
+                 max_tokens: int = 128, dim: int = 384):
+        self.call_ms = call_ms
+        self.token_us = token_us
+        self.max_tokens = max_tokens
+        self.dim = dim
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _tokens(self, text: str) -> int:
+        # ~1.3 piezas WordPiece por palabra en español, más [CLS]/[SEP]
+        return min(self.max_tokens, int(len(text.split()) * 1.3) + 2)
+
+    def _vec(self, text: str) -> np.ndarray:
+        v = np.zeros(self.dim, dtype=np.float32)
+        for w in text.lower().split():
+            v[int.from_bytes(hashlib.md5(w.encode("utf-8")).digest()[:4], "little") % self.dim] += 1.0
+        n = np.linalg.norm(v)
+        return v / n if n else v
+
+    def encode(self, texts, batch_size: int = 32, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = True, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+        for b in range(0, len(order), max(1, batch_size)):
+            batch = [texts[i] for i in order[b:b + batch_size]]
+            cost = self.call_ms / 1000.0 + self.token_us / 1e6 * len(batch) * max(map(self._tokens, batch))
+            with self._lock:
+                self.calls += 1
+                time.sleep(cost)
+        out = np.stack([self._vec(t) for t in texts]) if texts else np.empty((0, self.dim), np.float32)
+        return out[0] if single else out